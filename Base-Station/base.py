@@ -4,26 +4,33 @@ See the techincal and hardware documentation in the root directory.
 See requirements.txt
 """
 
-import time
 import traceback
-import json
 import logging
-from datetime import datetime
 import meshtastic.serial_interface
+from pubsub import pub
 from azure.storage.blob import BlobServiceClient
+from uploader import make_uploader
+from upload_queue import BatchUploader, UploadLog
+from tracker_events import TrackerListener, node_to_point
 
 logger = logging.getLogger(__name__)
 
 # Global variables to be changed for different base stations/running conditions.
 BASE_STATION_ID = '!7c5cb2a0'
 BASE_STATION_LONG_NAME = 'base-3200'
-TRACKER_ID = '!84887b30'
-TRACKER_LONG_NAME = 'VK6AJP - M1'
+TRACKERS = {'!84887b30': 'VK6AJP - M1'}    # The node IDs of the trackers followed by this base station, paired with their long names.
 CONN_STRING = (
     "DefaultEndpointsProtocol=https;AccountName=cits3200testv1;"
     "AccountKey=;EndpointSuffix=core.windows.net"
 )
 POLL_RATE_SECONDS = 30
+FALLBACK_POLL_SECONDS = 120    # Time without packets from a tracker after which it is polled anyway, in "events" mode.
+INGEST_MODE = "events"    # "events": handles tracker packets as they arrive, polling trackers that go silent as a fallback. "poll": polls only.
+UPLOAD_MODE = "append"    # "append": uploads only new points, as line-delimited JSON. "overwrite": re-uploads every point (legacy).
+WIRE_FORMAT = "compact"   # Format of each uploaded point in "append" mode. "compact": values only, less than half the size. "json": JSON objects.
+UPLOAD_BATCH_MAX_BYTES = 1024 * 1024    # Most bytes uploaded in one request when catching up after an outage.
+UPLOAD_RETRY_SECONDS = 5                # Shortest wait before retrying a failed upload.
+UPLOAD_MAX_BACKOFF_SECONDS = 300        # Longest wait before retrying a failed upload.
 
 
 def run_base_station():
@@ -57,65 +64,87 @@ def run_base_station():
 
     # ---------- Initialises variables and gets first GPS point from tracker. ----------
 
-    logging.info(f"Beginning base station setup process with base station ID and name = {BASE_STATION_ID}, {BASE_STATION_LONG_NAME}, and tracker ID and name = {TRACKER_ID} + {TRACKER_LONG_NAME}")
-    print(f"Beginning base station setup process with base station ID and name = {BASE_STATION_ID}, {BASE_STATION_LONG_NAME}, and tracker ID and name = {TRACKER_ID} + {TRACKER_LONG_NAME}")
+    logging.info(f"Beginning base station setup process with base station ID and name = {BASE_STATION_ID}, {BASE_STATION_LONG_NAME}, and trackers = {TRACKERS}")
+    print(f"Beginning base station setup process with base station ID and name = {BASE_STATION_ID}, {BASE_STATION_LONG_NAME}, and trackers = {TRACKERS}")
 
-    json_upload = []        # Holds all current GPS data from the tracker.
     json_key = 0            # Control variable to give each GPS point a unique identifier.
 
     interface = meshtastic.serial_interface.SerialInterface()   # Establishes an interface with the base station.
 
-    new_data = get_nodes_verbose(interface)                     # Gets data for base station and tracker.
-    if new_data == 0:
-        logging.error("Tracker has no GPS lock, achieve lock then run program again.")
-        print("Tracker has no GPS lock, achieve lock then run program again.")
+    first_points = get_nodes_verbose(interface)                 # Gets data for base station and trackers.
+    if not first_points:
+        logging.error("No tracker has GPS lock, achieve lock then run program again.")
+        print("No tracker has GPS lock, achieve lock then run program again.")
         interface.close()
         return 0
-    
-    latest_data = new_data                                      # Holds the latest GPS ping from the tracker.
-    json_upload.append({"point" + str(json_key): new_data})
-    json_key += 1
 
-    logging.info(f"Writing new GPS point {str(new_data)}")
-    print("\nWriting new GPS point: " + str(new_data))
-    with open(BASE_STATION_LONG_NAME, "w") as f:        # Writes all current GPS data to file (this will be uploaded to server eventually).
-        f.write(json.dumps(json_upload))
+    # The local copy of the search's GPS data doubles as the queue of points to upload.
+    # If the search is still running (the web app deletes the container when it ends), it is resumed
+    # after a restart, and the points not yet uploaded are uploaded first.
+    log = UploadLog(BASE_STATION_LONG_NAME, WIRE_FORMAT)
+    resume = found and log.count > 0
+    latest = {}
+    if resume:
+        json_key = log.count
+        latest = log.latest_points()
+        logging.info(f"Resuming search with {log.count} points, {log.size - log.uploaded} bytes not yet uploaded.")
+        print(f"\nResuming search with {log.count} points, {log.size - log.uploaded} bytes not yet uploaded.")
+    else:
+        log.reset(WIRE_FORMAT)     # Starts a new local copy of the search's GPS data.
 
-    # Initial upload to container.
-    container_client.upload_blob(name=BASE_STATION_LONG_NAME, data=str(json_upload), overwrite=True)
-    logging.info(f"Uploaded total: {str(json_upload)}")
-    print("\n Uploaded total: " + str(json_upload) + "\n")
+    # Uploads in the background, replacing the previous search's blob unless resuming.
+    uploader = make_uploader(UPLOAD_MODE, container_client, BASE_STATION_LONG_NAME, log.wire_format)
+    batch_uploader = BatchUploader(log, uploader, UPLOAD_BATCH_MAX_BYTES, UPLOAD_RETRY_SECONDS,
+                                   UPLOAD_MAX_BACKOFF_SECONDS, new_search=not resume)
+    batch_uploader.start()
 
-    # ---------- Checks for new GPS data from the tracker, based on poll rate (default 30 seconds) ----------
+    listener = TrackerListener(TRACKERS, BASE_STATION_LONG_NAME, latest=latest)
+    for new_data in first_points:
+        if listener.offer(new_data):
+            logging.info(f"Writing new GPS point {str(new_data)}")
+            print("\nWriting new GPS point: " + str(new_data))
+            log.append([("point" + str(json_key), new_data)])
+            json_key += 1
 
-    time.sleep(POLL_RATE_SECONDS)
-    try:
-        while True:
-            print("\n--------------- LOOP ---------------\n")
-            new_data = get_nodes(interface, latest_data)
+    # ---------- Handles new GPS data from the trackers as it arrives, or polls for it every POLL_RATE_SECONDS (default 30 seconds) ----------
 
-            # If the GPS data has not changed since the latest new data, do nothing.
-            if new_data == 0:
-                pass
+    poll_seconds = POLL_RATE_SECONDS
+    if INGEST_MODE == "events":
+        listener.subscribe(pub)     # Meshtastic publishes every received packet.
+        poll_seconds = FALLBACK_POLL_SECONDS
 
-            # If the GPS data is new, save it to file.
-            else: 
+    try:
+        while True:
+            # Waits for a new point from a packet, until a tracker has been silent for poll_seconds.
+            # The silent trackers are then polled, in case their packets were missed.
+            new_data = listener.wait(listener.seconds_until_silent(poll_seconds))
+            new_points, source = [new_data], "event"
+            if new_data is None:
+                silent = listener.silent(poll_seconds)
+                if not silent:
+                    continue
+                print("\n--------------- POLL ---------------\n")
+                new_points, source = get_nodes(interface, listener, silent), "poll"
+
+                # If no tracker's GPS data has changed since its latest new data, do nothing.
+                if not new_points:
+                    continue
+
+            # If the GPS data is new, save it to file, from which it is uploaded in the background.
+            # Upload failures are retried there, so an outage does not stop the base station.
+            for new_data in new_points:
                 logging.info(f"Writing new GPS point {str(new_data)}")
                 print("\nWriting new GPS point: " + str(new_data))
-                json_upload.append({"point" + str(json_key): new_data})
+                log.append([("point" + str(json_key), new_data)])
                 json_key += 1
-                with open(BASE_STATION_LONG_NAME, "w") as f:
-                    f.write(json.dumps(json_upload))
-                container_client.upload_blob(name=BASE_STATION_LONG_NAME, data=str(json_upload), overwrite=True)
-                # logging.info(f"Uploaded total: {str(json_upload)}")      # Comment this in to view total upload.
-                # print("\nUploaded total: " + str(json_upload) + "\n")    # Comment this in to view total upload.
-                latest_data = new_data      # Updates latest_data for future changes reference.
-
-            time.sleep(POLL_RATE_SECONDS)
+                latency = listener.latency.record(new_data, source)
+                logging.info(f"Saved point from {source} {latency:.1f} s after {new_data['name']} recorded it. {listener.latency.summary()}")
+            logging.info(f"{batch_uploader.summary()}. Uploaded {uploader.bytes_sent} bytes in total.")
 
     except Exception:
         # Catches any unexpected error in running the entire code while looping.
         print("Encountered an unexpected error, shutting down...")
+        batch_uploader.stop(timeout=UPLOAD_RETRY_SECONDS)    # Points not yet uploaded stay in the log for the next run.
         interface.close()
         logging.fatal(traceback.format_exc)
         traceback.print_exc()
@@ -123,14 +152,15 @@ def run_base_station():
     # ---------------------------------------------------------------------------------
 
 
-def get_nodes(interface, latest_data):
-    """Gets data from tracker via the base station, returns the data if it is new.
+def get_nodes(interface, listener, tracker_ids=None):
+    """Gets data from the trackers via the base station, returns the data that is new.
     
     Keyword arguments:
         interface -- The Meshtastic serial interface that interacts with devices.
-        latest_data -- The most recently received data from the tracker.
+        listener -- The TrackerListener holding each tracker's most recently received data.
+        tracker_ids -- The trackers to look up (default: every tracker in TRACKERS).
         
-    Return: 0 if the data is the same as most recent data, or returns the new data if it is different.
+    Return: A list of the new points, one at most per tracker (empty if no tracker's data has changed).
     """
 
     # ---------- Checks serial connection has been maintained ---------- 
@@ -144,66 +174,31 @@ def get_nodes(interface, latest_data):
         print("No LoRa devices were found to be serially connected, check USB connection cable and device.")
         quit()
 
-    # ---------- Iterates through all nodes to find the tracker ----------
+    # ---------- Looks up each tracker by its node ID, and keeps its GPS data if it is new ----------
 
     logging.info("Retrieving tracker data...")
     print("\nRetrieving tracker data...")
-    foundTracker = False
-    tracker = {}
-    for tracker_data in nodes.values():
-        if tracker_data['user']['id'] == TRACKER_ID:
-            foundTracker = True
-            tracker = tracker_data
-    if foundTracker == False:
-        logging.fatal("Failed to find GPS tracker amongst nodes. Restart program and ensure tracker is on.")
-        print("\n ----------  Failed to find GPS tracker. ---------- \n")
-
-    # ---------- Checks the tracker data received, if the GPS data is new returns it. ----------
-    
-    # Checks that GPS data was included in the tracker data.
-    try:
-        coords = [tracker['position']['latitude'], tracker['position']['longitude']]
-    except KeyError:
-        logging.warning("No GPS data found for tracker. Please check GPS lock.")
-        print("\nNo GPS data found for tracker. Please check GPS lock.")
-        return 0
-    
-    # Parses data from the Meshtastic ping into a dictionary.
-    battLevel = tracker['deviceMetrics']['batteryLevel']
-    snr = tracker['snr']
-    times = datetime.fromtimestamp(tracker['position']['time']).strftime("%Y-%m-%dT%H:%M:%S")
-    new_data = {"name": TRACKER_ID, "time": times, "lat": coords[0], "long": coords[1], 
-                "telemetry": {"battery": battLevel, "altitude": " ", "PDOP": "", "SNR": snr}, "longname": BASE_STATION_LONG_NAME}
-    
-    # Ensures that the telemetry exists, to avoid KeyErrors.
-    try:
-        new_data["telemetry"]["altitude"] = tracker['position']['altitude']
-    except KeyError:
-        pass
-    try:
-        new_data["telemetry"]["PDOP"] = tracker['position']['PDOP']
-    except KeyError:
-        pass
-
-    # Checks that the GPS data is new.
-    # If it is now new, continue running without saving.
-    if coords == [latest_data['lat'], latest_data['long']] and times == latest_data['time']:
+    new_points, missing = listener.poll(nodes, tracker_ids)
+    for tracker_id in missing:
+        logging.warning(f"No GPS data found for tracker {tracker_id} ({TRACKERS[tracker_id]}). Please check it is on and has GPS lock.")
+        print(f"\nNo GPS data found for tracker {tracker_id} ({TRACKERS[tracker_id]}). Please check it is on and has GPS lock.")
+
+    if new_points:
+        logging.info(f"Received new GPS data from {len(new_points)} tracker(s), saving.")
+        print(f"\nReceived new GPS data from {len(new_points)} tracker(s), saving.")
+    else:
         logging.info("Received GPS data matches old GPS data, not saving.")
-        logging.info(f"OLD DATA: {str(tracker)}")
         print("Received GPS data matches old GPS data, not saving.")
-        print(f"OLD DATA: {str(tracker)}")
-        return 0
-    # If it is new, saves the data and moves on to upload it.
-    else:
-        logging.info("Received GPS data is new, saving")
-        print("\nReceived GPS data is new, saving.")
-        return new_data
+    return new_points
     
     # ---------------------------------------------------------------------------------
 
 
 def get_nodes_verbose(interface):
-    """The same as get_nodes(), except runs basic setup and prints results verbosely."""
+    """The same as get_nodes(), except runs basic setup and prints results verbosely.
+
+    Return: A list of the first point of each tracker that has GPS data.
+    """
 
     # ---------- Checks serial connection has been maintained ---------- 
 
@@ -217,22 +212,18 @@ def get_nodes_verbose(interface):
 
     # ---------- Iterates through all nodes and prints their data verbosely. ----------
 
-    baseStation = {}
-    tracker = {}
     otherDevices = []
     logging.info("Getting all nodes information...")
     print("Getting all nodes information...")
     for value in nodes.values(): 
         if value['user']['id'] == BASE_STATION_ID:
-            baseStation = value
-            logging.info(f"Base station details: {baseStation}")
+            logging.info(f"Base station details: {value}")
             print("\nBase Station Details:")
-            print(baseStation)
-        if value['user']['id'] == TRACKER_ID:
-            tracker = value
-            logging.info(f"Tracker details: {tracker}")
+            print(value)
+        elif value['user']['id'] in TRACKERS:
+            logging.info(f"Tracker details: {value}")
             print("\nTracker Details:")
-            print(tracker)
+            print(value)
         else:
             otherDevices.append(value['user']['longName'])
     logging.info("Other previously connected devices found:")
@@ -246,34 +237,21 @@ def get_nodes_verbose(interface):
     logging.info("Processing tracker data...")
     print("\nProcessing tracker data...")
 
-    # Checks that GPS data was included in the tracker data.
-    try:
-        coords = [tracker['position']['latitude'], tracker['position']['longitude']]
-    except KeyError as e:
-        logging.warning("No GPS data found for tracker. Please check GPS lock.")
-        print("\nNo GPS data found for tracker. Please check GPS lock.")
-        return 0
-    
-    # Saves the GPS data, along with other data from the tracker.
-    logging.info("Received GPS data is new, saving.")
-    print("\nReceived GPS data is new, saving.")
-    battLevel = tracker['deviceMetrics']['batteryLevel']
-    snr = tracker['snr']
-    times = datetime.fromtimestamp(tracker['position']['time']).strftime("%Y-%m-%dT%H:%M:%S")
-    new_data = {"name": TRACKER_ID, "time": times, "lat": coords[0], "long": coords[1], 
-                "telemetry": {"battery": battLevel, "altitude": " ", "PDOP": "", "SNR": snr}, "longname": BASE_STATION_LONG_NAME}
-
-    # Ensures that the telemetry exists, to avoid KeyErrors.
-    try:
-        new_data["telemetry"]["altitude"] = tracker['position']['altitude']
-    except KeyError:
-        pass
-    try:
-        new_data["telemetry"]["PDOP"] = tracker['position']['PDOP']
-    except KeyError:
-        pass
+    # Checks that GPS data was included in each tracker's data.
+    first_points = []
+    for tracker_id, tracker_long_name in TRACKERS.items():
+        point = node_to_point(nodes[tracker_id], BASE_STATION_LONG_NAME) if tracker_id in nodes else None
+        if point is None:
+            logging.warning(f"No GPS data found for tracker {tracker_id} ({tracker_long_name}). Please check GPS lock.")
+            print(f"\nNo GPS data found for tracker {tracker_id} ({tracker_long_name}). Please check GPS lock.")
+        else:
+            first_points.append(point)
 
-    return new_data
+    if first_points:
+        # Saves the GPS data, along with other data from the trackers.
+        logging.info("Received GPS data is new, saving.")
+        print("\nReceived GPS data is new, saving.")
+    return first_points
 
     # ---------------------------------------------------------------------------------
 
@@ -0,0 +1,215 @@
+"""Receives the trackers' pings as Meshtastic packets arrive, instead of waiting for the next poll.
+
+The Meshtastic library publishes every packet it receives on pubsub topics. TrackerListener
+subscribes to position and telemetry packets, turns the followed trackers' positions into points,
+and hands new ones to the base station's main loop through a queue. Polling interface.nodes
+(get_nodes() in base.py) remains as a fallback for packets that are missed, e.g. while the serial
+link reconnects: a tracker is polled once no packet has been heard from it for a while. Each
+tracker's latest point, battery level and last packet time are kept separately, so one base
+station can follow any number of trackers.
+"""
+
+import queue
+import threading
+import time
+from datetime import datetime
+
+POSITION_TOPIC = "meshtastic.receive.position"
+TELEMETRY_TOPIC = "meshtastic.receive.telemetry"
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def packet_to_point(packet, battery, base_station_long_name):
+    """Converts a position packet to a point, in the same format as get_nodes() in base.py.
+
+    Args:
+        packet (dict): The decoded Meshtastic packet.
+        battery: The tracker's latest battery level, or None if none has been received.
+        base_station_long_name (str): The name of this base station.
+
+    Returns:
+        dict: The point, or None if the packet holds no GPS fix.
+    """
+    position = packet.get("decoded", {}).get("position", {})
+    if "latitude" not in position or "longitude" not in position or "time" not in position:
+        return None
+
+    point = {"name": packet["fromId"], "time": datetime.fromtimestamp(position["time"]).strftime(TIME_FORMAT),
+             "lat": position["latitude"], "long": position["longitude"],
+             "telemetry": {"battery": battery, "altitude": " ", "PDOP": "", "SNR": packet.get("rxSnr")},
+             "longname": base_station_long_name}
+
+    # Ensures that the telemetry exists, to avoid KeyErrors.
+    if "altitude" in position:
+        point["telemetry"]["altitude"] = position["altitude"]
+    if "PDOP" in position:
+        point["telemetry"]["PDOP"] = position["PDOP"]
+    return point
+
+
+def node_to_point(node, base_station_long_name):
+    """Converts a node from the Meshtastic node database (interface.nodes) to a point.
+
+    Args:
+        node (dict): The node's entry, e.g. interface.nodes['!84887b30'].
+        base_station_long_name (str): The name of this base station.
+
+    Returns:
+        dict: The point, or None if the node has no GPS fix.
+    """
+    position = node.get("position", {})
+    if "latitude" not in position or "longitude" not in position or "time" not in position:
+        return None
+    packet = {"fromId": node["user"]["id"], "rxSnr": node.get("snr"), "decoded": {"position": position}}
+    return packet_to_point(packet, node.get("deviceMetrics", {}).get("batteryLevel"), base_station_long_name)
+
+
+class LatencyStats:
+    """Measures the time from a tracker recording a ping to the base station saving it for upload."""
+
+    def __init__(self):
+        self.counts = {"event": 0, "poll": 0}    # Points saved, by how they were received.
+        self.last = None
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, point, source, now=None):
+        """Records the saving of a point, received from an "event" or a "poll".
+
+        Returns:
+            float: The point's latency in seconds.
+        """
+        now = time.time() if now is None else now
+        latency = now - datetime.strptime(point["time"], TIME_FORMAT).timestamp()
+        self.counts[source] += 1
+        self.last = latency
+        self.total += latency
+        self.max = max(self.max, latency)
+        return latency
+
+    def mean(self):
+        count = sum(self.counts.values())
+        return self.total / count if count else None
+
+    def summary(self):
+        mean = self.mean()
+        return (f"{self.counts['event']} points from events, {self.counts['poll']} from polls, tracker-to-save "
+                f"latency mean {mean or 0:.1f} s, max {self.max:.1f} s")
+
+
+class TrackerListener:
+    """Turns the followed trackers' Meshtastic packets into new points, deduplicated per tracker."""
+
+    def __init__(self, tracker_ids, base_station_long_name, latest=None):
+        """Creates a listener that is not yet subscribed.
+
+        Args:
+            tracker_ids (iterable): The node IDs of the trackers to follow, e.g. ['!84887b30'].
+            base_station_long_name (str): The name of this base station.
+            latest (dict, optional): Tracker IDs paired with their latest point already saved.
+        """
+        self.tracker_ids = list(tracker_ids)
+        self._followed = set(self.tracker_ids)
+        self.base_station_long_name = base_station_long_name
+        self.latest = dict(latest or {})
+        # Tracker IDs paired with their latest battery level.
+        self.battery = {tracker_id: point.get("telemetry", {}).get("battery") for tracker_id, point in self.latest.items()}
+        self.points = queue.Queue()
+        self.latency = LatencyStats()
+        self._lock = threading.Lock()    # Packets arrive on the Meshtastic reader thread.
+        # Tracker IDs paired with the monotonic time of their latest packet, or of the latest poll
+        # that looked them up. Trackers count as heard from when the listener is created.
+        now = time.monotonic()
+        self.last_heard = {tracker_id: now for tracker_id in self.tracker_ids}
+
+    def subscribe(self, pub):
+        """Subscribes to position and telemetry packets on a pubsub publisher (pubsub.pub)."""
+        pub.subscribe(self.on_position, POSITION_TOPIC)
+        pub.subscribe(self.on_telemetry, TELEMETRY_TOPIC)
+
+    def unsubscribe(self, pub):
+        pub.unsubscribe(self.on_position, POSITION_TOPIC)
+        pub.unsubscribe(self.on_telemetry, TELEMETRY_TOPIC)
+
+    def on_position(self, packet, interface=None):
+        """Queues a followed tracker's position as a new point, if it differs from that tracker's latest point."""
+        tracker_id = packet.get("fromId")
+        if tracker_id not in self._followed:
+            return
+        with self._lock:
+            self.last_heard[tracker_id] = time.monotonic()
+            point = packet_to_point(packet, self.battery.get(tracker_id), self.base_station_long_name)
+        if point is not None and self.offer(point):
+            self.points.put(point)
+
+    def on_telemetry(self, packet, interface=None):
+        """Remembers a tracker's battery level, which is sent in telemetry packets rather than with positions."""
+        tracker_id = packet.get("fromId")
+        if tracker_id not in self._followed:
+            return
+        metrics = packet.get("decoded", {}).get("telemetry", {}).get("deviceMetrics", {})
+        with self._lock:
+            self.last_heard[tracker_id] = time.monotonic()
+            if "batteryLevel" in metrics:
+                self.battery[tracker_id] = metrics["batteryLevel"]
+
+    def offer(self, point):
+        """Makes a point its tracker's latest point, unless it has the same position and time as that point.
+
+        Returns:
+            bool: True if the point is new.
+        """
+        with self._lock:
+            latest = self.latest.get(point["name"])
+            if latest is not None and [point["lat"], point["long"]] == [latest["lat"], latest["long"]] \
+                    and point["time"] == latest["time"]:
+                return False
+            self.latest[point["name"]] = point
+            return True
+
+    def silent(self, seconds, now=None):
+        """Returns the IDs of the trackers that have not been heard from (or polled) for the last 'seconds' seconds."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return [tracker_id for tracker_id in self.tracker_ids if now - self.last_heard[tracker_id] >= seconds]
+
+    def seconds_until_silent(self, seconds, now=None):
+        """Returns the time until the next tracker has not been heard from for 'seconds' seconds (0 if one already has)."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            oldest = min(self.last_heard.values(), default=now)
+        return max(oldest + seconds - now, 0.0)
+
+    def poll(self, nodes, tracker_ids=None):
+        """Finds the followed trackers' new points in the Meshtastic node database, as a fallback for missed packets.
+
+        Each tracker is looked up by its node ID, rather than by searching every node, and counts
+        as heard from until it has been silent for as long again.
+
+        Args:
+            nodes (dict): The node database, interface.nodes, keyed by node ID.
+            tracker_ids (list, optional): The trackers to look up. Defaults to every followed tracker.
+
+        Returns:
+            tuple: The new points, and the IDs of the trackers that were not found or have no GPS fix.
+        """
+        new_points, missing = [], []
+        tracker_ids = self.tracker_ids if tracker_ids is None else tracker_ids
+        now = time.monotonic()
+        with self._lock:
+            self.last_heard.update((tracker_id, now) for tracker_id in tracker_ids)
+        for tracker_id in tracker_ids:
+            node = nodes.get(tracker_id)
+            point = node_to_point(node, self.base_station_long_name) if node is not None else None
+            if point is None:
+                missing.append(tracker_id)
+            elif self.offer(point):
+                new_points.append(point)
+        return new_points, missing
+
+    def wait(self, timeout):
+        """Returns the next new point received from a packet, or None if none arrives within timeout seconds."""
+        try:
+            return self.points.get(timeout=timeout)
+        except queue.Empty:
+            return None
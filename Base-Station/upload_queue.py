@@ -0,0 +1,268 @@
+"""Keeps the base station's points on disk until they have been uploaded, so an outage loses none.
+
+Every new point is first appended to UploadLog, an append-only file of line-delimited JSON that is
+also the base station's local copy of the search. BatchUploader drains the log in the background:
+it uploads every point not yet uploaded in one batch, then records how far it got in a checkpoint
+file beside the log. When an upload fails, e.g. because the uplink has dropped, it retries with
+exponential backoff, and the points received in the meantime are caught up in as few requests as
+possible once the uplink returns. After a restart, uploading resumes from the checkpoint.
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from uploader import MAX_APPEND_BYTES, decode_line, detect_wire_format, encode_line
+
+
+class UploadLog:
+    """An append-only file of points, and a checkpoint of how much of it has been uploaded."""
+
+    def __init__(self, path, wire_format="json"):
+        """Opens the log at path, creating it if needed.
+
+        A line left incomplete by a crash is removed, and a checkpoint beyond the end of the log is
+        ignored. Points are written in the log's wire format, which is also the format of the blob
+        it is uploaded to (see uploader.py).
+
+        Args:
+            path (str): The log's file path. The checkpoint is kept at path + ".checkpoint".
+            wire_format (str, optional): The wire format of a new log. A log that already holds
+                points keeps the format they were written in.
+        """
+        self.path = path
+        self.checkpoint_path = path + ".checkpoint"
+        self._condition = threading.Condition()
+        self._appended = deque()    # (end offset, monotonic time appended) for each append not yet uploaded.
+
+        with open(path, "ab+") as f:
+            f.seek(0)
+            data = f.read()
+            complete = data.rfind(b"\n") + 1
+            if complete < len(data):
+                f.truncate(complete)
+        self.size = complete
+        self.count = data.count(b"\n")    # Points in the log.
+        self.wire_format = detect_wire_format(data) if complete else wire_format
+
+        try:
+            with open(self.checkpoint_path) as f:
+                self.uploaded = min(int(f.read().strip() or 0), self.size)
+        except (OSError, ValueError):
+            self.uploaded = 0
+
+    def reset(self, wire_format=None):
+        """Empties the log and its checkpoint, for a new search, optionally changing its wire format."""
+        with self._condition:
+            self.wire_format = wire_format or self.wire_format
+            open(self.path, "wb").close()
+            self.size = self.count = 0
+            self._appended.clear()
+            self._write_checkpoint(0)
+
+    def append(self, records):
+        """Writes new points to the log, and only returns once they are on disk.
+
+        A point longer than MAX_APPEND_BYTES once encoded is dropped, as it could never be appended
+        to the blob, and would hold back every point after it.
+
+        Args:
+            records (list): The new points, as (key, point) pairs, e.g. ("point3", {...}).
+        """
+        lines = []
+        for key, point in records:
+            line = encode_line(key, point, self.wire_format)
+            if len(line) > MAX_APPEND_BYTES:
+                print(f"Dropping {key}: it is {len(line)} bytes, more than the {MAX_APPEND_BYTES} bytes of one append.")
+                continue
+            lines.append(line)
+        data = b"".join(lines)
+        with self._condition:
+            with open(self.path, "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            self.size += len(data)
+            self.count += len(lines)
+            self._appended.append((self.size, time.monotonic()))
+            self._condition.notify_all()
+
+    def read(self, start, end):
+        """Returns the bytes of the log from offset start to end."""
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            return f.read(end - start)
+
+    def pending(self, max_bytes):
+        """Returns the points not yet uploaded, as whole lines.
+
+        Args:
+            max_bytes (int): The most bytes to return, unless the first pending line alone is longer.
+
+        Returns:
+            tuple: The log offset of the first pending line, and the lines (empty if none are pending).
+        """
+        with self._condition:
+            start, end = self.uploaded, self.size
+        data = self.read(start, min(end, start + max_bytes))
+        if start + len(data) < end:
+            complete = data.rfind(b"\n") + 1
+            data = data[:complete] if complete else self.read(start, end).split(b"\n", 1)[0] + b"\n"
+        return start, data
+
+    def latest_points(self):
+        """Returns each tracker's last point in the log, keyed by tracker ID."""
+        with self._condition:
+            size = self.size
+        latest = {}
+        for line in self.read(0, size).splitlines():
+            _, point = decode_line(line)
+            latest[point["name"]] = point
+        return latest
+
+    def commit(self, offset):
+        """Records that the log has been uploaded up to offset.
+
+        Returns:
+            float: The longest time any of the newly uploaded points waited in the log, in seconds.
+        """
+        now = time.monotonic()
+        waited = 0.0
+        with self._condition:
+            self.uploaded = offset
+            while self._appended and self._appended[0][0] <= offset:
+                waited = max(waited, now - self._appended.popleft()[1])
+            self._write_checkpoint(offset)
+            self._condition.notify_all()
+        return waited
+
+    def _write_checkpoint(self, offset):
+        # Writes a new file and renames it over the old one, so a crash never leaves a partial checkpoint.
+        temp_path = self.checkpoint_path + ".tmp"
+        with open(temp_path, "w") as f:
+            f.write(str(offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.checkpoint_path)
+
+    def wait_for_pending(self, timeout, stopping=None):
+        """Waits up to timeout seconds for points that have not been uploaded, or for stopping to be set.
+
+        Returns:
+            bool: True if points are pending.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self.uploaded < self.size or (stopping is not None and stopping.is_set()), timeout)
+            return self.uploaded < self.size
+
+    def wake(self):
+        """Wakes every thread waiting on the log, e.g. so they can check whether to stop."""
+        with self._condition:
+            self._condition.notify_all()
+
+    def wait_until_uploaded(self, timeout):
+        """Waits up to timeout seconds for every point in the log to be uploaded.
+
+        Returns:
+            bool: True if every point has been uploaded.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self.uploaded >= self.size, timeout)
+
+
+class BatchUploader:
+    """Uploads the points in an UploadLog from a background thread, in batches, retrying failures."""
+
+    def __init__(self, log, uploader, max_batch_bytes, retry_seconds, max_backoff_seconds, new_search=False):
+        """Creates a batch uploader that is not yet running.
+
+        Args:
+            log (UploadLog): The log to upload.
+            uploader: An uploader from make_uploader(), which the log's lines are uploaded through.
+            max_batch_bytes (int): The most bytes to upload in one batch.
+            retry_seconds (float): The shortest time before retrying a failed upload.
+            max_backoff_seconds (float): The longest time before retrying a failed upload.
+            new_search (bool, optional): True to start a new blob before uploading, False to resume
+                uploading to the existing blob from the log's checkpoint.
+        """
+        self.log = log
+        self.uploader = uploader
+        self.max_batch_bytes = max_batch_bytes
+        self.retry_seconds = retry_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.new_search = new_search
+        self._resuming = not new_search
+        self.failures = 0    # Consecutive failed attempts.
+        self.stats = {"batches": 0, "points": 0, "bytes": 0, "failures": 0, "largest_batch": 0, "max_wait": 0.0}
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="batch-uploader", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self.log.wake()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def backoff(self, failures):
+        """Returns the time to wait before the next attempt after a number of consecutive failures.
+
+        The delay is drawn uniformly between retry_seconds and retry_seconds * 2 ** failures (capped
+        at max_backoff_seconds), as in the web app's ingest service.
+        """
+        ceiling = min(self.max_backoff_seconds, self.retry_seconds * 2 ** failures)
+        return random.uniform(self.retry_seconds, max(ceiling, self.retry_seconds))
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                if not self.run_once():
+                    self.log.wait_for_pending(timeout=1, stopping=self._stopping)
+                self.failures = 0
+            except Exception as e:
+                self.failures += 1
+                self.stats["failures"] += 1
+                delay = self.backoff(self.failures)
+                print(f"Upload failed ({self.failures} in a row), retrying in {delay:.1f} s: {e}")
+                self._stopping.wait(delay)
+
+    def run_once(self):
+        """Starts the search's blob if needed, then uploads the next batch of pending points.
+
+        Returns:
+            bool: True if a batch was uploaded.
+
+        Raises:
+            Exception: Whatever the uploader raises. The batch stays pending and is retried.
+        """
+        if self.new_search:
+            self.uploader.start()
+            self.new_search = False
+        elif self._resuming:
+            uploaded = self.uploader.resume(self.log)
+            if uploaded != self.log.uploaded:
+                print(f"Resuming from {uploaded} bytes uploaded, not the checkpoint at {self.log.uploaded} bytes.")
+                self.log.commit(uploaded)
+            self._resuming = False
+
+        start, data = self.log.pending(self.max_batch_bytes)
+        if not data:
+            return False
+        self.uploader.upload_lines(data, start)
+        waited = self.log.commit(start + len(data))
+
+        self.stats["batches"] += 1
+        self.stats["points"] += data.count(b"\n")
+        self.stats["bytes"] += len(data)
+        self.stats["largest_batch"] = max(self.stats["largest_batch"], data.count(b"\n"))
+        self.stats["max_wait"] = max(self.stats["max_wait"], waited)
+        return True
+
+    def summary(self):
+        return (f"{self.stats['points']} points uploaded in {self.stats['batches']} batches "
+                f"(largest {self.stats['largest_batch']} points), {self.stats['failures']} failed attempts, "
+                f"longest wait in the log {self.stats['max_wait']:.1f} s, {self.log.size - self.log.uploaded} bytes pending")
@@ -0,0 +1,230 @@
+"""Uploads a base station's GPS points to its Azure Storage container.
+
+Two upload modes are supported (see UPLOAD_MODE in base.py):
+    - "append": Points are appended to an Append Blob as line-delimited JSON, one {"pointN": {...}}
+        object per line, so each upload only sends the new points. The web app reads the new lines
+        of a growing blob without downloading it again.
+    - "overwrite": The whole list of points is uploaded again every time, in the legacy format.
+        Upload size grows with the length of the search.
+
+In "append" mode, each line is in one of two wire formats (see WIRE_FORMAT in base.py), which the
+blob's Content-Type names so the web app knows how to read it:
+    - "json": A {"pointN": {...}} object, repeating every key name in every point.
+    - "compact": A JSON array of the point's values in a fixed order, without key names:
+        [N, name, time, lat, lon, [battery, altitude, PDOP, SNR], longname]
+        The time is in seconds since the epoch, and latitude and longitude are integers in units
+        of 1e-7 degrees (the precision of Meshtastic positions). Any value that would not convert
+        back exactly (e.g. a time in another format) is written as uploaded instead.
+"""
+
+import calendar
+import json
+import math
+import re
+import time
+from azure.core.exceptions import HttpResponseError, ResourceNotFoundError
+from azure.storage.blob import ContentSettings
+
+# Azure accepts at most 50,000 appends to one Append Blob, and 4 MiB per append.
+MAX_APPEND_BYTES = 4 * 1024 * 1024
+
+# Wire formats, paired with the Content-Type of blobs written in them.
+WIRE_FORMATS = {"json": "application/x-ndjson", "compact": "application/x-ses-points-v1"}
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+TELEMETRY_KEYS = ["battery", "altitude", "PDOP", "SNR"]
+COORDINATE_SCALE = 10 ** 7
+KEY_PATTERN = re.compile(r"point(0|[1-9][0-9]*)")
+
+
+def encode_coordinate(value):
+    """Returns a coordinate in units of 1e-7 degrees, or unchanged if it has more precision than that."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value * COORDINATE_SCALE    # Read back as the equal float.
+    if isinstance(value, float) and math.isfinite(value):
+        scaled = round(value * COORDINATE_SCALE)
+        if scaled / COORDINATE_SCALE == value:
+            return scaled
+    return value
+
+
+def encode_time(value):
+    """Returns a ping time in seconds since the epoch, or unchanged if it is not in TIME_FORMAT."""
+    try:
+        epoch = calendar.timegm(time.strptime(value, TIME_FORMAT))
+    except (TypeError, ValueError):
+        return value
+    return epoch if time.strftime(TIME_FORMAT, time.gmtime(epoch)) == value else value
+
+
+def encode_compact(key, point):
+    """Encodes one point as a line of the "compact" wire format (see above)."""
+    match = KEY_PATTERN.fullmatch(key)
+    telemetry = point.get("telemetry", {})
+    if list(telemetry) == TELEMETRY_KEYS:
+        telemetry = list(telemetry.values())
+    record = [int(match.group(1)) if match else key, point.get("name"), encode_time(point.get("time")),
+              encode_coordinate(point.get("lat")), encode_coordinate(point.get("long")), telemetry, point.get("longname")]
+    return (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def encode_line(key, point, wire_format="json"):
+    """Encodes one point as a line, e.g. b'{"point0":{"name":...}}\\n' in the "json" wire format."""
+    if wire_format == "compact":
+        return encode_compact(key, point)
+    return (json.dumps({key: point}, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def decode_line(line):
+    """Decodes one line in either wire format.
+
+    Returns:
+        tuple: The point's key and the point, e.g. ("point3", {...}).
+    """
+    value = json.loads(line)
+    if isinstance(value, dict):
+        return next(iter(value.items()))
+
+    key, name, ping_time, lat, lon, telemetry, longname = value
+    if isinstance(telemetry, list):
+        telemetry = dict(zip(TELEMETRY_KEYS, telemetry))
+    return (f"point{key}" if isinstance(key, int) else key, {
+        "name": name,
+        "time": time.strftime(TIME_FORMAT, time.gmtime(ping_time)) if isinstance(ping_time, int) else ping_time,
+        "lat": lat / COORDINATE_SCALE if isinstance(lat, int) else lat,
+        "long": lon / COORDINATE_SCALE if isinstance(lon, int) else lon,
+        "telemetry": telemetry,
+        "longname": longname,
+    })
+
+
+def detect_wire_format(line):
+    """Returns the wire format of a line, from its first character."""
+    return "compact" if line.lstrip()[:1] == b"[" else "json"
+
+
+class AppendUploader:
+    """Appends new points to an Append Blob as line-delimited JSON."""
+
+    def __init__(self, container_client, blob_name, wire_format="json"):
+        self.blob_client = container_client.get_blob_client(blob_name)
+        self.wire_format = wire_format
+        self.bytes_sent = 0    # Bytes uploaded so far.
+
+    def start(self):
+        """Creates an empty blob for a new search, replacing the previous search's blob.
+
+        The blob's Content-Type names its wire format, so that the web app can tell how to read it.
+        """
+        self.blob_client.create_append_blob(content_settings=ContentSettings(content_type=WIRE_FORMATS[self.wire_format]))
+
+    def resume(self, log):
+        """Continues a search after a restart.
+
+        Args:
+            log (UploadLog): The search's log. The blob holds the start of it.
+
+        Returns:
+            int: The bytes of the log the blob holds, which can be more than the log's checkpoint if
+                the base station stopped between an upload and its checkpoint. 0 if the blob did not
+                exist (e.g. the base station stopped before creating it), in which case it is created
+                and the whole log is uploaded again.
+        """
+        try:
+            size = self.blob_client.get_blob_properties().size
+        except ResourceNotFoundError:
+            self.start()
+            return 0
+        return size if log.uploaded <= size <= log.size else log.uploaded
+
+    def upload(self, records):
+        """Uploads new points.
+
+        Args:
+            records (list): The new points, as (key, point) pairs, e.g. ("point3", {...}).
+        """
+        self.upload_lines(b"".join(encode_line(key, point, self.wire_format) for key, point in records))
+
+    def upload_lines(self, data, position=None):
+        """Uploads new points that are already encoded as lines.
+
+        Args:
+            data (bytes): Whole lines, each encoded by encode_line() in the uploader's wire format.
+            position (int, optional): The size the blob must have before the append. If the blob is
+                already larger, because an earlier attempt at this upload succeeded but its response
+                was lost, only the lines it does not hold yet are appended.
+
+        Raises:
+            HttpResponseError: If the blob does not hold the bytes expected before position.
+            ValueError: If a line is longer than MAX_APPEND_BYTES, so could never be appended.
+                UploadLog never holds such lines.
+        """
+        start = 0
+        while start < len(data):
+            # Splits at a line boundary, so every append holds whole lines.
+            end = len(data) if start + MAX_APPEND_BYTES >= len(data) else data.rfind(b"\n", start, start + MAX_APPEND_BYTES) + 1
+            if end <= start:
+                raise ValueError(f"A line at byte {start} is longer than the {MAX_APPEND_BYTES} bytes of one append.")
+            if position is None:
+                self.blob_client.append_block(data[start:end])
+            else:
+                self._append_at(data[start:end], position + start)
+            start = end
+        self.bytes_sent += len(data)
+
+    def _append_at(self, block, position):
+        try:
+            self.blob_client.append_block(block, appendpos_condition=position)
+        except HttpResponseError as e:
+            if getattr(e, "status_code", None) != 412:
+                raise
+            # The append position did not match. If the blob ends within this block, its start was
+            # appended by an earlier attempt. Otherwise the blob and the local log disagree.
+            done = self.blob_client.get_blob_properties().size - position
+            if not 0 < done <= len(block):
+                raise
+            if done < len(block):
+                self.blob_client.append_block(block[done:], appendpos_condition=position + done)
+
+
+class OverwriteUploader:
+    """Uploads the whole list of points every time, in the legacy format."""
+
+    def __init__(self, container_client, blob_name):
+        self.container_client = container_client
+        self.blob_name = blob_name
+        self.points = []
+        self.bytes_sent = 0
+
+    def start(self):
+        self.points = []
+
+    def resume(self, log):
+        """Continues a search after a restart, from the points in the log that were already uploaded."""
+        self.points = [dict([decode_line(line)]) for line in log.read(0, log.uploaded).splitlines()]
+        return log.uploaded
+
+    def upload(self, records):
+        self.points.extend({key: point} for key, point in records)
+        self._upload()
+
+    def upload_lines(self, data, position=None):
+        self.points.extend(dict([decode_line(line)]) for line in data.splitlines())
+        self._upload()
+
+    def _upload(self):
+        data = str(self.points)
+        self.container_client.upload_blob(name=self.blob_name, data=data, overwrite=True)
+        self.bytes_sent += len(data.encode("utf-8"))
+
+
+def make_uploader(mode, container_client, blob_name, wire_format="json"):
+    """Creates the uploader for an upload mode ("append" or "overwrite"), and a wire format for "append" mode."""
+    if wire_format not in WIRE_FORMATS:
+        raise ValueError(f"Unknown wire format '{wire_format}'. Expected one of {', '.join(WIRE_FORMATS)}.")
+    if mode == "append":
+        return AppendUploader(container_client, blob_name, wire_format)
+    if mode == "overwrite":
+        return OverwriteUploader(container_client, blob_name)
+    raise ValueError(f"Unknown upload mode '{mode}'. Expected 'append' or 'overwrite'.")
+
@@ -0,0 +1,56 @@
+"""
+Benchmark of the live stream's fan-out, measuring the time between the ingest service publishing
+a base station's new pings and each /api/stream subscriber receiving them.
+
+Run from the root directory of the repository:
+    python Testing/Benchmarks/bench_live_stream.py
+"""
+
+import os
+import sys
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))    # Allows importing from the root directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Unit-Testing"))    # Allows importing the shared fake points.
+from live_stream import StreamHub
+from track import Track
+from fake_points import make_points
+
+SUBSCRIBER_COUNTS = [1, 20, 200]
+EVENTS = 50    # Pings published to the subscribers, one at a time.
+
+
+def run(subscriber_count):
+    """Publishes EVENTS new pings to subscriber_count subscribers, each read by its own thread."""
+    hub = StreamHub()
+    container = "base-3200"
+    subscribers = [hub.subscribe({container: 0}) for _ in range(subscriber_count)]
+    points = make_points(EVENTS)
+
+    def read(subscriber):
+        for _ in range(EVENTS):
+            event, published_at = subscriber.get(timeout=5)
+            hub.record_delivery(published_at)
+
+    threads = [threading.Thread(target=read, args=(subscriber,)) for subscriber in subscribers]
+    for thread in threads:
+        thread.start()
+    for count in range(1, EVENTS + 1):
+        hub.publish(container, Track.from_points(points[:count]))
+    for thread in threads:
+        thread.join()
+    for subscriber in subscribers:
+        hub.unsubscribe(subscriber)
+    return hub.stats()
+
+
+def main():
+    print(f"{'subscribers':>11} {'events':>7} {'mean (ms)':>10} {'max (ms)':>9}")
+    for subscriber_count in SUBSCRIBER_COUNTS:
+        stats = run(subscriber_count)
+        latency = stats["fanout_latency_ms"]
+        print(f"{subscriber_count:>11} {stats['events_delivered']:>7} {latency['mean']:>10.2f} {latency['max']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Benchmark of each map rendering mode (Config.MAP_RENDER_MODE), measuring the time taken to
+generate a live map's HTML and the size of that HTML, for 10 base stations x 1,000 points.
+
+Run from the root directory of the repository:
+    python Testing/Benchmarks/bench_map_rendering.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))    # Allows importing from the root directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Unit-Testing"))    # Allows importing the shared fake points.
+import folium
+from config import Config
+from retrieve_from_containers import MapBuildContext, center_and_zoom, process_data_to_map
+from track import Track
+from fake_points import make_points
+
+STATIONS = 10
+POINTS_PER_STATION = 1000
+MODES = ["markers", "geojson", "cluster"]
+
+
+def render(tracks):
+    """Builds a live map from the tracks and returns its HTML."""
+    m = folium.Map(location=Config.MAP_DEFAULT_COORDS, control_scale=True, zoom_start=Config.MAP_DEFAULT_ZOOM)
+    context = MapBuildContext()
+    for track in tracks:
+        process_data_to_map(track, m, [], context)
+    center_and_zoom(m, context)
+    return m.get_root().render()
+
+
+def main():
+    tracks = [Track.from_points(make_points(POINTS_PER_STATION, station)) for station in range(STATIONS)]
+    print(f"{STATIONS} stations x {POINTS_PER_STATION} points")
+    print(f"{'mode':>8} {'time (s)':>9} {'HTML (KB)':>10} {'lines':>8}")
+    for mode in MODES:
+        Config.MAP_RENDER_MODE = mode
+        start = time.perf_counter()
+        html = render(tracks)
+        elapsed = time.perf_counter() - start
+        print(f"{mode:>8} {elapsed:>9.2f} {len(html.encode()) / 1024:>10.0f} {html.count(chr(10)):>8}")
+
+
+if __name__ == "__main__":
+    main()
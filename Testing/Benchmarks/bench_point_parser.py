@@ -0,0 +1,57 @@
+"""
+Micro-benchmark comparing point_parser against the previous blob decoding path,
+which copied the blob to a str, replaced every "'" with '"', then ran json.loads.
+json.loads dominates both, so point_parser.loads is expected to take about as long as the old
+path. parse_points also builds a Point record for every point.
+
+Run from the root directory of the repository:
+    python Testing/Benchmarks/bench_point_parser.py
+"""
+
+import json
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))    # Allows importing from the root directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Unit-Testing"))    # Allows importing the shared fake points.
+import point_parser
+from fake_points import make_points
+
+POINT_COUNTS = [1000, 10000, 100000]
+
+
+def old_parse(data):
+    """The decoding path used before point_parser."""
+    return json.loads(data.decode("utf-8").replace("'", '"'))
+
+
+def best_time(function, data, repeat):
+    """Returns the fastest of several runs of function(data), in milliseconds."""
+    return min(timeit.repeat(lambda: function(data), number=1, repeat=repeat)) * 1000
+
+
+def main():
+    print(f"{'points':>8} {'format':>7} {'old (ms)':>10} {'loads (ms)':>11} {'records (ms)':>13} {'old/loads':>10}")
+    for count in POINT_COUNTS:
+        points = make_points(count)
+        repeat = 5 if count < 100000 else 3
+        for format_name, data in (("legacy", str(points).encode()), ("json", json.dumps(points).encode())):
+            assert point_parser.loads(data) == points
+            old_ms = best_time(old_parse, data, repeat)
+            loads_ms = best_time(point_parser.loads, data, repeat)
+            records_ms = best_time(point_parser.parse_points, data, repeat)
+            print(f"{count:>8} {format_name:>7} {old_ms:>10.1f} {loads_ms:>11.1f} {records_ms:>13.1f} {old_ms / loads_ms:>9.2f}x")
+
+    # The old path cannot parse names containing an apostrophe.
+    apostrophe_blob = str([{"point0": {"name": "O'Brien", "lat": 0.0, "long": 0.0}}]).encode()
+    try:
+        old_parse(apostrophe_blob)
+        print("\nOld path parsed a name containing an apostrophe.")
+    except ValueError:
+        print("\nOld path failed to parse a name containing an apostrophe.")
+    print(f"point_parser parsed it as: {point_parser.loads(apostrophe_blob)[0]['point0']['name']}")
+
+
+if __name__ == "__main__":
+    main()
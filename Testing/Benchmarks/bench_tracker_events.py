@@ -0,0 +1,55 @@
+"""
+Benchmark of the time a base station takes to hand a tracker's packet to its main loop in "events"
+mode, compared with the average wait for the next poll in "poll" mode (see Base-Station/tracker_events.py).
+
+Run from the root directory of the repository:
+    python Testing/Benchmarks/bench_tracker_events.py
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "Base-Station"))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Unit-Testing"))    # Allows importing the fake Meshtastic interface.
+from tracker_events import TrackerListener
+from fake_meshtastic import FakeInterface, FakePub
+
+TRACKER_ID = "!84887b30"
+PACKETS = 200
+POLL_RATE_SECONDS = 30    # POLL_RATE_SECONDS in Base-Station/base.py.
+
+
+def main():
+    pub = FakePub()
+    interface = FakeInterface(pub)
+    listener = TrackerListener([TRACKER_ID], "base-3200")
+    listener.subscribe(pub)
+    received_at = []
+
+    # Packets arrive on the Meshtastic reader thread while the main loop waits, as in base.py.
+    def main_loop():
+        while len(received_at) < PACKETS:
+            listener.wait(timeout=5)
+            received_at.append(time.perf_counter())
+
+    thread = threading.Thread(target=main_loop)
+    thread.start()
+    sent_at = []
+    for i in range(PACKETS):
+        time.sleep(0.002)
+        sent_at.append(time.perf_counter())
+        interface.receive_position(TRACKER_ID, -31.97 - i * 1e-4, 115.81)
+    thread.join()
+    listener.unsubscribe(pub)
+
+    delays = sorted((received - sent) * 1000 for sent, received in zip(sent_at, received_at))
+    print(f"{PACKETS} packets, packet to main loop: mean {sum(delays) / len(delays):.3f} ms, "
+          f"p99 {delays[int(len(delays) * 0.99)]:.3f} ms, max {delays[-1]:.3f} ms")
+    print(f"Polling every {POLL_RATE_SECONDS} s instead waits {POLL_RATE_SECONDS / 2 * 1000:.0f} ms on average "
+          f"and {POLL_RATE_SECONDS * 1000} ms at most.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Benchmark of the bytes a base station uploads over a search in each upload mode: "overwrite" (the
+whole legacy list every time) and "append", in both of its wire formats (see Base-Station/uploader.py).
+
+Run from the root directory of the repository:
+    python Testing/Benchmarks/bench_upload_modes.py
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))    # Allows importing from the root directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "Base-Station"))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Unit-Testing"))    # Allows importing the shared fake points.
+from uploader import make_uploader
+from fake_blob_store import FakeBlobServiceClient
+from fake_points import LONGNAME, make_record
+
+SEARCH_POINT_COUNTS = [120, 720, 2880]    # 1, 6 and 24-hour searches, with a new point every 30 seconds.
+MODES = [("overwrite", "json"), ("append", "json"), ("append", "compact")]
+
+
+def run_search(mode, wire_format, count):
+    """Uploads a search one point at a time, and returns the bytes uploaded."""
+    service = FakeBlobServiceClient()
+    service.create_container(LONGNAME)
+    uploader = make_uploader(mode, service.get_container_client(LONGNAME), LONGNAME, wire_format)
+    uploader.start()
+    for i in range(count):
+        uploader.upload([make_record(i)])
+    return service.bytes_uploaded
+
+
+def main():
+    print(f"{'points':>8} {'mode':>10} {'format':>8} {'uploaded (KB)':>14} {'of overwrite':>13}")
+    for count in SEARCH_POINT_COUNTS:
+        overwrite = None
+        for mode, wire_format in MODES:
+            uploaded = run_search(mode, wire_format, count)
+            overwrite = overwrite or uploaded
+            print(f"{count:>8} {mode:>10} {wire_format if mode == 'append' else 'legacy':>8} "
+                  f"{uploaded / 1e3:>14.1f} {uploaded / overwrite:>13.2%}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
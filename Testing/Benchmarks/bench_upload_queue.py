@@ -0,0 +1,69 @@
+"""
+Benchmark of how a base station catches up after an uplink outage: the points received during the
+outage are kept in the upload log and uploaded in batches once it ends (see Base-Station/upload_queue.py).
+
+Run from the root directory of the repository:
+    python Testing/Benchmarks/bench_upload_queue.py
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "Base-Station"))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Unit-Testing"))    # Allows importing the shared fake points.
+from upload_queue import BatchUploader, UploadLog
+from uploader import make_uploader
+from fake_blob_store import FakeBlobServiceClient
+from fake_points import LONGNAME, make_record
+
+OUTAGE_POINT_COUNTS = [120, 720, 2880]    # 1, 6 and 24-hour outages, with a new point every 30 seconds.
+MAX_BATCH_BYTES = 64 * 1024
+
+
+def run_outage(directory, count, wire_format):
+    """Appends count points while the uplink is down, then times uploading them once it is back.
+
+    Returns:
+        tuple: The catch-up time in milliseconds, the number of appends, and the uploader's summary.
+    """
+    service = FakeBlobServiceClient()
+    service.create_container(LONGNAME)
+    log = UploadLog(os.path.join(directory, f"{LONGNAME}-{wire_format}-{count}"), wire_format)
+    log.reset(wire_format)
+    uploader = make_uploader("append", service.get_container_client(LONGNAME), LONGNAME, wire_format)
+    batch_uploader = BatchUploader(log, uploader, MAX_BATCH_BYTES, retry_seconds=0.01, max_backoff_seconds=0.05,
+                                   new_search=True)
+
+    # The uploader prints every failed attempt during the outage, which is left out of the results.
+    with contextlib.redirect_stdout(io.StringIO()):
+        batch_uploader.start()
+        try:
+            service.offline = True
+            for i in range(count):
+                log.append([make_record(i)])
+            time.sleep(0.2)
+
+            service.offline = False
+            started = time.perf_counter()
+            if not log.wait_until_uploaded(timeout=30):
+                raise RuntimeError("The outage was not caught up.")
+            catch_up_ms = (time.perf_counter() - started) * 1000
+        finally:
+            batch_uploader.stop()
+    return catch_up_ms, service.append_count, batch_uploader.summary()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        for wire_format in ("json", "compact"):
+            for count in OUTAGE_POINT_COUNTS:
+                catch_up_ms, appends, summary = run_outage(directory, count, wire_format)
+                print(f"{count:>5} {wire_format:>8} points: caught up in {catch_up_ms:.1f} ms with {appends} appends. {summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark comparing the set-based upsert in historical_database against the previous upload path,
+which ran SELECT COUNT(*), then UPDATE or INSERT, then COMMIT for every base station.
+
+Without a database, both paths run against a recording fake connection that waits one simulated
+round trip (--rtt-ms) per statement and per commit, and counts them. To run against a real
+database instead, set BENCH_SQL_CONNECTION_STRING to a pyodbc connection string for a scratch
+database with a search_history table; the rows written are deleted afterwards.
+
+Run from the root directory of the repository:
+    python Testing/Benchmarks/bench_upsert.py [--rtt-ms 20]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))    # Allows importing from the root directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Unit-Testing"))    # Allows importing the shared fake points.
+import historical_database
+from fake_points import make_points
+
+STATION_COUNTS = [1, 10, 50]
+POINTS_PER_STATION = 500
+
+
+class RecordingCursor:
+    """Stands in for a pyodbc cursor, recording each statement as one round trip."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, query, params=()):
+        self.connection.round_trip(sum(len(str(value)) for value in params if value is not None))
+        return self
+
+    def fetchone(self):
+        return (0,)
+
+
+class RecordingConnection:
+    """Stands in for a pyodbc connection, counting round trips and the parameter bytes sent."""
+
+    def __init__(self, rtt_seconds):
+        self.rtt_seconds = rtt_seconds
+        self.round_trips = 0
+        self.commits = 0
+        self.bytes_sent = 0
+
+    def round_trip(self, size=0):
+        self.round_trips += 1
+        self.bytes_sent += size
+        time.sleep(self.rtt_seconds)
+
+    def cursor(self):
+        return RecordingCursor(self)
+
+    def commit(self):
+        self.commits += 1
+        self.round_trip()
+
+    def close(self):
+        pass
+
+
+def old_upload(conn, rows):
+    """The upload path used before upsert_search_rows()."""
+    cursor = conn.cursor()
+    for session_id, base_station, start_time, end_time, gpx_data, search_date, gps_json in rows:
+        cursor.execute("SELECT COUNT(*) FROM search_history WHERE session_id = ? AND base_station = ?",
+                       (session_id, base_station))
+        if cursor.fetchone()[0] > 0:
+            cursor.execute("""
+                UPDATE search_history
+                SET start_time = ?, end_time = ?, gpx_data = ?, search_date = ?, gps_JSON = ?
+                WHERE session_id = ? AND base_station = ?
+            """, (start_time, end_time, gpx_data, search_date, gps_json, session_id, base_station))
+        else:
+            cursor.execute("""
+                INSERT INTO search_history (session_id, base_station, start_time, end_time, gpx_data, search_date, gps_JSON)
+                VALUES (?, ?, ?, ?, ?, ?, ?);
+            """, (session_id, base_station, start_time, end_time, gpx_data, search_date, gps_json))
+        conn.commit()
+
+
+def new_upload(conn, rows):
+    """The current upload path: one MERGE per batch, one commit."""
+    historical_database.upsert_search_rows(conn, rows)
+    conn.commit()
+
+
+def make_rows(session_id, count):
+    """Creates a search_history row for each of count base stations."""
+    gps_json = json.dumps(make_points(POINTS_PER_STATION))
+    return [(session_id, f"base-{i}", "2024-09-16 09:00:00", None, None, None, gps_json) for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rtt-ms", type=float, default=20, help="Simulated round trip time of the fake connection.")
+    args = parser.parse_args()
+
+    dsn = os.environ.get("BENCH_SQL_CONNECTION_STRING")
+    if dsn:
+        import pyodbc
+        connect = lambda: pyodbc.connect(dsn)
+        print("Database: BENCH_SQL_CONNECTION_STRING")
+    else:
+        connect = lambda: RecordingConnection(args.rtt_ms / 1000)
+        print(f"Database: recording fake connection, {args.rtt_ms:g} ms per round trip")
+
+    print(f"{'stations':>8} {'payload (KB)':>13} {'old trips':>10} {'new trips':>10} {'old (ms)':>9} {'new (ms)':>9} {'speedup':>8}")
+    for count in STATION_COUNTS:
+        timings = {}
+        trips = {}
+        for name, upload in (("old", old_upload), ("new", new_upload)):
+            session_id = uuid.uuid4().hex[:16]
+            rows = make_rows(session_id, count)
+            conn = connect()
+            started = time.perf_counter()
+            upload(conn, rows)
+            timings[name] = (time.perf_counter() - started) * 1000
+            trips[name] = getattr(conn, "round_trips", "-")
+            if dsn:
+                conn.cursor().execute("DELETE FROM search_history WHERE session_id = ?", (session_id,))
+                conn.commit()
+            conn.close()
+        payload_kb = sum(len(row[-1]) for row in rows) / 1024
+        print(f"{count:>8} {payload_kb:>13.0f} {trips['old']:>10} {trips['new']:>10} "
+              f"{timings['old']:>9.1f} {timings['new']:>9.1f} {timings['old'] / timings['new']:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark comparing the size and decode speed of the formats base stations upload points in:
+the legacy str() of a list, line-delimited JSON, and the compact format (see Base-Station/uploader.py).
+Gzip sizes of the whole blob are shown for reference; appends cannot share one gzip stream, so
+gzip only helps blobs that are uploaded whole.
+
+Run from the root directory of the repository:
+    python Testing/Benchmarks/bench_wire_format.py
+"""
+
+import gzip
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))    # Allows importing from the root directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "Base-Station"))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Unit-Testing"))    # Allows importing the shared fake points.
+import point_parser
+from track import Track
+from uploader import encode_line
+from fake_points import make_records
+
+POINT_COUNTS = [720, 10000, 100000]    # A 6-hour search with a point every 30 seconds, and larger blobs.
+
+
+def best_time(function, repeat):
+    """Returns the fastest of several runs of function(), in milliseconds."""
+    return min(timeit.repeat(function, number=1, repeat=repeat)) * 1000
+
+
+def main():
+    print(f"{'points':>8} {'format':>8} {'bytes/point':>12} {'gzip b/pt':>10} {'loads (ms)':>11} {'track (ms)':>11}")
+    for count in POINT_COUNTS:
+        records = make_records(count)
+        points = [{key: point} for key, point in records]
+        repeat = 5 if count < 100000 else 3
+        blobs = {
+            "legacy": (str(points).encode("utf-8"), None),
+            "ndjson": (b"".join(encode_line(key, point) for key, point in records), point_parser.NDJSON_CONTENT_TYPE),
+            "compact": (b"".join(encode_line(key, point, "compact") for key, point in records),
+                        point_parser.COMPACT_CONTENT_TYPE),
+        }
+        for format_name, (data, content_type) in blobs.items():
+            assert point_parser.loads(data, content_type) == points
+            loads_ms = best_time(lambda: point_parser.loads(data, content_type), repeat)
+            track_ms = best_time(lambda: Track.from_points(data, content_type), repeat)
+            print(f"{count:>8} {format_name:>8} {len(data) / count:>12.1f} {len(gzip.compress(data)) / count:>10.1f} "
+                  f"{loads_ms:>11.1f} {track_ms:>11.1f}")
+
+        ratio = len(blobs["compact"][0]) / len(blobs["ndjson"][0])
+        print(f"{'':>8} compact is {ratio:.0%} of the size of line-delimited JSON, "
+              f"{len(blobs['compact'][0]) / len(blobs['legacy'][0]):.0%} of legacy\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,12 +5,16 @@ Use this for testing the web application.
 Written by Fred Leman
 """
 
+import os
+import sys
 from azure.storage.blob import BlobServiceClient
-import json
 import time
 import copy
 import datetime
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))    # Allows importing from the root directory.
+import point_parser
+
 NUM_BASE_STATIONS = 5
 
 
@@ -20,9 +24,8 @@ def upload():
     blob_service_client = BlobServiceClient.from_connection_string(conn_str=storage_key)
 
     # Reads in the test data.
-    with open("base-3200-a", "r") as file:
-        test_data = file.read().replace("'", '"')
-    test_points = json.loads(test_data)
+    with open("base-3200-a", "rb") as file:
+        test_points = point_parser.loads(file.read())
 
     # For each base station, adds the first data point as a list.
     fake_data_sets = []
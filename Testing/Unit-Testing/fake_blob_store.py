@@ -0,0 +1,183 @@
+"""
+A local, in-memory stand-in for Azure Blob Storage, used by the unit tests.
+
+Implements the parts of BlobServiceClient and ContainerClient that the web app and base station
+use, including ETag conditions, ranged downloads, and the errors Azure raises. Setting
+FakeBlobServiceClient.offline makes base station uploads fail as they do when the uplink drops.
+"""
+
+import hashlib
+import threading
+from types import SimpleNamespace
+from azure.core import MatchConditions
+from azure.core.exceptions import (HttpResponseError, ResourceExistsError, ResourceNotFoundError,
+                                   ResourceNotModifiedError, ServiceRequestError)
+
+
+def make_etag(data):
+    return '"' + hashlib.md5(data).hexdigest() + '"'
+
+
+class FakeContainerProperties(dict):
+    """Stands in for ContainerProperties, which supports both item and attribute access."""
+    __getattr__ = dict.__getitem__
+
+
+class FakeDownloader:
+    """Stands in for StorageStreamDownloader.
+
+    Like the SDK, a ranged download reports the size of the range as its size, and the size of the
+    whole blob only in its content range ("bytes <start>-<end>/<total>").
+    """
+
+    def __init__(self, data, etag, content_type=None, content_range=None):
+        self.data = data
+        self.properties = SimpleNamespace(etag=etag, size=len(data), last_modified=None, content_range=content_range,
+                                          content_settings=SimpleNamespace(content_type=content_type))
+
+    def readall(self):
+        return self.data
+
+
+class FakeContainerClient:
+    """Stands in for ContainerClient, reading and writing blobs held by a FakeBlobServiceClient."""
+
+    def __init__(self, service, container_name):
+        self.service = service
+        self.container_name = container_name
+
+    def blobs(self):
+        try:
+            return self.service.containers[self.container_name]
+        except KeyError:
+            raise ResourceNotFoundError(f"Container '{self.container_name}' not found.") from None
+
+    def exists(self):
+        return self.container_name in self.service.containers
+
+    def list_blobs(self):
+        return [SimpleNamespace(name=name) for name in self.blobs()]
+
+    def download_blob(self, blob, offset=None, length=None, etag=None, match_condition=None, **kwargs):
+        blob_name = getattr(blob, "name", blob)
+        with self.service.lock:
+            self.service.request_count += 1
+            try:
+                data = self.blobs()[blob_name]
+            except KeyError:
+                raise ResourceNotFoundError(f"Blob '{blob_name}' not found.") from None
+            current_etag = make_etag(data)
+            content_type = self.service.content_types.get((self.container_name, blob_name))
+
+        if match_condition == MatchConditions.IfModified and etag == current_etag:
+            raise ResourceNotModifiedError("Not modified.")
+        if offset:
+            if offset >= len(data):
+                error = HttpResponseError("The range specified is invalid for the current size of the resource.")
+                error.status_code = 416
+                raise error
+            end = len(data) if length is None else min(offset + length, len(data))
+            self.service.bytes_downloaded += end - offset
+            return FakeDownloader(data[offset:end], current_etag, content_type, f"bytes {offset}-{end - 1}/{len(data)}")
+        self.service.bytes_downloaded += len(data)
+        return FakeDownloader(data, current_etag, content_type)
+
+    def get_blob_client(self, blob):
+        return FakeBlobClient(self, blob)
+
+    def upload_blob(self, name, data, overwrite=False, **kwargs):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        with self.service.lock:
+            self.service.request_count += 1
+            blobs = self.blobs()
+            if name in blobs and not overwrite:
+                raise ResourceExistsError(f"Blob '{name}' already exists.")
+            blobs[name] = bytes(data)
+            self.service.content_types.pop((self.container_name, name), None)
+            self.service.bytes_uploaded += len(data)
+
+
+class FakeBlobClient:
+    """Stands in for BlobClient, for the Append Blob operations used by base stations."""
+
+    def __init__(self, container_client, blob_name):
+        self.container_client = container_client
+        self.blob_name = blob_name
+
+    def create_append_blob(self, content_settings=None, **kwargs):
+        service = self.container_client.service
+        with service.lock:
+            service.request()
+            self.container_client.blobs()[self.blob_name] = b""
+            service.content_types[(self.container_client.container_name, self.blob_name)] = \
+                getattr(content_settings, "content_type", None)
+
+    def append_block(self, data, appendpos_condition=None, **kwargs):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        service = self.container_client.service
+        with service.lock:
+            service.request()
+            blobs = self.container_client.blobs()
+            if self.blob_name not in blobs:
+                raise ResourceNotFoundError(f"Blob '{self.blob_name}' not found.")
+            if appendpos_condition is not None and appendpos_condition != len(blobs[self.blob_name]):
+                error = HttpResponseError("The append position condition specified was not met.")
+                error.status_code = 412
+                raise error
+            blobs[self.blob_name] += bytes(data)
+            service.bytes_uploaded += len(data)
+            service.append_count += 1
+
+    def get_blob_properties(self, **kwargs):
+        service = self.container_client.service
+        with service.lock:
+            service.request()
+            try:
+                data = self.container_client.blobs()[self.blob_name]
+            except KeyError:
+                raise ResourceNotFoundError(f"Blob '{self.blob_name}' not found.") from None
+        return SimpleNamespace(size=len(data), etag=make_etag(data))
+
+
+class FakeBlobServiceClient:
+    """Stands in for BlobServiceClient, holding every container's blobs in memory."""
+
+    def __init__(self):
+        self.containers = {}
+        self.content_types = {}    # (container name, blob name) paired with the Content-Type set on the blob.
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.append_count = 0
+        self.bytes_downloaded = 0
+        self.bytes_uploaded = 0
+        self.offline = False    # Makes base station requests fail, as if the uplink had dropped.
+
+    def request(self):
+        """Counts a base station request, failing it while offline. Called with the lock held."""
+        if self.offline:
+            raise ServiceRequestError("Failed to establish a new connection.")
+        self.request_count += 1
+
+    def get_container_client(self, container):
+        return FakeContainerClient(self, container)
+
+    def list_containers(self):
+        return [FakeContainerProperties(name=name) for name in self.containers]
+
+    def create_container(self, name):
+        if name in self.containers:
+            raise ResourceExistsError(f"Container '{name}' already exists.")
+        self.containers[name] = {}
+        return self.get_container_client(name)
+
+    def delete_container(self, name):
+        self.containers.pop(name, None)
+
+    def put_blob(self, container_name, blob_name, data):
+        """Writes a blob directly, creating its container if needed (for setting up tests)."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        with self.lock:
+            self.containers.setdefault(container_name, {})[blob_name] = bytes(data)
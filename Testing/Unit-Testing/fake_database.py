@@ -0,0 +1,66 @@
+"""
+Local stand-ins for the database connection pool and the search_history table, used by the unit tests.
+
+FakeSearchHistoryConnection answers the keyset-paginated page query of
+historical_database.get_historical_searches() from rows held in memory.
+"""
+
+import contextlib
+import re
+from collections import namedtuple
+from datetime import datetime
+
+SearchRow = namedtuple("SearchRow", "session_id base_station start_time end_time search_date")
+
+
+class FakePool:
+    """Stands in for db_pool.ConnectionPool, always checking out the same connection."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    @contextlib.contextmanager
+    def connection(self):
+        yield self.conn
+
+
+class FakeSearchHistoryConnection:
+    """Stands in for a pyodbc connection (and its cursor) to a database holding search_history rows.
+
+    Only the TOP count and the page key of a query are read; the date and base station filters
+    are ignored, so tests should not rely on them.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+        self.result = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, query, params=()):
+        self.queries.append((query, list(params)))
+        top = int(re.search(r"TOP \((\d+)\)", query).group(1))
+        rows = sorted(self.rows, key=self.key, reverse=True)
+        if "search_date < ?" in query:    # The page key is the last 5 parameters.
+            search_date, _, session_id, _, base_station = params[-5:]
+            after = (datetime.fromisoformat(search_date), session_id, base_station)
+            rows = [row for row in rows if self.key(row) < after]
+        self.result = rows[:top]
+
+    def fetchall(self):
+        return self.result
+
+    @staticmethod
+    def key(row):
+        return row.search_date, row.session_id, row.base_station
+
+
+def make_search_rows(count):
+    """Creates count completed searches, with several base stations per session and sessions per date."""
+    rows = []
+    for i in range(count):
+        date = datetime(2024, 9, 1 + i // 6, 12)
+        rows.append(SearchRow(f"session{i // 3 % 2}", f"base-{i % 3}", datetime(2024, 9, 1, 9), datetime(2024, 9, 1, 11), date))
+    return rows
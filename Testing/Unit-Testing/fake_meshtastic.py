@@ -0,0 +1,60 @@
+"""
+A local stand-in for a Meshtastic serial interface and the pubsub publisher it sends packets on,
+used by the unit tests of the base station.
+"""
+
+import time
+
+
+class FakePub:
+    """Stands in for pubsub.pub, calling each topic's listeners synchronously."""
+
+    def __init__(self):
+        self.listeners = {}
+
+    def subscribe(self, listener, topic):
+        self.listeners.setdefault(topic, []).append(listener)
+
+    def unsubscribe(self, listener, topic):
+        self.listeners.get(topic, []).remove(listener)
+
+    def sendMessage(self, topic, **kwargs):
+        for listener in list(self.listeners.get(topic, [])):
+            listener(**kwargs)
+
+
+class FakeInterface:
+    """Stands in for meshtastic.serial_interface.SerialInterface.
+
+    Receiving a packet updates the node database (interface.nodes) and publishes the packet, in
+    the same order as the Meshtastic library.
+    """
+
+    def __init__(self, pub):
+        self.pub = pub
+        self.nodes = {}
+        self.closed = False
+
+    def node(self, node_id):
+        return self.nodes.setdefault(node_id, {"num": int(node_id[1:], 16), "user": {"id": node_id, "longName": node_id}})
+
+    def receive_position(self, node_id, lat, lon, recorded_at=None, altitude=None, snr=6.5):
+        """Receives a position packet from a node, recorded by its GPS at recorded_at (defaults to now)."""
+        position = {"latitude": lat, "longitude": lon, "time": int(recorded_at or time.time())}
+        if altitude is not None:
+            position["altitude"] = altitude
+        node = self.node(node_id)
+        node["position"] = dict(position)
+        node["snr"] = snr
+        packet = {"fromId": node_id, "rxSnr": snr, "decoded": {"portnum": "POSITION_APP", "position": position}}
+        self.pub.sendMessage("meshtastic.receive.position", packet=packet, interface=self)
+
+    def receive_telemetry(self, node_id, battery):
+        """Receives a device metrics telemetry packet from a node."""
+        self.node(node_id)["deviceMetrics"] = {"batteryLevel": battery}
+        packet = {"fromId": node_id, "decoded": {"portnum": "TELEMETRY_APP",
+                                                 "telemetry": {"deviceMetrics": {"batteryLevel": battery}}}}
+        self.pub.sendMessage("meshtastic.receive.telemetry", packet=packet, interface=self)
+
+    def close(self):
+        self.closed = True
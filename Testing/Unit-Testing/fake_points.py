@@ -0,0 +1,50 @@
+"""
+Fake GPS points in the shapes uploaded by base stations, shared by the unit tests and benchmarks.
+
+Each fake search starts near UWA and heads south-east, with a new point every second of
+2024-09-16 from 09:00:00.
+"""
+
+START_LAT = -31.9775473
+START_LONG = 115.8160611
+TRACKER_ID = "!84887b30"
+LONGNAME = "base-3200"
+
+
+def make_record(i, station=None, step=1e-5):
+    """Creates the i-th point of a fake search.
+
+    Args:
+        i (int): The point's index in the search.
+        station (int or str, optional): A station to name the point after, as tracker
+            "!tracker<station>" of "base-<station>". Numbered stations are also offset by
+            that many degrees, so every station has distinct bounds. Defaults to TRACKER_ID of LONGNAME.
+        step (float, optional): The degrees of latitude and longitude between points.
+
+    Returns:
+        tuple: The point's key and the point, e.g. ("point3", {...}).
+    """
+    offset = station if isinstance(station, int) else 0
+    return (f"point{i}", {
+        "name": TRACKER_ID if station is None else f"!tracker{station}",
+        "time": f"2024-09-16T{9 + i // 3600 % 12:02d}:{i // 60 % 60:02d}:{i % 60:02d}",
+        "lat": round(START_LAT - offset - i * step, 7),
+        "long": round(START_LONG + offset + i * step, 7),
+        "telemetry": {"battery": 80 - i // 20 % 80, "altitude": 42, "PDOP": 1.2, "SNR": 6.5},
+        "longname": LONGNAME if station is None else f"base-{station}",
+    })
+
+
+def make_records(count, station=None, step=1e-5):
+    """Creates the first count points of a fake search, as (key, point) pairs (see make_record())."""
+    return [make_record(i, station, step) for i in range(count)]
+
+
+def make_points(count, station=None, step=1e-5):
+    """Creates the first count points of a fake search, as a list of {"pointN": {...}} dictionaries."""
+    return [{key: point} for key, point in make_records(count, station, step)]
+
+
+def make_blob(count, station=None, step=1e-5):
+    """Creates a legacy-format blob (the str() of the list of points) holding a fake search's first count points."""
+    return str(make_points(count, station, step))
@@ -0,0 +1,130 @@
+"""
+Tests that base stations in "append" mode upload only their new points, in either wire format, and
+that the web app tails them.
+
+Run from the root directory of the repository:
+    python -m pytest Testing/Unit-Testing
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))    # Allows importing from the root directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "Base-Station"))
+import point_parser
+import retrieve_from_containers
+import uploader as uploader_module
+from uploader import decode_line, encode_line, make_uploader
+from fake_blob_store import FakeBlobServiceClient
+from fake_points import LONGNAME as CONTAINER, make_record
+
+SEARCH_POINTS = 6 * 60 * 2    # A 6-hour search, with a new point every 30 seconds.
+
+
+class BaseUploadTest(unittest.TestCase):
+
+    def setUp(self):
+        retrieve_from_containers.blob_cache.clear()
+
+    def run_search(self, mode, count, wire_format="json"):
+        service = FakeBlobServiceClient()
+        service.create_container(CONTAINER)
+        uploader = make_uploader(mode, service.get_container_client(CONTAINER), CONTAINER, wire_format)
+        uploader.start()
+        for i in range(count):
+            uploader.upload([make_record(i)])
+        return service, uploader
+
+    def test_append_mode_uploads_only_new_points(self):
+        append_service, append_uploader = self.run_search("append", SEARCH_POINTS)
+        overwrite_service, _ = self.run_search("overwrite", SEARCH_POINTS)
+
+        # Both blobs hold the same points.
+        appended = point_parser.parse_points(append_service.containers[CONTAINER][CONTAINER])
+        overwritten = point_parser.parse_points(overwrite_service.containers[CONTAINER][CONTAINER])
+        self.assertEqual(len(appended), SEARCH_POINTS)
+        self.assertEqual(appended, overwritten)
+
+        self.assertEqual(append_uploader.bytes_sent, append_service.bytes_uploaded)
+        self.assertLess(append_service.bytes_uploaded * 100, overwrite_service.bytes_uploaded)
+
+    def test_compact_format_round_trips(self):
+        records = [make_record(i) for i in range(3)] + [
+            ("start", dict(make_record(3)[1], name="O'Brien \"M1\"", time="2024-09-16T09:00:00.5Z",
+                           lat=-31.97754731234, long=115, telemetry={"battery": 50})),
+            ("point04", dict(make_record(4)[1], time=None, lat=float("nan"))),
+        ]
+        data = b"".join(encode_line(key, point, "compact") for key, point in records)
+        self.assertLess(len(data[:data.index(b"\n")]) * 2, len(encode_line(*records[0])))
+
+        for line, (key, point) in zip(data.splitlines(), records[:4]):
+            self.assertEqual(decode_line(line), (key, point))
+        self.assertEqual(point_parser.loads(data[:data.rindex(b"\n", 0, -1) + 1]), [{key: point} for key, point in records[:4]])
+        self.assertEqual(point_parser.parse_points(data, point_parser.COMPACT_CONTENT_TYPE)[3].lat, -31.97754731234)
+        self.assertIsNone(point_parser.parse_points(data)[4].time)
+
+    def test_compact_uploads_are_smaller(self):
+        json_service, _ = self.run_search("append", SEARCH_POINTS)
+        compact_service, _ = self.run_search("append", SEARCH_POINTS, wire_format="compact")
+        self.assertEqual(point_parser.parse_points(compact_service.containers[CONTAINER][CONTAINER]),
+                         point_parser.parse_points(json_service.containers[CONTAINER][CONTAINER]))
+        self.assertLess(compact_service.bytes_uploaded * 2, json_service.bytes_uploaded)
+
+    def test_large_uploads_are_split_into_whole_lines(self):
+        data = b"".join(encode_line(*make_record(i)) for i in range(20))
+        for position in (None, 0):
+            with self.subTest(position=position), mock.patch.object(uploader_module, "MAX_APPEND_BYTES", 500):
+                service = FakeBlobServiceClient()
+                service.create_container(CONTAINER)
+                append_uploader = make_uploader("append", service.get_container_client(CONTAINER), CONTAINER)
+                append_uploader.start()
+                append_uploader.upload_lines(data, position)
+
+                blob = service.containers[CONTAINER][CONTAINER]
+                self.assertEqual(blob, data)
+                self.assertGreater(service.append_count, len(data) // 500)
+                self.assertEqual(point_parser.loads(blob), [{key: point} for key, point in map(make_record, range(20))])
+
+    def test_line_longer_than_one_append_is_rejected(self):
+        data = encode_line(*make_record(0)) + encode_line("point1", dict(make_record(1)[1], name="x" * 600))
+        with mock.patch.object(uploader_module, "MAX_APPEND_BYTES", 500):
+            service = FakeBlobServiceClient()
+            service.create_container(CONTAINER)
+            append_uploader = make_uploader("append", service.get_container_client(CONTAINER), CONTAINER)
+            append_uploader.start()
+            with self.assertRaisesRegex(ValueError, "longer than the 500 bytes of one append"):
+                append_uploader.upload_lines(data, 0)
+
+    def test_web_app_tails_appended_lines(self):
+        for wire_format in ("json", "compact"):
+            with self.subTest(wire_format=wire_format):
+                retrieve_from_containers.blob_cache.clear()
+                self.check_tail_reads(wire_format)
+
+    def check_tail_reads(self, wire_format):
+        service, uploader = self.run_search("append", 10, wire_format)
+        result = retrieve_from_containers.fetch_container_blob(service, CONTAINER)
+        self.assertIsNone(result["error"])
+        self.assertEqual(len(result["track"]), 10)
+
+        tail_reads = retrieve_from_containers.tail_read_stats["tail_reads"]
+        downloaded, sent = service.bytes_downloaded, uploader.bytes_sent
+        uploader.upload([make_record(i) for i in range(10, 13)])
+        result = retrieve_from_containers.fetch_container_blob(service, CONTAINER)
+        self.assertEqual(len(result["track"]), 13)
+        self.assertEqual(retrieve_from_containers.tail_read_stats["tail_reads"], tail_reads + 1)
+        # Only the new lines are downloaded, plus the overlap checked against the cached content.
+        self.assertEqual(service.bytes_downloaded - downloaded,
+                         retrieve_from_containers.TAIL_OVERLAP_BYTES + uploader.bytes_sent - sent)
+
+        # A new search replaces the blob, which is then downloaded again in full.
+        uploader.start()
+        uploader.upload([make_record(0)])
+        result = retrieve_from_containers.fetch_container_blob(service, CONTAINER)
+        self.assertEqual(len(result["track"]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
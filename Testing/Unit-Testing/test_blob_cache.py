@@ -0,0 +1,74 @@
+"""
+Tests that unchanged blobs are served from the blob cache after an empty 304 response, and that
+the cache evicts its least recently used entries by size.
+
+Run from the root directory of the repository:
+    python -m pytest Testing/Unit-Testing
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))    # Allows importing from the root directory.
+import retrieve_from_containers
+from cache import LRUCache
+from retrieve_from_containers import blob_cache, fetch_container_blob
+from fake_blob_store import FakeBlobServiceClient
+from fake_points import make_blob
+
+CONTAINER = "base-3200"
+
+
+class BlobCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        retrieve_from_containers.blob_cache.clear()
+        self.service = FakeBlobServiceClient()
+        self.service.put_blob(CONTAINER, CONTAINER, make_blob(5))
+
+    def test_unchanged_blob_reuses_cached_body(self):
+        first = fetch_container_blob(self.service, CONTAINER)
+        hits, misses = blob_cache.hits, blob_cache.misses
+        requests, downloaded = self.service.request_count, self.service.bytes_downloaded
+
+        second = fetch_container_blob(self.service, CONTAINER)
+        self.assertIsNone(second["error"])
+        self.assertEqual(self.service.request_count - requests, 1)    # A single conditional download.
+        self.assertEqual(self.service.bytes_downloaded, downloaded)    # Answered with an empty 304.
+        self.assertEqual(second["content"], first["content"])
+        self.assertIs(second["track"], first["track"])    # Not parsed again.
+        self.assertEqual((blob_cache.hits - hits, blob_cache.misses - misses), (1, 0))
+
+    def test_rewritten_blob_is_a_miss(self):
+        fetch_container_blob(self.service, CONTAINER)
+        misses = blob_cache.misses
+        self.service.put_blob(CONTAINER, CONTAINER, make_blob(3, station=1))
+        result = fetch_container_blob(self.service, CONTAINER)
+        self.assertEqual(len(result["track"]), 3)
+        self.assertEqual(blob_cache.misses - misses, 1)
+
+    def test_least_recently_used_entries_are_evicted_by_size(self):
+        cache = LRUCache(100)
+        cache.put("a", "A", 40)
+        cache.put("b", "B", 40)
+        cache.get("a")    # Makes "b" the least recently used.
+        cache.put("c", "C", 40)
+
+        self.assertNotIn("b", cache)
+        self.assertEqual((cache.get("a"), cache.get("c")), ("A", "C"))
+        stats = cache.stats()
+        self.assertEqual((stats["entries"], stats["size"], stats["evictions"]), (2, 80, 1))
+
+        # A value larger than the whole cache is not stored, and evicts nothing.
+        cache.put("d", "D", 101)
+        self.assertNotIn("d", cache)
+        self.assertEqual(len(cache), 2)
+
+        # Replacing an entry counts only its new size.
+        cache.put("a", "A2", 10)
+        self.assertEqual(cache.stats()["size"], 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+"""
+Tests the database connection pool with fake connections, so no database is needed.
+
+Run from the root directory of the repository:
+    python -m pytest Testing/Unit-Testing
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))    # Allows importing from the root directory.
+from db_pool import ConnectionPool
+
+THREADS = 16
+
+
+class FakeConnection:
+    """Stands in for a pyodbc connection (and its cursor). Broken connections raise on every call."""
+
+    def __init__(self):
+        self.broken = False
+        self.closed = False
+
+    def check(self):
+        if self.broken:
+            raise RuntimeError("Communication link failure.")
+
+    def cursor(self):
+        self.check()
+        return self
+
+    def execute(self, query, *params):
+        self.check()
+        time.sleep(0.001)
+
+    def fetchone(self):
+        return (1,)
+
+    def commit(self):
+        self.check()
+
+    def rollback(self):
+        self.check()
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(unittest.TestCase):
+
+    def make_pool(self, max_size=4, recycle_seconds=60, pre_ping_after_seconds=60, checkout_timeout=5):
+        self.connections = []
+
+        def connect():
+            self.connections.append(FakeConnection())
+            return self.connections[-1]
+
+        return ConnectionPool(connect, max_size, recycle_seconds, pre_ping_after_seconds, checkout_timeout)
+
+    def test_connections_are_reused_and_bounded(self):
+        pool = self.make_pool()
+
+        def work():
+            for _ in range(10):
+                with pool.connection() as conn:
+                    conn.cursor().execute("SELECT 1")
+
+        threads = [threading.Thread(target=work) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = pool.stats()
+        self.assertEqual(stats["checkouts"], THREADS * 10)
+        self.assertLessEqual(stats["connections_opened"], 4)
+        self.assertEqual(stats["in_use"], 0)
+        self.assertGreater(stats["waits"], 0)
+
+    def test_broken_idle_connection_is_replaced(self):
+        pool = self.make_pool(pre_ping_after_seconds=0)
+        with pool.connection():
+            pass
+        self.connections[0].broken = True
+
+        with pool.connection() as conn:
+            self.assertIsNot(conn, self.connections[0])
+        self.assertEqual(pool.stats()["pre_ping_failures"], 1)
+        self.assertEqual(pool.stats()["open"], 1)
+
+    def test_old_connection_is_recycled(self):
+        pool = self.make_pool(recycle_seconds=0)
+        with pool.connection():
+            pass
+        with pool.connection():
+            pass
+        self.assertTrue(self.connections[0].closed)
+        self.assertEqual(pool.stats()["recycled"], 1)
+
+    def test_broken_connection_is_discarded_after_an_error(self):
+        pool = self.make_pool()
+        with self.assertRaises(ValueError):
+            with pool.connection() as conn:
+                conn.broken = True
+                raise ValueError
+        self.assertEqual(pool.stats()["discarded"], 1)
+        self.assertEqual(pool.stats()["open"], 0)
+
+    def test_checkout_times_out_when_pool_is_exhausted(self):
+        pool = self.make_pool(max_size=1, checkout_timeout=0.05)
+        with pool.connection():
+            with self.assertRaises(TimeoutError):
+                with pool.connection():
+                    pass
+        self.assertEqual(pool.stats()["timeouts"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+"""
+Tests that live fetches append each ping to the pings table once, however many processes upload
+the same search.
+
+Needs pyodbc (and its ODBC driver manager) to import historical_database, but no database.
+
+Run from the root directory of the repository:
+    python -m pytest Testing/Unit-Testing
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))    # Allows importing from the root directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "Base-Station"))
+from uploader import encode_line
+from fake_database import FakePool, FakeSearchHistoryConnection, make_search_rows
+from fake_points import make_blob, make_records
+
+try:
+    import historical_database
+except ImportError:    # pyodbc cannot load without an ODBC driver manager.
+    historical_database = None
+
+SESSION_ID, BASE_STATION = "session", "base-3200"
+
+
+class FakePingsConnection:
+    """Stands in for a pyodbc connection (and its cursor), holding the pings table as a list of rows."""
+
+    def __init__(self):
+        self.rows = []
+        self.queries = []
+        self.result = None
+
+    def cursor(self):
+        return self
+
+    def execute(self, query, params=()):
+        self.queries.append(query)
+        if query.startswith("SELECT MAX(seq)"):
+            self.result = (max((row[2] for row in self.rows), default=None),)
+        elif query.startswith("DELETE FROM pings"):
+            self.rows = []
+        elif query.startswith("INSERT INTO pings"):
+            width = len(historical_database.PING_COLUMNS)
+            self.rows.extend(tuple(params[i:i + width]) for i in range(0, len(params), width))
+
+    def fetchone(self):
+        return self.result
+
+
+class FakeLegacyConnection:
+    """Stands in for a pyodbc connection to a database holding one search only in search_history.gps_JSON."""
+
+    def __init__(self, gps_json):
+        self.gps_json = gps_json
+        self.queries = []
+        self.result = None
+
+    def cursor(self):
+        return self
+
+    def execute(self, query, params=()):
+        self.queries.append(query)
+        self.result = SimpleNamespace(gps_JSON=self.gps_json) if "gps_JSON" in query else None
+
+    def fetchall(self):
+        return []
+
+    def fetchone(self):
+        return self.result
+
+
+@unittest.skipIf(historical_database is None, "historical_database could not be imported.")
+class AppendPingsTest(unittest.TestCase):
+
+    def append(self, conn, gps_data):
+        return historical_database.append_pings(conn, SESSION_ID, BASE_STATION, gps_data)
+
+    def test_stored_count_is_read_from_database(self):
+        # Two processes uploading the same search share only the database.
+        first, second = FakePingsConnection(), FakePingsConnection()
+        self.assertEqual(self.append(first, make_blob(3)), 3)
+        second.rows = first.rows
+        self.assertEqual(self.append(second, make_blob(5)), 5)
+        first.rows = second.rows
+        self.assertEqual(self.append(first, make_blob(5)), 5)
+
+        self.assertEqual([row[2] for row in first.rows], list(range(5)))
+        self.assertIn("UPDLOCK, HOLDLOCK", first.queries[0])
+
+    def test_restarted_upload_replaces_stored_pings(self):
+        conn = FakePingsConnection()
+        self.append(conn, make_blob(5))
+        self.assertEqual(self.append(conn, make_blob(2, station=1)), 2)
+        self.assertEqual([(row[2], row[4]) for row in conn.rows], [(0, "!tracker1"), (1, "!tracker1")])
+
+    def test_only_appended_lines_are_parsed(self):
+        conn = FakePingsConnection()
+        lines = [encode_line(key, point) for key, point in make_records(4)]
+        self.append(conn, b"".join(lines[:2]))
+        # The stored lines are not parsed again, so damaging them does not matter.
+        self.assertEqual(self.append(conn, b"{}\n{}\n" + b"".join(lines[2:])), 4)
+        self.assertEqual([row[3] for row in conn.rows], ["point0", "point1", "point2", "point3"])
+
+    def test_empty_upload_adds_nothing(self):
+        conn = FakePingsConnection()
+        self.assertEqual(self.append(conn, b""), 0)
+        self.append(conn, make_blob(3))
+        self.assertEqual(self.append(conn, b""), 3)
+        self.assertEqual(len(conn.rows), 3)
+
+    def test_missing_coordinates_are_stored_as_null(self):
+        point = SimpleNamespace(key="point0", name="!tracker0", time="2024-09-16T09:00:00", lat="", lon="115.8",
+                                telemetry={}, longname="base-3200")
+        row = historical_database.to_ping_row(SESSION_ID, BASE_STATION, 0, point)
+        self.assertEqual(row[7:9], (None, 115.8))
+
+
+@unittest.skipIf(historical_database is None, "historical_database could not be imported.")
+class LegacyPingsTest(unittest.TestCase):
+
+    def setUp(self):
+        historical_database.legacy_track_cache.clear()
+
+    def test_legacy_search_is_parsed_once(self):
+        conn = FakeLegacyConnection(make_blob(6))
+        with mock.patch.object(historical_database, "pool", FakePool(conn)):
+            first = historical_database.get_pings_after_time(SESSION_ID, BASE_STATION, datetime(2024, 9, 16, 9, 0, 2))
+            second = historical_database.get_pings_after_time(SESSION_ID, BASE_STATION, datetime(2024, 9, 16, 9, 0, 4))
+
+        self.assertEqual([next(iter(point)) for point in first], ["point3", "point4", "point5"])
+        self.assertEqual([next(iter(point)) for point in second], ["point5"])
+        self.assertEqual(sum("gps_JSON" in query for query in conn.queries), 1)
+
+
+@unittest.skipIf(historical_database is None, "historical_database could not be imported.")
+class HistoryPageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rows = make_search_rows(25)
+        self.conn = FakeSearchHistoryConnection(self.rows)
+
+    def get_page(self, after=None):
+        with mock.patch.object(historical_database, "pool", FakePool(self.conn)):
+            return historical_database.get_historical_searches(after=after, page_size=10)
+
+    def test_first_page_is_newest_searches(self):
+        results, next_after = self.get_page()
+        expected = sorted(self.rows, key=FakeSearchHistoryConnection.key, reverse=True)[:10]
+        self.assertEqual(results, expected)
+        self.assertEqual(next_after, [expected[-1].search_date.isoformat(), expected[-1].session_id, expected[-1].base_station])
+        self.assertNotIn("gps_JSON", self.conn.queries[0][0])
+
+    def test_pages_continue_after_last_search(self):
+        seen, after = [], None
+        for _ in range(3):
+            results, after = self.get_page(after)
+            seen.extend(results)
+        # Searches sharing a page's last date and session are neither skipped nor repeated.
+        self.assertEqual(seen, sorted(self.rows, key=FakeSearchHistoryConnection.key, reverse=True))
+        self.assertEqual(self.conn.queries[1][1][-5:], [seen[9].search_date.isoformat(), seen[9].search_date.isoformat(),
+                                                         seen[9].session_id, seen[9].session_id, seen[9].base_station])
+
+    def test_last_page_has_no_next_key(self):
+        results, next_after = self.get_page(self.get_page(self.get_page()[1])[1])
+        self.assertEqual(len(results), 5)
+        self.assertIsNone(next_after)
+
+        self.conn.rows = self.rows[:10]    # Exactly one full page.
+        self.assertIsNone(self.get_page()[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
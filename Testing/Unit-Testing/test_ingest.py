@@ -0,0 +1,143 @@
+"""
+Tests that the background ingest service keeps the live state current, and backs off failing containers.
+
+Run from the root directory of the repository:
+    python -m pytest Testing/Unit-Testing
+"""
+
+import os
+import sys
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))    # Allows importing from the root directory.
+import retrieve_from_containers
+from config import Config
+from ingest import IngestService
+from live_stream import StreamHub
+from track import TIME_FORMAT
+from fake_blob_store import FakeBlobServiceClient
+from fake_points import make_blob
+
+POLL_SECONDS = 0.02
+
+
+class IngestServiceTest(unittest.TestCase):
+
+    def setUp(self):
+        retrieve_from_containers.blob_cache.clear()
+        self.service = FakeBlobServiceClient()
+        self.hub = StreamHub(on_unwatched=lambda container_name: self.ingest.unwatch([container_name]))
+        self.ingest = IngestService(lambda: self.service, POLL_SECONDS, POLL_SECONDS * 8, 60, self.hub)
+
+    def tearDown(self):
+        self.ingest.stop()
+
+    def wait_for(self, condition, timeout=2):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            self.assertLess(time.monotonic(), deadline, "Timed out.")
+            time.sleep(POLL_SECONDS / 2)
+
+    def test_requests_read_the_live_state(self):
+        self.service.put_blob("base-a", "base-a", make_blob(4, "a"))
+        self.ingest.start()
+        self.assertEqual(len(self.ingest.results(["base-a"])[0]["track"]), 4)
+
+        self.service.put_blob("base-a", "base-a", make_blob(7, "a"))
+        self.wait_for(lambda: self.ingest.health()["base-a"]["points"] == 7)
+
+        # Reading the state downloads nothing.
+        requests = self.service.request_count
+        results = self.ingest.results(["base-a"])
+        self.assertEqual(self.service.request_count, requests)
+        self.assertEqual(len(results[0]["track"]), 7)
+        self.assertEqual(self.ingest.health()["base-a"]["status"], "ok")
+
+    def test_changed_tracks_are_published(self):
+        self.service.put_blob("base-b", "base-b", make_blob(2, "b"))
+        subscriber = self.hub.subscribe({"base-b": 0})    # Tracks are only published to subscribers.
+        self.ingest.start()
+        self.ingest.watch(["base-b"])
+        event, _ = subscriber.get(timeout=2)
+        self.assertEqual(event["base-b"]["cursor"], 2)
+
+        self.service.put_blob("base-b", "base-b", make_blob(5, "b"))
+        event, _ = subscriber.get(timeout=2)
+        self.assertEqual((event["base-b"]["start"], event["base-b"]["cursor"]), (2, 5))
+        self.hub.unsubscribe(subscriber)
+
+    def test_failing_container_backs_off(self):
+        results = self.ingest.results(["missing"])
+        self.assertIsNotNone(results[0]["error"])
+        for failures in range(1, 10):
+            delay = self.ingest.backoff(failures)
+            self.assertGreaterEqual(delay, POLL_SECONDS)
+            self.assertLessEqual(delay, POLL_SECONDS * 8)
+
+        self.ingest.start()
+        self.wait_for(lambda: self.ingest.health()["missing"]["failures"] >= 3)
+        health = self.ingest.health()["missing"]
+        self.assertEqual(health["status"], "failing")
+        # Backed off polls are far fewer than one per POLL_SECONDS.
+        time.sleep(POLL_SECONDS * 10)
+        self.assertLess(self.ingest.health()["missing"]["polls"], 10)
+
+    def test_first_fetch_is_recorded_as_a_poll(self):
+        self.service.put_blob("base-f", "base-f", make_blob(3, "f"))
+        self.ingest = IngestService(lambda: self.service, 60, 60, 60, self.hub)
+        self.ingest.start()
+        self.ingest.results(["base-f"])
+        time.sleep(0.1)
+
+        # The poller waits poll_seconds after the request's fetch, rather than fetching again.
+        self.assertEqual(self.service.request_count, 1)
+        self.assertEqual(self.ingest.health()["base-f"]["polls"], 1)
+        self.assertGreater(self.ingest.health()["base-f"]["next_poll_seconds"], 59)
+
+    def test_containers_are_unwatched_with_last_subscriber_once_idle(self):
+        self.service.put_blob("base-c", "base-c", make_blob(3, "c"))
+        subscriber = self.hub.subscribe({"base-c": 0})
+        self.ingest.watch(["base-c"])
+        self.assertIn("base-c", self.ingest.health())
+
+        # Still polled for sessions reading the container without subscribing.
+        self.hub.unsubscribe(subscriber)
+        self.assertIn("base-c", self.ingest.health())
+
+        subscriber = self.hub.subscribe({"base-c": 0})
+        self.ingest.idle_seconds = 0
+        self.hub.unsubscribe(subscriber)
+        self.assertNotIn("base-c", self.ingest.health())
+
+    def test_data_lag_reads_ping_times_as_local_time(self):
+        previous_tz = os.environ.get("TZ")
+        os.environ["TZ"] = "Australia/Perth"    # UTC+8, so reading local times as UTC would be 8 hours out.
+        time.tzset()
+        try:
+            self.service.put_blob("base-d", "base-d", make_blob(1, "d").replace(
+                "2024-09-16T09:00:00", (datetime.now() - timedelta(minutes=5)).strftime(TIME_FORMAT)))
+            self.ingest.results(["base-d"])
+            self.assertAlmostEqual(self.ingest.health()["base-d"]["data_lag_seconds"], 5 * 60, delta=60)
+        finally:
+            if previous_tz is None:
+                del os.environ["TZ"]
+            else:
+                os.environ["TZ"] = previous_tz
+            time.tzset()
+
+    def test_data_lag_reads_ping_times_in_configured_timezone(self):
+        perth_now = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=8)    # Perth has no daylight saving.
+        self.service.put_blob("base-e", "base-e", make_blob(1, "e").replace(
+            "2024-09-16T09:00:00", perth_now.strftime(TIME_FORMAT)))
+        self.ingest.results(["base-e"])
+        previous_timezone, Config.PING_TIMEZONE = Config.PING_TIMEZONE, "Australia/Perth"
+        try:
+            self.assertAlmostEqual(self.ingest.health()["base-e"]["data_lag_seconds"], 0, delta=60)
+        finally:
+            Config.PING_TIMEZONE = previous_timezone
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+"""
+Tests that the live stream fans each published track out to all of its subscribers, and forgets it
+with the last one.
+
+Run from the root directory of the repository:
+    python -m pytest Testing/Unit-Testing
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))    # Allows importing from the root directory.
+from live_stream import StreamHub
+from retrieve_from_containers import make_delta
+from track import Track
+from fake_points import make_points
+
+SUBSCRIBERS = 20
+
+
+def make_track(count):
+    return Track.from_points(make_points(count))
+
+
+class LiveStreamTest(unittest.TestCase):
+
+    def setUp(self):
+        self.unwatched = []
+        self.hub = StreamHub(on_unwatched=self.unwatched.append)
+        self.subscribers = []
+
+    def tearDown(self):
+        for subscriber in self.subscribers:
+            self.hub.unsubscribe(subscriber)
+
+    def subscribe(self, cursors, tracks=None):
+        subscriber = self.hub.subscribe(cursors, tracks)
+        self.subscribers.append(subscriber)
+        return subscriber
+
+    def receive(self, subscriber):
+        item = subscriber.get(timeout=2)
+        self.assertIsNotNone(item, "No event arrived.")
+        event, published_at = item
+        self.hub.record_delivery(published_at)
+        return event
+
+    def test_new_pings_fan_out_to_every_subscriber(self):
+        subscribers = [self.subscribe({"base-a": 5}) for _ in range(SUBSCRIBERS)]
+        self.hub.publish("base-a", make_track(5))    # Nothing new for the subscribers.
+        self.hub.publish("base-a", make_track(8))
+
+        for subscriber in subscribers:
+            delta = self.receive(subscriber)["base-a"]
+            self.assertEqual((delta["start"], delta["cursor"]), (5, 8))
+            self.assertEqual(len(delta["columns"]["lat"]), 3)
+            self.assertIsNone(subscriber.get(timeout=0))
+
+        stats = self.hub.stats()
+        self.assertEqual(stats["subscribers"], SUBSCRIBERS)
+        self.assertEqual(stats["events_published"], SUBSCRIBERS)
+        self.assertEqual(stats["events_delivered"], SUBSCRIBERS)
+        self.assertGreater(stats["fanout_latency_ms"]["max"], 0)
+
+    def test_late_subscriber_catches_up_from_its_cursor(self):
+        self.subscribe({"base-b": 0})
+        self.hub.publish("base-b", make_track(6))
+
+        delta = self.receive(self.subscribe({"base-b": 2}))["base-b"]
+        self.assertEqual((delta["start"], delta["cursor"]), (2, 6))
+
+    def test_first_subscriber_catches_up_from_given_tracks(self):
+        subscriber = self.subscribe({"base-b": 2, "base-e": 0}, {"base-b": make_track(6), "base-e": None})
+        self.assertEqual(self.receive(subscriber), {"base-b": make_delta(make_track(6), 2)})
+        self.assertIsNone(subscriber.get(timeout=0))
+
+        # A track the hub already holds is newer than one read before subscribing, so it is kept.
+        self.hub.publish("base-b", make_track(7))
+        late = self.subscribe({"base-b": 0}, {"base-b": make_track(6)})
+        self.assertEqual(self.receive(late)["base-b"]["cursor"], 7)
+
+    def test_rewritten_blob_is_resent_from_the_start(self):
+        subscriber = self.subscribe({"base-c": 10})
+        self.hub.publish("base-c", make_track(3))
+        delta = self.receive(subscriber)["base-c"]
+        self.assertEqual((delta["start"], delta["cursor"]), (0, 3))
+
+    def test_tracks_are_forgotten_with_last_subscriber(self):
+        # Tracks of containers nobody is watching are not held.
+        self.hub.publish("base-d", make_track(3))
+        self.assertEqual(self.hub.stats()["tracks_held"], 0)
+
+        first = self.hub.subscribe({"base-d": 0})
+        second = self.hub.subscribe({"base-d": 0})
+        self.hub.publish("base-d", make_track(3))
+        self.assertEqual(self.hub.subscriber_count("base-d"), 2)
+
+        self.hub.unsubscribe(first)
+        self.assertEqual((self.hub.stats()["tracks_held"], self.unwatched), (1, []))
+        self.hub.unsubscribe(second)
+        self.assertEqual((self.hub.stats()["tracks_held"], self.unwatched), (0, ["base-d"]))
+        self.assertEqual(self.hub.subscriber_count(), 0)
+
+        # A later subscriber is not sent the forgotten, possibly stale, track.
+        self.assertIsNone(self.subscribe({"base-d": 0}).get(timeout=0.05))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+"""
+Tests that live and historical maps can be built by concurrent requests without sharing state.
+
+Run from the root directory of the repository:
+    python -m pytest Testing/Unit-Testing
+"""
+
+import os
+import sys
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from unittest import mock
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))    # Allows importing from the root directory.
+import folium
+import retrieve_from_containers
+from retrieve_from_containers import MapBuildContext, center_and_zoom, make_delta, parse_cursors, process_data_to_map
+from track import Track
+from fake_blob_store import FakeBlobServiceClient
+from fake_points import make_blob, make_points
+
+THREADS = 16
+POINTS = 50
+
+
+class MapBuildingConcurrencyTest(unittest.TestCase):
+
+    def test_context_matches_track(self):
+        track = Track.from_points(make_points(POINTS, 1))
+        context = MapBuildContext()
+        context.add_track(track)
+        self.assertEqual(context.bounds(), track.bounds())
+        self.assertAlmostEqual(context.centre()[0], track.centroid()[0])
+        self.assertAlmostEqual(context.centre()[1], track.centroid()[1])
+
+    def test_time_filter_matches_linear_scan(self):
+        points = make_points(120, 1)
+        track = Track.from_points(points)
+        for filter_time in ["2024-09-16T08:59:59", "2024-09-16T09:00:00", "2024-09-16T09:01:07", "2024-09-16T09:02:00"]:
+            expected = [point for point in points if list(point.values())[0]["time"] > filter_time]
+            filtered = track.since(datetime.fromisoformat(filter_time))
+            self.assertEqual(len(filtered), len(expected))
+            self.assertEqual(list(filtered.lat), [list(point.values())[0]["lat"] for point in expected])
+
+    def test_each_tracker_has_its_own_trail(self):
+        # One base station's blob, with two trackers' pings interleaved.
+        first, second = make_points(POINTS, 1), make_points(POINTS, 2)
+        points = [point for pair in zip(first, second) for point in pair]
+        track = Track.from_points(points)
+        self.assertEqual(track.trackers, ["!tracker1", "!tracker2"])
+        self.assertEqual([entry["name"] for entry in track.to_telemetry()[:2]], ["!tracker1", "!tracker2"])
+
+        trails = track.by_tracker()
+        self.assertEqual(list(trails), ["!tracker1", "!tracker2"])
+        for trail, expected in zip(trails.values(), (first, second)):
+            self.assertEqual(trail.coordinates(), Track.from_points(expected).coordinates())
+        self.assertEqual(track[10:].by_tracker()["!tracker2"].coordinates(), Track.from_points(second[5:]).coordinates())
+
+        m = folium.Map()
+        process_data_to_map(track, m)
+        trail_colours = [child.options["color"] for child in m._children.values() if isinstance(child, folium.PolyLine)]
+        self.assertEqual(len(trail_colours), 2)
+        self.assertNotEqual(trail_colours[0], trail_colours[1])
+
+    def test_delta_continues_each_trail(self):
+        first, second = make_points(POINTS, 1), make_points(POINTS, 2)
+        track = Track.from_points([point for pair in zip(first, second) for point in pair])
+        m = folium.Map()
+        process_data_to_map(track[:10], m)
+        trail_colours = [child.options["color"] for child in m._children.values() if isinstance(child, folium.PolyLine)]
+
+        # New pings continue from each tracker's last drawn ping, in the colour its trail was drawn in.
+        trails = make_delta(track, 10)["trails"]
+        self.assertEqual(list(trails), ["!tracker1", "!tracker2"])
+        self.assertEqual([trail["colour"] for trail in trails.values()], trail_colours)
+        self.assertEqual([trail["last"] for trail in trails.values()],
+                         [Track.from_points(first[:5]).coordinates()[-1], Track.from_points(second[:5]).coordinates()[-1]])
+
+        # A tracker with no new pings is left out, and one with no earlier pings starts a new trail.
+        self.assertEqual(make_delta(track[:11], 10)["trails"],
+                         {"!tracker1": {"colour": trail_colours[0], "last": trails["!tracker1"]["last"]}})
+        self.assertIsNone(make_delta(track, 0)["trails"]["!tracker2"]["last"])
+
+    def test_cursors_must_be_whole_numbers(self):
+        self.assertEqual(parse_cursors({"base-a": 0, "base-b": 12}), {"base-a": 0, "base-b": 12})
+        for cursors in (None, {}, [3], {"base-a": "abc"}, {"base-a": "3"}, {"base-a": -1}, {"base-a": 1.5},
+                        {"base-a": None}, {"base-a": True}):
+            with self.subTest(cursors=cursors):
+                with self.assertRaises(ValueError):
+                    parse_cursors(cursors)
+
+    def test_concurrent_builds_keep_their_own_bounds(self):
+        barrier = threading.Barrier(THREADS)
+
+        def build(station):
+            track = Track.from_points(make_points(POINTS, station))
+            m = folium.Map()
+            barrier.wait()    # Starts every build at the same time.
+            context = process_data_to_map(track, m)
+            center_and_zoom(m, context)
+            return station, track, context, m
+
+        with ThreadPoolExecutor(max_workers=THREADS) as executor:
+            results = list(executor.map(build, range(THREADS)))
+
+        for station, track, context, m in results:
+            self.assertEqual(context.count, len(track))
+            self.assertEqual(context.bounds(), track.bounds())
+            self.assertAlmostEqual(m.location[0], track.centroid()[0])
+            self.assertAlmostEqual(m.location[1], track.centroid()[1])
+
+    def test_concurrent_live_maps(self):
+        blob_service_client = FakeBlobServiceClient()
+        for station in range(THREADS):
+            blob_service_client.put_blob(f"base-{station}", f"base-{station}", make_blob(POINTS, station))
+        barrier = threading.Barrier(THREADS)
+
+        def fetch(station):
+            containers = [f"base-{station}", f"base-{(station + 1) % THREADS}"]
+            m = folium.Map()
+            barrier.wait()
+            telemetry, blobs, errors, context, html = retrieve_from_containers.retrieve_from_containers(
+                m, "connection string", containers)
+            return containers, telemetry, blobs, errors, context
+
+        with mock.patch.object(retrieve_from_containers, "get_blob_service_client", return_value=blob_service_client):
+            with ThreadPoolExecutor(max_workers=THREADS) as executor:
+                results = list(executor.map(fetch, range(THREADS)))
+
+        for containers, telemetry, blobs, errors, context in results:
+            self.assertEqual(errors, {})
+            self.assertEqual(sorted(blobs), sorted(containers))
+            self.assertEqual({entry["longname"] for entry in telemetry}, set(containers))
+
+            expected = MapBuildContext()
+            for container in containers:
+                expected.add_track(Track.from_points(make_points(POINTS, int(container.split("-")[1]))))
+            self.assertAlmostEqual(context.centre()[0], expected.centre()[0])
+            self.assertAlmostEqual(context.centre()[1], expected.centre()[1])
+            self.assertEqual(context.bounds(), expected.bounds())
+
+
+if __name__ == "__main__":
+    unittest.main()
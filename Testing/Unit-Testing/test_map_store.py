@@ -0,0 +1,72 @@
+"""
+Tests that the map store keeps each session's maps apart, expires them after their time-to-live,
+and evicts the least recently used maps when it is full.
+
+Run from the root directory of the repository:
+    python -m pytest Testing/Unit-Testing
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))    # Allows importing from the root directory.
+from map_store import MapStore
+
+TTL_SECONDS = 60
+
+
+class MapStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch("map_store.time.monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = MapStore(100, TTL_SECONDS)
+
+    def test_maps_expire_after_ttl(self):
+        etag = self.store.put("session-a", "live", "<p>a</p>")
+        self.now += TTL_SECONDS
+        self.assertEqual(self.store.get("session-a", "live"), (b"<p>a</p>", etag))
+
+        self.now += 1
+        self.assertIsNone(self.store.get("session-a", "live"))
+        self.assertEqual(self.store.stats()["entries"], 0)
+
+    def test_replacing_a_map_restarts_its_ttl(self):
+        self.store.put("session-a", "live", "<p>a</p>")
+        self.now += TTL_SECONDS
+        etag = self.store.put("session-a", "live", "<p>b</p>")
+        self.now += TTL_SECONDS
+        self.assertEqual(self.store.get("session-a", "live"), (b"<p>b</p>", etag))
+
+    def test_least_recently_used_maps_are_evicted(self):
+        self.store.put("session-a", "live", "a" * 40)
+        self.store.put("session-b", "live", "b" * 40)
+        self.store.get("session-a", "live")    # Makes session-b's map the least recently used.
+        self.store.put("session-c", "live", "c" * 40)
+
+        self.assertIsNone(self.store.get("session-b", "live"))
+        self.assertIsNotNone(self.store.get("session-a", "live"))
+        self.assertIsNotNone(self.store.get("session-c", "live"))
+        self.assertEqual(self.store.stats()["evictions"], 1)
+
+    def test_sessions_and_kinds_are_kept_apart(self):
+        self.store.put("session-a", "live", "<p>a live</p>")
+        self.store.put("session-a", "historical", "<p>a historical</p>")
+        self.store.put("session-b", "live", "<p>b live</p>")
+
+        self.assertEqual(self.store.get("session-a", "live")[0], b"<p>a live</p>")
+        self.assertEqual(self.store.get("session-b", "live")[0], b"<p>b live</p>")
+        self.assertIsNone(self.store.get("session-b", "historical"))
+
+        self.store.discard("session-a")
+        self.assertIsNone(self.store.get("session-a", "live"))
+        self.assertIsNone(self.store.get("session-a", "historical"))
+        self.assertIsNotNone(self.store.get("session-b", "live"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+"""
+Tests that point_parser reads every format base stations have uploaded in, including names that
+the previous decoding path broke.
+
+Run from the root directory of the repository:
+    python -m pytest Testing/Unit-Testing
+"""
+
+import json
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))    # Allows importing from the root directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "Base-Station"))
+import point_parser
+from point_parser import COMPACT_CONTENT_TYPE, NDJSON_CONTENT_TYPE, Point
+from uploader import encode_line
+from fake_points import make_points, make_records
+
+POINTS = 5
+
+
+def encode_blobs(records):
+    """Returns a blob of the records in each format, paired with its Content-Type (None if it has none)."""
+    points = [{key: point} for key, point in records]
+    return {
+        "legacy": (str(points).encode("utf-8"), None),
+        "json": (json.dumps(points).encode("utf-8"), None),
+        "ndjson": (b"".join(encode_line(key, point) for key, point in records), NDJSON_CONTENT_TYPE),
+        "compact": (b"".join(encode_line(key, point, "compact") for key, point in records), COMPACT_CONTENT_TYPE),
+    }
+
+
+class PointParserTest(unittest.TestCase):
+
+    def check_every_format(self, records):
+        points = [{key: point} for key, point in records]
+        for format_name, (data, content_type) in encode_blobs(records).items():
+            with self.subTest(format=format_name):
+                self.assertEqual(point_parser.loads(data, content_type), points)
+                # The format is also recognised without a Content-Type, e.g. for data read from the database.
+                self.assertEqual(point_parser.loads(data), points)
+                self.assertEqual(json.loads(point_parser.to_json_string(data)), points)
+                self.assertEqual(point_parser.parse_points(data, content_type),
+                                 [Point(key, point["name"], point["time"], point["lat"], point["long"],
+                                        point["telemetry"], point["longname"]) for key, point in records])
+
+    def test_every_format_parses_the_same_points(self):
+        self.check_every_format(make_records(POINTS))
+
+    def test_names_with_quotes(self):
+        # Python writes a string containing an apostrophe in double quotes, and escapes any
+        # apostrophe in a string that also contains a double quote.
+        records = make_records(3)
+        records[0][1]["longname"] = "O'Brien"
+        records[1][1]["longname"] = 'O\'Brien "M1"'
+        records[2][1]["longname"] = 'Team "Alpha"'
+        self.assertIn(b'"O\'Brien"', encode_blobs(records)["legacy"][0])
+        self.check_every_format(records)
+
+    def test_legacy_keywords(self):
+        records = make_records(2)
+        records[0][1]["telemetry"] = {"battery": None, "altitude": True, "PDOP": False, "SNR": 6.5}
+        records[1][1]["longname"] = "None of True"
+        points = [{key: point} for key, point in records]
+        self.assertEqual(point_parser.loads(str(points)), points)
+
+    def test_input_types(self):
+        points = make_points(POINTS)
+        data = str(points)
+        for value in (data, data.encode("utf-8"), bytearray(data.encode("utf-8")), memoryview(data.encode("utf-8"))):
+            with self.subTest(type=type(value).__name__):
+                self.assertEqual(point_parser.loads(value), points)
+
+    def test_missing_fields_take_defaults(self):
+        records = point_parser.parse_points([{"point0": {"lat": -31.9, "long": 115.8}}] + make_points(1))
+        self.assertEqual(records[0], Point("point0", "Unnamed Point", "00:00:00T00:00:00", -31.9, 115.8, {}, None))
+        self.assertEqual(records[1].name, "!84887b30")
+
+    def test_invalid_data(self):
+        for data in (b"[{'point0': ", b'{"point0": {"lat": }}\n', b"[0, \"!84887b30\"]\n", b"not points"):
+            with self.subTest(data=data):
+                with self.assertRaises(ValueError):
+                    point_parser.parse_points(data)
+
+    def test_points_after_a_start_are_parsed(self):
+        records = make_records(POINTS)
+        expected = point_parser.parse_points([{key: point} for key, point in records])
+        for format_name, (data, content_type) in encode_blobs(records).items():
+            with self.subTest(format=format_name):
+                self.assertEqual(point_parser.parse_points_from(data, 2, content_type), (expected[2:], POINTS))
+                self.assertEqual(point_parser.parse_points_from(data, 2), (expected[2:], POINTS))
+                self.assertEqual(point_parser.parse_points_from(data, POINTS + 1), ([], POINTS))
+
+        # Lines before the start are not parsed.
+        data = b"not points\n\n" + encode_blobs(records)["ndjson"][0]
+        self.assertEqual(point_parser.parse_points_from(data, 1, NDJSON_CONTENT_TYPE), (expected, POINTS + 1))
+
+    def test_empty_data_has_no_points(self):
+        for data in (b"", "", b"\n", []):
+            with self.subTest(data=data):
+                self.assertEqual(point_parser.parse_points_from(data, 0), ([], 0))
+                self.assertEqual(point_parser.parse_points_from(data, 3), ([], 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+Tests that a live map is only drawn again when one of its blobs' ETags changed, and that maps
+missing a container are never cached.
+
+Run from the root directory of the repository:
+    python -m pytest Testing/Unit-Testing
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))    # Allows importing from the root directory.
+import folium
+import retrieve_from_containers
+from retrieve_from_containers import fetch_containers, render_cache, render_stats
+from fake_blob_store import FakeBlobServiceClient
+from fake_points import make_blob
+
+CONTAINERS = ["base-1", "base-2"]
+
+
+class RenderCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        retrieve_from_containers.blob_cache.clear()
+        render_cache.clear()
+        self.service = FakeBlobServiceClient()
+        for station, container_name in enumerate(CONTAINERS, 1):
+            self.service.put_blob(container_name, container_name, make_blob(4, station))
+
+    def render(self, container_names=CONTAINERS):
+        """Fetches the containers and renders their live map, returning the map and the number of renders made."""
+        renders = render_stats["renders"]
+        results = fetch_containers(self.service, container_names)
+        _, _, fetch_errors, _, html = retrieve_from_containers.retrieve_from_containers(
+            folium.Map(), None, container_names, fetch_results=results)
+        return html, fetch_errors, render_stats["renders"] - renders
+
+    def test_unchanged_blobs_hit_the_cache(self):
+        html, _, renders = self.render()
+        self.assertEqual(renders, 1)
+        hits = render_cache.hits
+
+        cached_html, fetch_errors, renders = self.render()
+        self.assertEqual((renders, fetch_errors), (0, {}))
+        self.assertEqual(cached_html, html)
+        self.assertEqual(render_cache.hits - hits, 1)
+
+    def test_changed_etag_misses_the_cache(self):
+        self.render()
+        self.service.put_blob("base-2", "base-2", make_blob(6, 2))
+        misses = render_cache.misses
+
+        _, _, renders = self.render()
+        self.assertEqual(renders, 1)
+        self.assertEqual(render_cache.misses - misses, 1)
+        self.assertEqual(len(render_cache), 2)    # The map of the previous ETags is kept until evicted.
+
+    def test_maps_with_fetch_errors_are_not_cached(self):
+        for _ in range(2):
+            _, fetch_errors, renders = self.render(CONTAINERS + ["missing"])
+            self.assertIn("missing", fetch_errors)
+            self.assertEqual(renders, 1)
+        self.assertEqual(len(render_cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
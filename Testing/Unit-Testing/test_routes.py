@@ -0,0 +1,167 @@
+"""
+Tests the web app's routes with the Flask test client, without Azure or the database.
+
+Needs pyodbc (and its ODBC driver manager), which historical_database imports, but no database.
+
+Run from the root directory of the repository:
+    python -m pytest Testing/Unit-Testing
+"""
+
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))    # Allows importing from the root directory.
+import retrieve_from_containers
+from config import Config
+from fake_blob_store import FakeBlobServiceClient
+from fake_database import FakePool, FakeSearchHistoryConnection, make_search_rows
+from fake_points import make_blob, make_points
+
+try:
+    import historical_database
+except ImportError:    # pyodbc cannot load without an ODBC driver manager.
+    historical_database = None
+
+app = None
+routes = None
+
+
+def setUpModule():
+    global app, routes
+    if historical_database is None:
+        return
+    from application import create_app
+    app = create_app()
+    app.secret_key = "test"
+    from application import routes
+    routes.ingest_service.stop()    # Containers are fetched by the requests themselves.
+
+
+@unittest.skipIf(historical_database is None, "historical_database could not be imported.")
+class RouteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = app.test_client()
+
+    def test_pings_rejects_invalid_cursors(self):
+        for body in ({}, {"cursors": {}}, {"cursors": {"base-3200": "abc"}}, {"cursors": {"base-3200": -1}}, [1]):
+            with self.subTest(body=body):
+                response = self.client.post("/api/pings", json=body)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.get_json())
+
+    def test_stream_rejects_invalid_cursors(self):
+        for query in ("", "not json", "[1]", '{"base-3200": "abc"}', '{"base-3200": 1.5}', '{"base-3200": -1}'):
+            with self.subTest(query=query):
+                response = self.client.get("/api/stream", query_string={"cursors": query})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.get_json())
+
+    def test_load_more_pages_through_searches(self):
+        rows = make_search_rows(25)
+        conn = FakeSearchHistoryConnection(rows)
+        listed, after = [], None
+        with mock.patch.object(historical_database, "pool", FakePool(conn)), \
+                mock.patch.object(Config, "HISTORY_PAGE_SIZE", 10):
+            for page_length in (10, 10, 5):
+                # The Load More button sends back the previous response's 'next' key as JSON.
+                form = {"start-date": "", "end-date": "", "after": json.dumps(after) if after else ""}
+                data = self.client.post("/filter-search", data=form).get_json()
+                self.assertEqual(len(data["searches"]), page_length)
+                listed.extend((search[0], search[1]) for search in data["searches"])
+                after = data["next"]
+
+        self.assertIsNone(after)
+        expected = sorted(rows, key=FakeSearchHistoryConnection.key, reverse=True)
+        self.assertEqual(listed, [(row.session_id, row.base_station) for row in expected])
+
+    def test_load_more_rejects_invalid_keys(self):
+        for after in ("not json", '"2024-09-01"', '["2024-09-01", "session0"]'):
+            with self.subTest(after=after):
+                response = self.client.post("/filter-search", data={"after": after})
+                self.assertEqual(response.status_code, 400)
+
+    def test_stats_report_blob_cache_hits_and_misses(self):
+        retrieve_from_containers.blob_cache.clear()
+        service = FakeBlobServiceClient()
+        service.put_blob("base-3200", "base-3200", make_blob(3))
+        before = self.client.get("/api/stats").get_json()["blob_cache"]
+
+        retrieve_from_containers.fetch_container_blob(service, "base-3200")    # A miss.
+        retrieve_from_containers.fetch_container_blob(service, "base-3200")    # A hit, answered with a 304.
+        after = self.client.get("/api/stats").get_json()["blob_cache"]
+        self.assertEqual((after["hits"] - before["hits"], after["misses"] - before["misses"]), (1, 1))
+        self.assertEqual(after["entries"], 1)
+
+    def map_id(self, client):
+        """Returns the map ID assigned to a test client's session by its first map request."""
+        client.get("/maps/live")
+        with client.session_transaction() as session:
+            return session["map_id"]
+
+    def test_sessions_are_served_their_own_maps(self):
+        other = app.test_client()
+        routes.map_store.put(self.map_id(self.client), "live", "<p>first</p>")
+        routes.map_store.put(self.map_id(other), "live", "<p>second</p>")
+
+        self.assertEqual(self.client.get("/maps/live").data, b"<p>first</p>")
+        self.assertEqual(other.get("/maps/live").data, b"<p>second</p>")
+        # A session without a stored map of a kind is served the default map.
+        self.assertEqual(self.client.get("/maps/historical").data, routes.default_map()[0])
+        self.assertEqual(self.client.get("/maps/unknown").status_code, 404)
+
+    def test_unchanged_map_is_revalidated_with_304(self):
+        etag = routes.map_store.put(self.map_id(self.client), "filtered", "<p>filtered</p>")
+        response = self.client.get("/maps/filtered")
+        self.assertEqual((response.status_code, response.get_etag()[0]), (200, etag))
+        self.assertEqual(response.headers["Cache-Control"], "private, no-cache")
+
+        response = self.client.get("/maps/filtered", headers={"If-None-Match": f'"{etag}"'})
+        self.assertEqual((response.status_code, response.data), (304, b""))
+
+        new_etag = routes.map_store.put(self.map_id(self.client), "filtered", "<p>refiltered</p>")
+        response = self.client.get("/maps/filtered", headers={"If-None-Match": f'"{etag}"'})
+        self.assertEqual((response.status_code, response.get_etag()[0], response.data), (200, new_etag, b"<p>refiltered</p>"))
+
+    def download(self, base_station="base-3200", gpx_data=None, pings=()):
+        """Downloads a search's GPX file, with the database returning gpx_data and pings."""
+        with mock.patch.object(historical_database, "get_gpx_data", return_value=gpx_data) as get_gpx_data, \
+                mock.patch.object(historical_database, "get_search_track", return_value=list(pings)) as get_search_track:
+            response = self.client.get(f"/download/session/{base_station}")
+        return response, get_gpx_data.call_count, get_search_track.call_count
+
+    def test_download_serves_stored_gpx(self):
+        routes.gpx_cache.clear()
+        response, _, track_reads = self.download(gpx_data="<gpx>stored</gpx>")
+        self.assertEqual((response.status_code, response.data), (200, b"<gpx>stored</gpx>"))
+        self.assertEqual(response.mimetype, "application/gpx+xml")
+        self.assertEqual(track_reads, 0)
+
+        # A stored GPX file never changes, so it is served from the cache afterwards.
+        response, gpx_reads, _ = self.download(gpx_data="<gpx>changed</gpx>")
+        self.assertEqual((response.data, gpx_reads), (b"<gpx>stored</gpx>", 0))
+
+    def test_download_converts_pings_without_stored_gpx(self):
+        routes.gpx_cache.clear()
+        response, _, track_reads = self.download(pings=make_points(3))
+        self.assertEqual((response.status_code, track_reads), (200, 1))
+        self.assertEqual(response.data.count(b"<trkpt"), 3)
+        self.assertEqual(len(routes.gpx_cache), 0)    # A running search's pings may still grow.
+
+        response, _, _ = self.download()
+        self.assertEqual(response.status_code, 404)
+
+    def test_download_name_is_quoted(self):
+        routes.gpx_cache.clear()
+        response, _, _ = self.download("base 3200; x", gpx_data="<gpx/>")
+        self.assertEqual(response.headers["Content-Disposition"], 'attachment; filename="session_base 3200; x.gpx"')
+
+        response, _, _ = self.download("bäse", gpx_data="<gpx/>")
+        self.assertIn("filename*=UTF-8''session_b%C3%A4se.gpx", response.headers["Content-Disposition"])
+
+
+if __name__ == "__main__":
+    unittest.main()
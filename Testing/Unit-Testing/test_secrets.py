@@ -0,0 +1,99 @@
+"""
+Tests that secrets are fetched once, served from the cache, and refreshed in the background.
+
+Run from the root directory of the repository:
+    python -m pytest Testing/Unit-Testing
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))    # Allows importing from the root directory.
+from get_key import SecretCache, LocalBackend
+
+
+class FakeBackend:
+    """Stands in for Key Vault, counting fetches and failing when told to."""
+
+    def __init__(self):
+        self.fetches = 0
+        self.failing = False
+        self.version = 1
+
+    def fetch(self, name):
+        self.fetches += 1
+        if self.failing:
+            raise ConnectionError("Key Vault is unreachable.")
+        return f"{name}-v{self.version}"
+
+
+class SecretCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = FakeBackend()
+        self.backends_made = 0
+
+        def make_backend():
+            self.backends_made += 1
+            return self.backend
+
+        self.make_backend = make_backend
+
+    def wait_for(self, condition, timeout=2):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            self.assertLess(time.monotonic(), deadline, "Timed out.")
+            time.sleep(0.01)
+
+    def test_reads_are_served_from_the_cache(self):
+        cache = SecretCache(self.make_backend, ttl_seconds=3600, refresh_before_seconds=60)
+        threads = [threading.Thread(target=cache.get, args=("db_password",)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for _ in range(1000):
+            self.assertEqual(cache.get("db_password"), "db_password-v1")
+
+        self.assertEqual(self.backend.fetches, 1)
+        self.assertEqual(self.backends_made, 1)
+        self.assertEqual(cache.stats()["reads"], 1008)
+
+    def test_secrets_are_refreshed_in_the_background(self):
+        cache = SecretCache(self.make_backend, ttl_seconds=0.2, refresh_before_seconds=0.1, retry_seconds=0.05)
+        self.assertEqual(cache.get("db_password"), "db_password-v1")
+
+        self.backend.version = 2
+        self.wait_for(lambda: cache.get("db_password") == "db_password-v2")
+
+        # A failing refresh keeps serving the last value, and is retried.
+        self.backend.failing = True
+        self.wait_for(lambda: cache.stats()["refresh_failures"] >= 2)
+        self.assertEqual(cache.get("db_password"), "db_password-v2")
+
+        self.backend.failing = False
+        self.backend.version = 3
+        self.wait_for(lambda: cache.get("db_password") == "db_password-v3")
+        cache.clear()
+
+    def test_local_backend_reads_environment_then_key_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            key_filepath = os.path.join(directory, "keys.txt")
+            with open(key_filepath, "w") as file:
+                file.write("key1:abc:def\npassword:hunter2\n")
+            backend = LocalBackend(key_filepath)
+
+            with mock.patch.dict(os.environ, {"SES_DB_PASSWORD": "", "SES_BLOB_STORAGE_KEY": ""}):
+                self.assertEqual(backend.fetch("db_password"), "hunter2")
+                self.assertEqual(backend.fetch("blob_storage_key"), "abc:def")
+            with mock.patch.dict(os.environ, {"SES_DB_PASSWORD": "from-env"}):
+                self.assertEqual(backend.fetch("db_password"), "from-env")
+
+
+if __name__ == "__main__":
+    unittest.main()
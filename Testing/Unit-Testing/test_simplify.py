@@ -0,0 +1,70 @@
+"""
+Tests that trails are simplified without moving their ends or losing the vertices that shape them.
+
+Run from the root directory of the repository:
+    python -m pytest Testing/Unit-Testing
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))    # Allows importing from the root directory.
+from simplify import douglas_peucker, fit_zoom, simplify_track, tolerance_for_zoom
+from track import Track
+from fake_points import make_points
+
+LAT, LON = -31.9775473, 115.8160611
+STEP = 1e-4    # About 10 metres.
+
+
+class SimplifyTest(unittest.TestCase):
+
+    def test_collinear_points_are_dropped(self):
+        lat = [LAT + i * STEP for i in range(10)]
+        lon = [LON + i * STEP for i in range(10)]
+        self.assertEqual(douglas_peucker(lat, lon, 1.0).tolist(), [0, 9])
+
+    def test_endpoints_and_corners_are_kept(self):
+        # North for five steps, then east for five steps.
+        lat = [LAT + min(i, 5) * STEP for i in range(11)]
+        lon = [LON + max(i - 5, 0) * STEP for i in range(11)]
+        self.assertEqual(douglas_peucker(lat, lon, 1.0).tolist(), [0, 5, 10])
+
+        # A detour within the tolerance is dropped, but the ends are always kept.
+        lat = [LAT, LAT + STEP, LAT + 2 * STEP]
+        lon = [LON, LON + 1e-6, LON]
+        self.assertEqual(douglas_peucker(lat, lon, 1.0).tolist(), [0, 2])
+
+    def test_zero_tolerance_keeps_every_turn(self):
+        lat = [LAT + i * STEP for i in range(6)]
+        lon = [LON + (i % 2) * STEP for i in range(6)]    # A zigzag, with a turn at every vertex.
+        self.assertEqual(douglas_peucker(lat, lon, 0).tolist(), list(range(6)))
+
+        # Vertices exactly on the line are still dropped.
+        lat = [LAT + i * STEP for i in range(4)]
+        self.assertEqual(douglas_peucker(lat, [LON] * 4, 0).tolist(), [0, 3])
+
+    def test_short_lines_are_unchanged(self):
+        self.assertEqual(douglas_peucker([], [], 10).tolist(), [])
+        self.assertEqual(douglas_peucker([LAT], [LON], 10).tolist(), [0])
+        self.assertEqual(douglas_peucker([LAT, LAT + STEP], [LON, LON], 10).tolist(), [0, 1])
+
+        track = Track.from_points(make_points(2))
+        self.assertEqual(simplify_track(track, 1000.0), track.coordinates())
+
+    def test_track_is_simplified_to_its_ends(self):
+        track = Track.from_points(make_points(50))    # A straight line.
+        coordinates = simplify_track(track, 1.0)
+        self.assertEqual(coordinates, [track.coordinates()[0], track.coordinates()[-1]])
+
+    def test_tolerance_shrinks_with_zoom(self):
+        bounds = Track.from_points(make_points(50)).bounds()
+        zoom = fit_zoom(bounds, 800)
+        self.assertLess(fit_zoom([(LAT, LON), (LAT + 1, LON + 1)], 800), zoom)
+        self.assertEqual(fit_zoom([(LAT, LON), (LAT, LON)], 800), 18)
+        self.assertAlmostEqual(tolerance_for_zoom(zoom + 1, LAT, 1.5), tolerance_for_zoom(zoom, LAT, 1.5) / 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
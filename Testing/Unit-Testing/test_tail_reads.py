@@ -0,0 +1,95 @@
+"""
+Tests that the web app reads only the new tail of a cached blob, and downloads a blob again in full
+when it was rewritten or shrank.
+
+Run from the root directory of the repository:
+    python -m pytest Testing/Unit-Testing
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))    # Allows importing from the root directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "Base-Station"))
+import retrieve_from_containers
+from retrieve_from_containers import TAIL_OVERLAP_BYTES, fetch_container_blob, tail_read_stats
+from track import Track
+from fake_blob_store import FakeBlobServiceClient
+from uploader import encode_line
+from fake_points import make_blob, make_points, make_records
+
+CONTAINER = "base-3200"
+
+
+class TailReadTest(unittest.TestCase):
+
+    def setUp(self):
+        retrieve_from_containers.blob_cache.clear()
+        self.service = FakeBlobServiceClient()
+
+    def fetch(self, blob):
+        """Replaces the container's blob, then fetches it through the blob cache."""
+        self.service.put_blob(CONTAINER, CONTAINER, blob)
+        result = fetch_container_blob(self.service, CONTAINER)
+        self.assertIsNone(result["error"])
+        return result
+
+    def test_grown_list_is_read_from_its_tail(self):
+        self.fetch(make_blob(5))
+        stats, downloaded, requests = dict(tail_read_stats), self.service.bytes_downloaded, self.service.request_count
+
+        result = self.fetch(make_blob(8))
+        self.assertEqual(tail_read_stats["tail_reads"], stats["tail_reads"] + 1)
+        self.assertEqual(tail_read_stats["full_reloads"], stats["full_reloads"])
+        self.assertEqual(self.service.request_count - requests, 1)    # A single ranged download.
+        # Only the new points are downloaded, plus the overlap checked against the cached content.
+        self.assertEqual(self.service.bytes_downloaded - downloaded,
+                         TAIL_OVERLAP_BYTES + len(make_blob(8)) - len(make_blob(5)))
+        self.assertEqual(result["content"], make_blob(8).encode("utf-8"))
+        self.assertEqual(result["track"].coordinates(), Track.from_points(make_points(8)).coordinates())
+
+    def test_grown_lines_are_read_from_their_tail(self):
+        lines = [encode_line(key, point) for key, point in make_records(8)]
+        self.fetch(b"".join(lines[:5]))
+        stats, downloaded, requests = dict(tail_read_stats), self.service.bytes_downloaded, self.service.request_count
+
+        result = self.fetch(b"".join(lines))
+        self.assertEqual(tail_read_stats["tail_reads"], stats["tail_reads"] + 1)
+        self.assertEqual(self.service.request_count - requests, 1)
+        self.assertEqual(self.service.bytes_downloaded - downloaded, TAIL_OVERLAP_BYTES + len(b"".join(lines[5:])))
+        self.assertEqual(len(result["track"]), 8)
+
+    def test_ranged_download_reports_range_size(self):
+        # Like the Azure SDK, which reports the whole blob's size only in the content range.
+        self.service.put_blob(CONTAINER, CONTAINER, b"x" * 1000)
+        downloader = self.service.get_container_client(CONTAINER).download_blob(CONTAINER, offset=900)
+        self.assertEqual((len(downloader.readall()), downloader.properties.size), (100, 100))
+        self.assertEqual(downloader.properties.content_range, "bytes 900-999/1000")
+        self.assertEqual(retrieve_from_containers.blob_size(downloader.properties), 1000)
+
+    def test_rewritten_blob_is_downloaded_in_full(self):
+        self.fetch(make_blob(5))
+        stats = dict(tail_read_stats)
+
+        # A longer blob that does not start with the cached content, e.g. from another tracker.
+        result = self.fetch(make_blob(8, station=1))
+        self.assertEqual(tail_read_stats["tail_reads"], stats["tail_reads"])
+        self.assertEqual(tail_read_stats["full_reloads"], stats["full_reloads"] + 1)
+        self.assertEqual(result["track"].trackers, ["!tracker1"])
+        self.assertEqual(len(result["track"]), 8)
+
+    def test_shrunk_blob_is_downloaded_in_full(self):
+        self.fetch(make_blob(50))
+        stats = dict(tail_read_stats)
+
+        # The blob is now shorter than the ranged download's offset, which Azure answers with 416.
+        self.assertLess(len(make_blob(1)), len(make_blob(50)) - TAIL_OVERLAP_BYTES)
+        result = self.fetch(make_blob(1))
+        self.assertEqual(tail_read_stats["tail_reads"], stats["tail_reads"])
+        self.assertEqual(tail_read_stats["full_reloads"], stats["full_reloads"] + 1)
+        self.assertEqual(len(result["track"]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+"""
+Tests that base stations handle their trackers' packets as they arrive, and measure the latency.
+
+Run from the root directory of the repository:
+    python -m pytest Testing/Unit-Testing
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "Base-Station"))
+from tracker_events import TrackerListener
+from fake_meshtastic import FakeInterface, FakePub
+
+TRACKER_ID = "!84887b30"
+OTHER_TRACKER_ID = "!84887b31"
+FALLBACK_POLL_SECONDS = 120
+
+
+class TrackerListenerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.pub = FakePub()
+        self.interface = FakeInterface(self.pub)
+        self.listener = TrackerListener([TRACKER_ID], "base-3200")
+        self.listener.subscribe(self.pub)
+
+    def test_packets_become_points(self):
+        self.interface.receive_telemetry(TRACKER_ID, 87)
+        self.interface.receive_position(TRACKER_ID, -31.97, 115.81, altitude=12)
+        point = self.listener.wait(timeout=1)
+        self.assertEqual((point["name"], point["lat"], point["long"]), (TRACKER_ID, -31.97, 115.81))
+        self.assertEqual(point["telemetry"], {"battery": 87, "altitude": 12, "PDOP": "", "SNR": 6.5})
+        self.assertEqual(point["longname"], "base-3200")
+
+        # Repeated positions, and other nodes' packets, are ignored.
+        recorded_at = time.time() - 5
+        self.interface.receive_position(TRACKER_ID, -31.98, 115.82, recorded_at)
+        self.interface.receive_position(TRACKER_ID, -31.98, 115.82, recorded_at)
+        self.interface.receive_position("!00000001", -31.99, 115.83)
+        self.assertEqual(self.listener.wait(timeout=1)["lat"], -31.98)
+        self.assertIsNone(self.listener.wait(timeout=0.05))
+
+        # A fallback poll finding the same position is not new either.
+        self.assertFalse(self.listener.offer(dict(point, lat=-31.98, long=115.82,
+                                                  time=self.listener.latest[TRACKER_ID]["time"])))
+
+    def test_trackers_are_deduplicated_separately(self):
+        listener = TrackerListener([TRACKER_ID, OTHER_TRACKER_ID], "base-3200")
+        listener.subscribe(self.pub)
+        recorded_at = time.time() - 5
+        self.interface.receive_telemetry(OTHER_TRACKER_ID, 42)
+        self.interface.receive_position(TRACKER_ID, -31.97, 115.81, recorded_at)
+        self.interface.receive_position(OTHER_TRACKER_ID, -31.97, 115.81, recorded_at)
+        self.interface.receive_position(TRACKER_ID, -31.97, 115.81, recorded_at)
+        points = [listener.wait(timeout=1), listener.wait(timeout=1)]
+        self.assertEqual([(point["name"], point["telemetry"]["battery"]) for point in points],
+                         [(TRACKER_ID, None), (OTHER_TRACKER_ID, 42)])
+        self.assertIsNone(listener.wait(timeout=0.05))
+
+        # A fallback poll looks each tracker up by node ID, and only returns positions not yet seen.
+        self.interface.node(OTHER_TRACKER_ID)["position"] = {"latitude": -31.96, "longitude": 115.8, "time": int(time.time())}
+        self.interface.node("!00000001")
+        new_points, missing = listener.poll(self.interface.nodes)
+        self.assertEqual([(point["name"], point["lat"]) for point in new_points], [(OTHER_TRACKER_ID, -31.96)])
+        self.assertEqual(missing, [])
+        self.assertEqual(listener.poll({})[1], [TRACKER_ID, OTHER_TRACKER_ID])
+        listener.unsubscribe(self.pub)
+
+    def test_event_latency(self):
+        # Packets arrive on the Meshtastic reader thread while the main loop waits, as in base.py.
+        uploaded = []
+
+        def main_loop():
+            while len(uploaded) < 5:
+                point = self.listener.wait(timeout=2)
+                uploaded.append(self.listener.latency.record(point, "event"))
+
+        thread = threading.Thread(target=main_loop)
+        thread.start()
+        for i in range(5):
+            time.sleep(0.02)
+            self.interface.receive_position(TRACKER_ID, -31.97 - i * 1e-4, 115.81)
+        thread.join(timeout=5)
+
+        # Points are uploaded as soon as they arrive. Ping times are whole seconds, so allow one.
+        self.assertEqual(self.listener.latency.counts, {"event": 5, "poll": 0})
+        self.assertLess(self.listener.latency.max, 1.5)
+        self.listener.unsubscribe(self.pub)
+
+    def test_silent_trackers_are_polled(self):
+        listener = TrackerListener([TRACKER_ID, OTHER_TRACKER_ID], "base-3200")
+        listener.subscribe(self.pub)
+        start = time.monotonic()
+        self.assertEqual(listener.silent(FALLBACK_POLL_SECONDS, start), [])
+        self.assertAlmostEqual(listener.seconds_until_silent(FALLBACK_POLL_SECONDS, start), FALLBACK_POLL_SECONDS, delta=1)
+
+        # One tracker keeps sending packets, while the other's are missed.
+        time.sleep(0.01)
+        self.interface.receive_telemetry(TRACKER_ID, 87)
+        later = start + FALLBACK_POLL_SECONDS
+        self.assertEqual(listener.silent(FALLBACK_POLL_SECONDS, later), [OTHER_TRACKER_ID])
+        self.assertEqual(listener.seconds_until_silent(FALLBACK_POLL_SECONDS, later), 0)
+
+        # Polling the silent tracker finds its position, and counts it as heard from again.
+        self.interface.node(OTHER_TRACKER_ID)["position"] = {"latitude": -31.96, "longitude": 115.8, "time": int(time.time())}
+        new_points, missing = listener.poll(self.interface.nodes, listener.silent(FALLBACK_POLL_SECONDS, later))
+        self.assertEqual([point["name"] for point in new_points], [OTHER_TRACKER_ID])
+        self.assertEqual(missing, [])
+        self.assertEqual(listener.silent(FALLBACK_POLL_SECONDS, time.monotonic() + FALLBACK_POLL_SECONDS / 2), [])
+        listener.unsubscribe(self.pub)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+"""
+Tests that base stations keep their points through an uplink outage, and catch up in batches.
+
+Run from the root directory of the repository:
+    python -m pytest Testing/Unit-Testing
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))    # Allows importing from the root directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "Base-Station"))
+import point_parser
+import upload_queue
+from upload_queue import BatchUploader, UploadLog
+from uploader import make_uploader
+from fake_blob_store import FakeBlobServiceClient
+from fake_points import LONGNAME as CONTAINER, make_record
+
+OUTAGE_POINTS = 120    # An hour-long outage, with a new point every 30 seconds.
+
+
+class UploadQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, CONTAINER)
+        self.service = FakeBlobServiceClient()
+        self.service.create_container(CONTAINER)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def start_uploader(self, log, new_search, mode="append", wire_format="json"):
+        uploader = make_uploader(mode, self.service.get_container_client(CONTAINER), CONTAINER, wire_format)
+        batch_uploader = BatchUploader(log, uploader, max_batch_bytes=64 * 1024, retry_seconds=0.01,
+                                       max_backoff_seconds=0.05, new_search=new_search)
+        batch_uploader.start()
+        self.addCleanup(batch_uploader.stop)
+        return batch_uploader
+
+    def blob(self):
+        return self.service.containers[CONTAINER][CONTAINER]
+
+    def test_outage_is_caught_up_in_batches(self):
+        log = UploadLog(self.path)
+        log.reset()
+        batch_uploader = self.start_uploader(log, new_search=True)
+        log.append([make_record(0)])
+        self.assertTrue(log.wait_until_uploaded(timeout=5))
+
+        self.service.offline = True
+        requests = self.service.append_count
+        for i in range(1, OUTAGE_POINTS + 1):
+            log.append([make_record(i)])
+        time.sleep(0.2)
+        self.assertGreater(batch_uploader.stats["failures"], 0)
+        self.assertEqual(len(point_parser.parse_points(self.blob())), 1)
+
+        self.service.offline = False
+        self.assertTrue(log.wait_until_uploaded(timeout=5))
+        with open(self.path, "rb") as f:
+            self.assertEqual(self.blob(), f.read())
+        self.assertEqual(len(point_parser.parse_points(self.blob())), OUTAGE_POINTS + 1)
+        # The whole outage is caught up in one append, not one request per point.
+        self.assertEqual(self.service.append_count - requests, 1)
+
+    def test_restart_resumes_from_checkpoint(self):
+        log = UploadLog(self.path)
+        log.reset()
+        batch_uploader = self.start_uploader(log, new_search=True)
+        log.append([make_record(i) for i in range(10)])
+        self.assertTrue(log.wait_until_uploaded(timeout=5))
+        batch_uploader.stop()
+
+        # The base station stops after an upload but before its checkpoint, and while writing a point.
+        log.append([make_record(i) for i in range(10, 15)])
+        self.service.containers[CONTAINER][CONTAINER] += log.read(log.uploaded, log.size)
+        log.append([make_record(i) for i in range(15, 20)])
+        with open(self.path, "ab") as f:
+            f.write(b'{"point20":{"name":')
+
+        log = UploadLog(self.path)
+        self.assertEqual(log.count, 20)
+        self.assertEqual(log.latest_points(), {"!84887b30": make_record(19)[1]})
+        self.start_uploader(log, new_search=False)
+        self.assertTrue(log.wait_until_uploaded(timeout=5))
+        self.assertEqual(point_parser.loads(self.blob()), [{key: point} for key, point in map(make_record, range(20))])
+
+    def test_restart_recreates_missing_blob(self):
+        # The base station stopped before the search's blob was created, but after checkpointing
+        # some points (e.g. the blob was deleted).
+        log = UploadLog(self.path)
+        log.reset()
+        log.append([make_record(i) for i in range(3)])
+        log.commit(log.size)
+        log.append([make_record(i) for i in range(3, 5)])
+
+        self.start_uploader(log, new_search=False)
+        self.assertTrue(log.wait_until_uploaded(timeout=5))
+        with open(self.path, "rb") as f:
+            self.assertEqual(self.blob(), f.read())
+        self.assertEqual(len(point_parser.parse_points(self.blob())), 5)
+
+    def test_compact_log_resumes_in_its_own_format(self):
+        log = UploadLog(self.path, "compact")
+        log.reset()
+        self.start_uploader(log, new_search=True, mode="append", wire_format="compact")
+        log.append([make_record(i) for i in range(3)])
+        self.assertTrue(log.wait_until_uploaded(timeout=5))
+
+        # A restart with another configured format keeps writing the search's format.
+        log = UploadLog(self.path, "json")
+        self.assertEqual(log.wire_format, "compact")
+        self.assertEqual(log.latest_points(), {"!84887b30": make_record(2)[1]})
+        log.append([make_record(3)])
+        with open(self.path, "rb") as f:
+            self.assertEqual(point_parser.loads(f.read()), [{key: point} for key, point in map(make_record, range(4))])
+
+    def test_overwrite_mode_resumes_with_earlier_points(self):
+        log = UploadLog(self.path)
+        log.reset()
+        batch_uploader = self.start_uploader(log, new_search=True, mode="overwrite")
+        log.append([make_record(i) for i in range(5)])
+        self.assertTrue(log.wait_until_uploaded(timeout=5))
+        batch_uploader.stop()
+
+        log = UploadLog(self.path)
+        self.start_uploader(log, new_search=False, mode="overwrite")
+        log.append([make_record(5)])
+        self.assertTrue(log.wait_until_uploaded(timeout=5))
+        self.assertEqual(len(point_parser.parse_points(self.blob())), 6)
+
+    def test_point_longer_than_one_append_is_dropped(self):
+        log = UploadLog(self.path)
+        log.reset()
+        self.start_uploader(log, new_search=True)
+        oversized = ("point1", dict(make_record(1)[1], name="x" * 600))
+        with mock.patch.object(upload_queue, "MAX_APPEND_BYTES", 500), contextlib.redirect_stdout(io.StringIO()) as output:
+            log.append([make_record(0), oversized, make_record(2)])
+        self.assertIn("Dropping point1", output.getvalue())
+        self.assertEqual(log.count, 2)
+
+        # The points after it are not held back.
+        self.assertTrue(log.wait_until_uploaded(timeout=5))
+        self.assertEqual(point_parser.loads(self.blob()), [dict([make_record(0)]), dict([make_record(2)])])
+
+
+if __name__ == "__main__":
+    unittest.main()
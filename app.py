@@ -7,4 +7,4 @@ app = create_app()
 app.secret_key = os.urandom(24)     # Used for session management.
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    app.run(debug=True, threaded=True)    # Map building is request-scoped, so requests can be served concurrently.
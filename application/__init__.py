@@ -9,4 +9,8 @@ def create_app():
     with app.app_context():
         from . import routes
 
+    # Starts polling base station containers in the background.
+    if not routes.ingest_service.is_alive():
+        routes.ingest_service.start()
+
     return app
@@ -3,47 +3,99 @@ Routes:
     - index(): Renders the index.html template and passes device data to it.
     - update_map(): Updates the map with new data and returns a success message.
     - push_data_to_server(): Pushes data to Azure storage container and returns a success message. (Testing Purposes).
+    - stats(): Returns the counters of the web app's in-memory caches.
+    - ping_delta(): Returns only the pings received after each container's cursor.
+    - stream(): Pushes new pings to the browser as Server-Sent Events.
+    - ingest_health(): Returns the background ingest service's health and lag for each container.
+    - serve_map(): Serves one of the session's maps from memory.
+    - download_search_gpx(): Serves the GPX file of one historical search.
 """
 
+import io
 import traceback
 import json
-import os
-from flask import render_template, request, url_for, current_app as app, jsonify, send_file, session
+import uuid
+import hashlib
+import functools
+from flask import (render_template, request, url_for, current_app as app, jsonify, session, make_response, abort,
+                   Response, send_file)
 import folium
-from retrieve_from_containers import retrieve_from_containers, historical_data_to_map
+from retrieve_from_containers import (retrieve_from_containers, historical_data_to_map, draw_points, get_pings_since,
+                                      get_blob_service_client, blob_cache, tail_read_stats, render_cache, render_stats,
+                                      parse_cursors)
 import get_key
 from azure.storage.blob import BlobServiceClient
 from datetime import datetime
 import historical_database
 from to_gpx import convert_json_to_gpx_string
 from config import Config
+import point_parser
+from track import Track
+from map_store import MapStore, MAP_KINDS
+from live_stream import StreamHub
+from ingest import IngestService
+from cache import LRUCache
 
 
-STORAGE_CONNECTION_STRING = get_key.get_blob_storage_key()
+# Every session's rendered maps, kept in memory rather than in shared files under 'static'.
+map_store = MapStore(Config.MAP_STORE_MAX_BYTES, Config.MAP_STORE_TTL_SECONDS)
+
+# Pushes the new pings found by the ingest service to every /api/stream viewer. A container stops
+# being polled once its last viewer leaves.
+stream_hub = StreamHub(Config.STREAM_QUEUE_SIZE, on_unwatched=lambda container_name: ingest_service.unwatch([container_name]))
+
+# Recently downloaded GPX files of completed searches, keyed by (session_id, base_station).
+gpx_cache = LRUCache(Config.GPX_CACHE_MAX_BYTES)
+
+# Polls the watched containers in the background (started by create_app), so requests read the
+# latest data from memory instead of waiting on Azure.
+ingest_service = IngestService(lambda: get_blob_service_client(get_key.get_blob_storage_key()),
+                               Config.INGEST_POLL_SECONDS, Config.INGEST_MAX_BACKOFF_SECONDS,
+                               Config.INGEST_IDLE_SECONDS, stream_hub)
+
+
+def get_map_id():
+    """Returns the current browser session's map ID, assigning one if it does not have one yet."""
+    if "map_id" not in session:
+        session["map_id"] = uuid.uuid4().hex
+    return session["map_id"]
+
+
+def store_map(kind, html):
+    """Stores one of the current session's maps, and returns the URL it is served from."""
+    map_store.put(get_map_id(), kind, html)
+    return url_for("serve_map", kind=kind)
+
+
+@functools.lru_cache(maxsize=1)
+def default_map():
+    """Renders the empty map shown before any data has been displayed (once per process).
+
+    Returns:
+        tuple: The map's HTML as bytes, and its ETag.
+    """
+    default_map = folium.Map(location=Config.MAP_DEFAULT_COORDS, control_scale=True, zoom_start=Config.MAP_DEFAULT_ZOOM)
+    html = default_map.get_root().render().encode("utf-8")
+    return html, hashlib.sha1(html).hexdigest()
 
 
 @app.route("/")
 def index():
     """Default view for home page of web interface. 
 
-        Performs several "start-up" functions; rendering a default Folium map, connecting to
-        the Azure storage container and retrieving container names, and retrieving historical
-        search data.
+        Performs several "start-up" functions; resetting the session's maps to the default Folium
+        map, connecting to the Azure storage container and retrieving container names, and
+        retrieving historical search data.
 
         Returns:
         render_template: Renders the "index.html" template with:
-            - active_map_html (html): Representation of the active map.
-            - historical_map_hhtml (html): Representation of the historical map.
             - container_names (list): Active container names from Azure.
             - base_stations (list): Unique base stations for historical searches.
-            - historical_searches (list): Historical search data.
+            - historical_searches (list): The first page of historical search data.
+            - historical_next (str): The JSON key of the next page, or "" if there is none.
     """
-    # Initialises the active map and the historical map.
-    active_map = folium.Map(location=Config.MAP_DEFAULT_COORDS, control_scale=True, zoom_start=Config.MAP_DEFAULT_ZOOM)
-    historical_map = folium.Map(location=Config.MAP_DEFAULT_COORDS, control_scale=True, zoom_start=Config.MAP_DEFAULT_ZOOM)
-    
     # Fetches names of available base stations from Azure (for live searches).
-    blob_service_client = BlobServiceClient.from_connection_string(STORAGE_CONNECTION_STRING)
+    blob_service_client = BlobServiceClient.from_connection_string(get_key.get_blob_storage_key())
     container_names = [container.name for container in blob_service_client.list_containers()]
 
     # Fetches unique base stations (for historical searches).
@@ -53,28 +105,24 @@ def index():
         print(f"Error fetching base stations: {e}")
         base_stations = []
 
-    try:    # Fetches historical searches for the scrollable list.
-        historical_searches = get_presentable_historical_data(base_stations)
+    try:    # Fetches the first page of historical searches for the scrollable list.
+        historical_searches, historical_next = get_presentable_historical_data(base_stations)
 
     except Exception as e:
         print(f"Error fetching historical searches: {e}")
-        historical_searches = []
-
-    # Saves both maps.
-    session["footprint"] = "static/footprint.html"
-    active_map_save_path = os.path.join(os.path.dirname(__file__), session["footprint"])
-    active_map.save(active_map_save_path)
-    historical_map_save_path = os.path.join(os.path.dirname(__file__), "static/historical_map.html")
-    historical_map.save(historical_map_save_path)
+        historical_searches, historical_next = [], None
+
+    # Resets this session's maps, so both maps show the default map until data is displayed.
+    map_store.discard(get_map_id())
+    session["active_map"] = "live"
     
-    # Renders the "index.html" template with both maps and all data collected.
+    # Renders the "index.html" template with all data collected.
     return render_template(
         "index.html",
-        active_map_html=active_map._repr_html_(),
-        historical_map_html=historical_map._repr_html_(),
         container_names=container_names,
         base_stations=base_stations,
-        historical_searches=historical_searches)
+        historical_searches=historical_searches,
+        historical_next=json.dumps(historical_next) if historical_next else "")
 
 
 @app.route("/api/update-map", methods=["POST"])
@@ -87,8 +135,11 @@ def update_map():
 
     Returns:
         jsonify: A JSON response containing:
-            - map_path (str): URL of the updated map file.
+            - map_path (str): URL the updated map is served from.
             - telemetry_data (list): The telemetry data retrieved from the containers.
+            - errors (dict): Containers that could not be fetched, paired with the reason why.
+            - trail_reduction (float): The fraction of trail vertices removed by simplification.
+            - cursors (dict): The number of pings drawn for each container, for use with /api/pings.
 
     Raises:
         400: If no containers are selected by the user.
@@ -99,9 +150,12 @@ def update_map():
         return jsonify({"error": "No containers selected"}), 400
       
     active_map = folium.Map(location=Config.MAP_DEFAULT_COORDS, control_scale=True, zoom_start=Config.MAP_DEFAULT_ZOOM)
-    active_map_save_path = os.path.join(os.path.dirname(__file__), session["footprint"])
 
-    telemetry_data, all_blobs = retrieve_from_containers(active_map, STORAGE_CONNECTION_STRING, container_names, active_map_save_path)
+    # Reads the containers from the ingest service's live state, without waiting on Azure.
+    fetch_results = ingest_service.results(container_names)
+    telemetry_data, all_blobs, fetch_errors, map_context, map_html = retrieve_from_containers(
+        active_map, get_key.get_blob_storage_key(), container_names, fetch_results)
+    map_path = store_map("live", map_html)
 
     session["base_stations"] = list(all_blobs.keys())    # Updates session-specific GPS data
     # Replaces existing row in the database.
@@ -114,16 +168,97 @@ def update_map():
     # Upload the latest retrieved data to the historical database.
     historical_database.upload_search_data(update_dict, True)
 
-    if session["footprint"] == "static/footprint_filtered.html":
-        create_filtered_map(session["filter_time"])
+    if session.get("active_map") == "filtered":
+        map_path = create_filtered_map(session["filter_time"])
 
-    # Returns a response indicating where the updated map is saved, and telemetry data from selected containers.
+    # Returns a response indicating where the updated map is served, and telemetry data from selected containers.
     return jsonify({
-        "map_path": session["footprint"],
-        "telemetry_data": telemetry_data
+        "map_path": map_path,
+        "telemetry_data": telemetry_data,
+        "errors": fetch_errors,
+        "trail_reduction": map_context.reduction_ratio(),
+        "cursors": map_context.point_counts
     })
 
 
+@app.route("/api/pings", methods=["POST"])
+def ping_delta():
+    """Returns only the pings that each selected container has received since the caller's cursor.
+
+    Lets the frontend add new pings to the map it already shows, so the payload (and the work
+    done by the browser) grows with the number of new pings rather than the length of the search.
+
+    Request JSON:
+        cursors (dict): Container names paired with the number of pings the caller already has.
+
+    Returns:
+        jsonify: Container names paired with their new pings in compact columns, and the cursor
+            for the next call (see retrieve_from_containers.get_pings_since()).
+
+    Raises:
+        400: If no valid cursors are given.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        cursors = parse_cursors(data.get("cursors") if isinstance(data, dict) else None)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify(get_pings_since(get_key.get_blob_storage_key(), cursors, ingest_service.results(list(cursors))))
+
+
+@app.route("/api/stream")
+def stream():
+    """Pushes each selected container's new pings to the browser as Server-Sent Events.
+
+    Containers are polled once by the ingest service, which publishes new pings to stream_hub, so
+    any number of viewers of a base station cost one Azure poll. Each event has the same format as
+    the response of /api/pings.
+
+    Query Parameters:
+        cursors (str): JSON object pairing container names with the number of pings the browser already has.
+
+    Returns:
+        Response: A "text/event-stream" response, open until the browser disconnects.
+
+    Raises:
+        400: If no valid cursors are given.
+    """
+    try:
+        cursors = json.loads(request.args.get("cursors", ""))
+    except ValueError:
+        cursors = None
+    try:
+        cursors = parse_cursors(cursors)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Makes sure the containers are polled, and catches the subscriber up from their current tracks.
+    results = ingest_service.results(list(cursors))
+    subscriber = stream_hub.subscribe(cursors, {result["container"]: result["track"] for result in results if not result["error"]})
+
+    def events():
+        try:
+            yield ": connected\n\n"    # Sends the response headers at once, rather than with the first event.
+            while True:
+                item = subscriber.get(Config.STREAM_HEARTBEAT_SECONDS)
+                if item is None:
+                    yield ": keep-alive\n\n"    # Stops proxies from closing an idle connection.
+                    continue
+                event, published_at = item
+                message = f"event: pings\ndata: {json.dumps(event)}\n\n"
+                stream_hub.record_delivery(published_at)
+                yield message
+        finally:
+            # Runs when the browser disconnects and the server closes the generator.
+            stream_hub.unsubscribe(subscriber)
+
+    response = Response(events(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
 @app.route("/api/start-search", methods=["POST"])
 def start_search():
     """Starts a new search session for the user.
@@ -139,7 +274,7 @@ def start_search():
     session_id = datetime.now().strftime("%Y%m%d%H%M%S")
     session["session_id"] = session_id
     session["start_time"] = datetime.now().strftime("%H:%M:%S")
-    session["footprint"] = "static/footprint.html"
+    session["active_map"] = "live"
     
     return jsonify({"message": "Search started", "session_id": session_id})
 
@@ -155,7 +290,7 @@ def end_search():
     Returns:
         jsonify: A JSON response containing:
             - message (str): Confirmation that the search has ended.
-            - gpx_download_routes (list): Filenames for the saved GPX files.
+            - gpx_download_routes (list): The base station and download URL of each search's GPX file.
 
     Raises:
         400: If there is no active search session or no GPS data to convert.
@@ -176,7 +311,7 @@ def end_search():
     gpx_data_dict = {}
     
     # Establish connection to blob storage to delete containers after search is ended.
-    blob_service_client = BlobServiceClient.from_connection_string(STORAGE_CONNECTION_STRING)
+    blob_service_client = BlobServiceClient.from_connection_string(get_key.get_blob_storage_key())
 
     for blob_name, blob_content in json_gps_data.items():
 
@@ -184,12 +319,8 @@ def end_search():
         blob_service_client.delete_container(blob_name)
 
         try:
-            if isinstance(blob_content, bytes):
-                decoded_content = blob_content.decode("utf-8")
-            else:
-                decoded_content = blob_content
-            json_data = json.loads(decoded_content.replace("'", '"'))
-             
+            json_data = point_parser.loads(blob_content)
+
             gpx_string = convert_json_to_gpx_string(json_data)
             gpx_data_dict[blob_name] = gpx_string
 
@@ -209,29 +340,31 @@ def end_search():
     )
     historical_database.upload_search_data(update_db_dict)
 
-    # Creates download links for the GPX files.
-    gpx_filenames = []
-    for gpx in gpx_data_dict:
-        filename = f"{gpx}.gpx"
-        gpx_filenames.append(filename)
-        with open(filename, "w") as outfile:
-            outfile.write(gpx_data_dict[gpx])
+    # Creates download links for the GPX files, which are likely to be downloaded straight away.
+    gpx_download_routes = []
+    for base_station, gpx_string in gpx_data_dict.items():
+        gpx_bytes = gpx_string.encode("utf-8")
+        gpx_cache.put((session_id, base_station), gpx_bytes, len(gpx_bytes))
+        gpx_download_routes.append({
+            "base_station": base_station,
+            "url": url_for("download_search_gpx", session_id=session_id, base_station=base_station),
+        })
 
     # Clears global dict, ready for the next search.
     session.pop("session_id", None)
     session.pop("start_time", None)
     session.pop("base_stations", None)
-    print("SEARCH ENDED, ", gpx_filenames)
+    print("SEARCH ENDED, ", [route["url"] for route in gpx_download_routes])
 
-    return jsonify({"message": "Search ended", "gpx_download_routes" : gpx_filenames})
+    return jsonify({"message": "Search ended", "gpx_download_routes" : gpx_download_routes})
 
 
 @app.route("/render-map")
 def render_map():
     """Renders a map with historical GPS data for a specific session and base station.
 
-    Retrieves live GPS data based on the provided session ID and base station from the historical database. 
-    If GPS data is available, it initializes a Folium map, plots the GPS points, and saves the map as an HTML file.
+    Loads only this search's pings from the historical database, when it is displayed.
+    If GPS data is available, it initializes a Folium map, plots the GPS points, and stores the map for this session.
 
     Args:
         session_id (str): The ID of the current session.
@@ -240,6 +373,7 @@ def render_map():
     Returns:
         jsonify: A JSON response containing:
             - map_path (str): The URL of the rendered historical map.
+            - trail_reduction (float): The fraction of trail vertices removed by simplification.
         
     Raises:
         400: If no GPS data is available for the provided session ID and base station.
@@ -247,48 +381,71 @@ def render_map():
     session_id = request.args.get("session_id")
     base_station = request.args.get("base_station")
     
-    gps_data = historical_database.get_live_searches(session_id, [base_station])
-    if not gps_data:
+    gps_points = historical_database.get_search_track(session_id, base_station)
+    if not gps_points:
         return jsonify({"error": "No GPS data to convert"}), 400
-    
-    # Ensures the GPS data is in the correct formats
-    gps_points = json.loads(gps_data[base_station])
 
     # Initialises map and plots the GPS points onto it.
     m = folium.Map(location=Config.MAP_DEFAULT_COORDS, control_scale=True, zoom_start=Config.MAP_DEFAULT_ZOOM)
-    map_save_path = os.path.join(os.path.dirname(__file__), "static/historical_map.html")
-    historical_data_to_map(m, gps_points, map_save_path)
-    m.save(map_save_path)
+    map_html, map_context = historical_data_to_map(m, gps_points)
 
     return jsonify({
-        "map_path": url_for("static", filename="/historical_map.html"),
+        "map_path": store_map("historical", map_html),
+        "trail_reduction": map_context.reduction_ratio(),
     })
 
 
-@app.route("/download/<filename>")
-def download_gpx(filename):
-    """Serves a GPX file for download.
+def get_search_gpx(session_id, base_station):
+    """Returns the GPX file of one search, from the GPX cache if it was recently downloaded.
+
+    Completed searches' GPX files are read from the database and cached, as they never change.
+    Searches that have no stored GPX file yet (e.g. they are still running) are converted from
+    their pings, and not cached.
 
-    Checks if the specified GPX file exists in the current working directory. 
-    If the file is found, it is sent to the client as an attachment for download.
-    If the file does not exist, a 404 error message is returned.
+    Returns:
+        bytes: The GPX file, or None if the search has no pings.
+    """
+    key = (session_id, base_station)
+    gpx_bytes = gpx_cache.get(key)
+    if gpx_bytes is not None:
+        return gpx_bytes
+
+    gpx_data = historical_database.get_gpx_data(session_id, base_station)
+    if gpx_data:
+        gpx_bytes = gpx_data.encode("utf-8")
+        gpx_cache.put(key, gpx_bytes, len(gpx_bytes))
+        return gpx_bytes
+
+    pings = historical_database.get_search_track(session_id, base_station)
+    if not pings:
+        return None
+    return convert_json_to_gpx_string(pings).encode("utf-8")
+
+
+@app.route("/download/<session_id>/<base_station>")
+def download_search_gpx(session_id, base_station):
+    """Serves the GPX file of one search for download, generated or read only when requested.
+
+    The file is streamed in chunks rather than sent in one piece, and nothing is written to disk.
 
     Args:
-        filename (str): The name of the GPX file to be downloaded.
+        session_id (str): The search's session ID.
+        base_station (str): The base station that recorded the search.
 
     Returns:
-        send_file (.txt): The GPX file sent as an attachment if found.
-        jsonify (JSON): A JSON response containing an error message if the file is not found.
+        Response: The GPX data sent as an attachment.
 
     Raises:
-        404: If the specified file does not exist in the current working directory.
+        404: If the search has no GPS data.
     """
-    file_path = os.path.join(os.getcwd(), filename)
-    if os.path.exists(file_path):
-        return send_file(file_path, as_attachment=True)
-    else:
+    gpx_bytes = get_search_gpx(session_id, base_station)
+    if gpx_bytes is None:
         return jsonify({"error": "File not found"}), 404
 
+    # send_file quotes the file name (and encodes names that are not ASCII) in Content-Disposition.
+    return send_file(io.BytesIO(gpx_bytes), mimetype="application/gpx+xml", as_attachment=True,
+                     download_name=f"{session_id}_{base_station}.gpx")
+
 
 @app.route("/filter-search", methods=["POST"])
 def submit_date():
@@ -301,43 +458,55 @@ def submit_date():
         start_date (str): The starting date for filtering historical searches.
         end_date (str): The ending date for filtering historical searches.
         selected_base_stations (list): A list of base stations selected by the user.
+        after (str, optional): The JSON key of the previous page's last search, to load the next page.
 
     Returns:
-        jsonify (JSON): A JSON response containing the filtered historical search data.
+        jsonify (JSON): A JSON response containing:
+            - searches (list): One page of the filtered historical search data.
+            - next (list): The key to send as 'after' for the next page, or None if there are no more.
 
     Raises:
-        400: If the input dates are invalid or if no data is found for the specified filters.
+        400: If the 'after' key is invalid.
     """
     start_date = request.form.get("start-date")
     end_date = request.form.get("end-date")
     selected_base_stations = request.form.getlist("base-station")
-    
-    serializable_results = get_presentable_historical_data(selected_base_stations, start_date, end_date)
+    try:
+        after = json.loads(request.form["after"]) if request.form.get("after") else None
+        if after is not None and (not isinstance(after, list) or len(after) != 3):
+            raise ValueError("Expected [search_date, session_id, base_station].")
+    except ValueError as e:
+        return jsonify({"error": f"Invalid page key: {e}"}), 400
+
+    serializable_results, next_after = get_presentable_historical_data(selected_base_stations, start_date, end_date, after)
 
-    return jsonify(serializable_results)
+    return jsonify({"searches": serializable_results, "next": next_after})
 
 def create_filtered_map(filter_time):
+    """Renders a map of the current search's pings recorded after filter_time, and returns its path.
+
+    Base stations held in the ingest service's live state are filtered by binary search over their
+    already parsed tracks, so refreshing a filtered map neither downloads nor parses any pings.
+    Other base stations are filtered by the database.
+    """
     base_stations = session.get('base_stations', [])
     session_id = session.get('session_id')
-    # Query the database to retrieve only the pings after the filter time
-    filtered_pings = {}
+    filtered_tracks = {}
     for base_station in base_stations:
-        pings = historical_database.get_pings_after_time(session_id, base_station, filter_time)
-        if pings:
-            filtered_pings[base_station] = pings
+        result = ingest_service.state.result(base_station)
+        if result and result["track"] is not None:
+            track = result["track"].since(filter_time)
+        else:
+            track = Track.from_points(historical_database.get_pings_after_time(session_id, base_station, filter_time))
+        if len(track):
+            filtered_tracks[base_station] = track
 
     # Create new map with the filtered pings and return its path for rendering
     active_map = folium.Map(location=(-31.9775, 115.8163), control_scale=True, zoom_start=17)
-    for base_station, pings in filtered_pings.items():
-        for ping in pings:
-            folium.Marker(
-                location=(list(ping.values())[0]['lat'], list(ping.values())[0]['long']),
-                popup=f"Time: {list(ping.values())[0]['time']}<br>Base: {base_station}",
-                icon=folium.Icon(color='blue', icon='info-sign')
-            ).add_to(active_map)
-    session["footprint"] = 'static/footprint_filtered.html'
-    active_map_save_path = os.path.join(os.path.dirname(__file__), session["footprint"])
-    active_map.save(active_map_save_path)
+    for base_station, track in filtered_tracks.items():
+        draw_points(active_map, track)
+    session["active_map"] = "filtered"
+    return store_map("filtered", active_map.get_root().render())
 
 @app.route('/filter-pings', methods=['POST'])
 def filter_pings():
@@ -359,27 +528,29 @@ def filter_pings():
     if not base_stations or not session_id:
         return jsonify({'error': 'No active session or base stations available'}), 400
 
-    create_filtered_map(filter_time)
+    map_path = create_filtered_map(filter_time)
     
     return jsonify({
-        "map_path": session["footprint"],
+        "map_path": map_path,
         "message": "Pings filtered successfully."
     })
 
 
-def get_presentable_historical_data(selected_base_stations, start_date="2024-01-01", end_date="9999-01-01"):
-    """Retrieves and formats historical search data for presentation.
+def get_presentable_historical_data(selected_base_stations, start_date="2024-01-01", end_date="9999-01-01", after=None):
+    """Retrieves and formats one page of historical search data for presentation.
 
     Fetches historical search data from database based on selected base stations and specified date range. 
     Then converts the results into a format suitable for serialisation and includes download links for GPX files.
+    Only the listed columns are sent; a search's pings are loaded when it is displayed (see render_map()).
 
     Args:
         selected_base_stations (list): A list of base stations to filter the search data.
         start_date (str, optional): The starting date for filtering results. Defaults to "2024-01-01".
         end_date (str, optional): The ending date for filtering results. Defaults to "9999-01-01".
+        after (list, optional): The key of the last search on the previous page. Defaults to the first page.
 
     Returns:
-        list: A list of tuples containing formatted historical search data, including:
+        tuple: A list of tuples containing formatted historical search data, including:
             - ID (str): The search ID.
             - Base station (str): The name of the base station.
             - Start time (str): The formatted start time of the search.
@@ -387,37 +558,98 @@ def get_presentable_historical_data(selected_base_stations, start_date="2024-01-
             - Search date (str): The formatted date of the search.
             - Download link (str): An HTML link to download the GPX data file.
             - Display button (str): An HTML button for displaying historical data.
-            - GPS data (any): The raw GPS data associated with the search.
-
-    Raises:
-        IOError: If there is an error writing the GPX data to a file.
+        And the key of the page's last search, to pass as 'after' for the next page (None if there are no more).
     """
-    results = historical_database.get_historical_searches(start_date, end_date, selected_base_stations)
-    
+    page = historical_database.get_historical_searches(start_date, end_date, selected_base_stations, after)
+    if page is None:
+        return [], None
+    results, next_after = page
+
     # Converts results to serialisable format.
     serializable_results = []
     for row in results:
-
-        filename = f"{row[0]}.gpx"    # Contains search ID for file name.
-        with open(filename, "w") as outfile:
-            if type(row[6]) == str:
-                outfile.write(row[6])    # 'row[6]' is GPX data.
-
+        download_path = url_for("download_search_gpx", session_id=row[0], base_station=row[1])
         serializable_row = (
             row[0],  # Assuming ID is already a string.
             row[1],  # Base station.
             row[2].strftime("%H:%M:%S"),  # Converts time to string.
             row[3].strftime("%H:%M:%S"),  # Converts time to string.
             row[4].strftime("%Y-%m-%d"),  # Converts date to string.
-            f"<a href='/download/{filename}' download='{filename}'>Download Data</a>",    # Download link.
+            f"<a href='{download_path}' download='{row[0]}_{row[1]}.gpx'>Download Data</a>",    # Download link.
             f"<button id='display-historical-button'>Display</button>",    # Button.
-            row[5]    # GPS data.
         )
         serializable_results.append(serializable_row)
     
-    return serializable_results
+    return serializable_results, next_after
 
 @app.route('/api/revert', methods=['POST'])
 def revert():
-    session["footprint"] = "static/footprint.html"
-    return jsonify({"message": "Reverted successfully"}), 200
\ No newline at end of file
+    session["active_map"] = "live"
+    return jsonify({"message": "Reverted successfully", "map_path": url_for("serve_map", kind="live")}), 200
+
+
+@app.route("/api/stats")
+def stats():
+    """Reports the hit/miss counters and usage of the web app's in-memory caches.
+
+    Returns:
+        jsonify: A JSON response containing:
+            - blob_cache (dict): Counters for the conditional blob download cache.
+            - tail_reads (dict): Counters for incremental reads of blobs that have grown.
+            - render_cache (dict): Counters for the rendered live map cache, and the time spent rendering.
+            - map_store (dict): Counters and usage of the per-session map store.
+            - stream (dict): Subscriber counts, events and fan-out latency of /api/stream.
+            - db_pool (dict): Checkouts, waits and connection counters of the database connection pool.
+            - gpx_cache (dict): Counters for the cache of downloaded GPX files.
+            - secrets (dict): Reads, fetches and background refreshes of the cached secrets.
+    """
+    return jsonify({
+        "map_store": map_store.stats(),
+        "blob_cache": blob_cache.stats(),
+        "tail_reads": dict(tail_read_stats),
+        "render_cache": dict(render_cache.stats(), **render_stats),
+        "stream": stream_hub.stats(),
+        "db_pool": historical_database.pool.stats(),
+        "gpx_cache": gpx_cache.stats(),
+        "secrets": get_key.secret_cache.stats(),
+    })
+
+
+@app.route("/api/health")
+def ingest_health():
+    """Reports the background ingest service's health and lag for each watched container.
+
+    Returns:
+        jsonify: Container names paired with their poll status, consecutive failures, latest
+            error, and lag (see ingest.LiveState.health()).
+    """
+    return jsonify(ingest_service.health())
+
+
+@app.route("/maps/<kind>")
+def serve_map(kind):
+    """Serves one of the current session's maps from memory.
+
+    Responses carry an ETag, so a browser reloading a map that has not changed receives an empty
+    304 response instead of the whole map. Sessions without a stored map receive the default map.
+
+    Args:
+        kind (str): The map to serve, one of "live", "filtered" or "historical".
+
+    Returns:
+        Response: The map's HTML, or an empty 304 response if the browser's copy is current.
+
+    Raises:
+        404: If the kind of map is unknown.
+    """
+    if kind not in MAP_KINDS:
+        abort(404)
+
+    stored = map_store.get(get_map_id(), kind)
+    html, etag = stored if stored is not None else default_map()
+
+    response = make_response(html)
+    response.mimetype = "text/html"
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"    # Browsers must revalidate before reusing a map.
+    return response.make_conditional(request)
@@ -25,49 +25,73 @@ document.addEventListener("DOMContentLoaded", function () {
   document.getElementsByClassName("tablinks")[0].click();
 });
 
+// Appends a page of historical searches to the table, and shows the "Load More" button if there are more.
+function appendSearchRows(data) {
+  const tbody = $(".scrollable-table tbody");
+
+  // Populates table with returned data
+  data.searches.forEach((row) => {
+    const newRow = `<tr class='search-row' session_id='${row[0]}' base_station ='${row[1]}'>
+                <td>${row[0]}</td> <!-- ID -->
+                <td>${row[1]}</td> <!-- Base Station -->
+                <td>${row[4]}</td> <!-- Date -->
+                <td>${row[2]}</td> <!-- Start Time -->
+                <td>${row[3]}</td> <!-- End Time -->
+                <td>${row[5]}</td> <!-- Download Link -->
+                <td>${row[6]}</td> <!-- Display Button -->
+            </tr>`;
+    tbody.append(newRow);
+  });
+
+  const loadMore = $("#load-more-searches");
+  loadMore.attr("data-next", data.next ? JSON.stringify(data.next) : "");
+  loadMore.prop("hidden", !data.next);
+  attachButtonListeners();
+}
+
+// Requests a page of historical searches matching the filter form, after the given page key.
+function fetchSearchPage(after, replace) {
+  const form = $(".filter-box form");
+  const data = form.serializeArray();
+  if (after) {
+    data.push({ name: "after", value: after });
+  }
+
+  $.ajax({
+    type: "POST",
+    url: "/filter-search",
+    data: $.param(data), // Serializes form data
+    success: function (data) {
+      if (replace) {
+        $(".scrollable-table tbody").empty(); // Clears existing rows
+      }
+      appendSearchRows(data);
+    },
+    error: function (error) {
+      console.error("Error fetching data:", error);
+    },
+  });
+}
+
 // Handles form submission with AJAX
 $(document).ready(function () {
   $(".filter-box form").on("submit", function (e) {
     e.preventDefault(); // Prevents the default form submission
+    fetchSearchPage(null, true);
+  });
 
-    $.ajax({
-      type: "POST",
-      url: "/filter-search",
-      data: $(this).serialize(), // Serializes form data
-      success: function (data) {
-        const tbody = $(".scrollable-table tbody");
-        tbody.empty(); // Clears existing rows
-
-        // Populates table with returned data
-        data.forEach((row) => {
-          const newRow = `<tr class='search-row' session_id='${row[0]}' base_station ='${row[1]}'>
-                      <td>${row[0]}</td> <!-- ID -->
-                      <td>${row[1]}</td> <!-- Base Station -->
-                      <td>${row[4]}</td> <!-- Date -->
-                      <td>${row[2]}</td> <!-- Start Time -->
-                      <td>${row[3]}</td> <!-- End Time -->
-                      <td>${row[5]}</td> <!-- GPS Data -->
-                      <td>${row[6]}</td> <!-- Download Link -->
-                  </tr>`;
-          tbody.append(newRow);
-          console.log("GPS Data 'new row': ", newRow);
-        });
-
-        attachButtonListeners();
-      },
-      error: function (error) {
-        console.error("Error fetching data:", error);
-      },
-    });
+  $("#load-more-searches").on("click", function () {
+    fetchSearchPage($(this).attr("data-next"), false);
   });
 
   // Automatically clicks the first tab on page load.
   document.getElementsByClassName("tablinks")[0].click();
 });
 
-// Attaches event listeners for display buttons in each search result row.
+// Attaches event listeners for display buttons in each search result row that does not have one yet.
 function attachButtonListeners() {
-  document.querySelectorAll(".search-row").forEach(function (row) {
+  document.querySelectorAll(".search-row:not([data-listening])").forEach(function (row) {
+    row.setAttribute("data-listening", "");
     const displayButton = row.querySelector("#display-historical-button");
     displayButton.addEventListener("click", function () {
       session_id = row.getAttribute("session_id");
@@ -131,10 +155,173 @@ document
 
         // Refreshes the iframe to show the updated map.
         document.getElementById("map-iframe").src = data.map_path;
+
+        // Later pings are added to this map by polling /api/pings from these cursors.
+        mapCursors = data.cursors || {};
+        pingCursors = { ...mapCursors };
+        openPingStream();
       })
       .catch((error) => console.error("Error updating map:", error));
   });
 
+// LIVE PING UPDATES
+// While the live map is shown, new pings are pushed by /api/stream (or, in browsers without
+// EventSource, fetched every POLL_INTERVAL_MS) and added to the map inside the iframe, so the map
+// is not reloaded and only the new pings are sent.
+const POLL_INTERVAL_MS = 30000;
+const STREAM_RETRY_MS = 5000;
+const TELEMETRY_KEYS = { battery: "battery", altitude: "altitude", pdop: "PDOP", snr: "SNR" };
+let mapCursors = {}; // Containers paired with the number of pings in the stored live map.
+let pingCursors = {}; // Containers paired with the number of pings already on the map.
+let liveMapShown = true; // False while the filtered map is shown.
+let pingStream = null; // The open EventSource, if any.
+const liveLayers = new WeakMap(); // Leaflet maps paired with the layers added to them.
+
+// Returns the Leaflet map inside the live map iframe, or null if it has not loaded.
+function findLiveMap() {
+  const frameWindow = document.getElementById("map-iframe").contentWindow;
+  if (!frameWindow || !frameWindow.L) {
+    return null;
+  }
+  for (const key of Object.keys(frameWindow)) {
+    // Folium names its map variables "map_<id>".
+    if (key.startsWith("map_") && frameWindow[key] instanceof frameWindow.L.Map) {
+      return frameWindow[key];
+    }
+  }
+  return null;
+}
+
+// Returns the marker layer and trail for one of a container's trackers on a map, creating them if needed.
+// A new trail continues from the tracker's last ping already drawn, in the colour the server drew it in.
+function layersFor(map, container, tracker, trail) {
+  const L = document.getElementById("map-iframe").contentWindow.L;
+  if (!liveLayers.has(map)) {
+    liveLayers.set(map, {});
+  }
+  const layers = liveLayers.get(map);
+  const key = `${container}/${tracker}`;
+  if (!layers[key]) {
+    layers[key] = {
+      markers: L.layerGroup().addTo(map),
+      trail: L.polyline(trail && trail.last ? [trail.last] : [], {
+        color: trail ? trail.colour : "#3388ff",
+        weight: 5,
+        opacity: 0.7,
+      }).addTo(map),
+    };
+  }
+  return layers[key];
+}
+
+// Converts the compact columns of a delta into telemetry entries, like those from /api/update-map.
+function deltaToEntries(delta) {
+  const columns = delta.columns;
+  return columns.lat.map((lat, i) => {
+    const telemetry = {};
+    for (const [column, key] of Object.entries(TELEMETRY_KEYS)) {
+      if (columns[column][i] !== null) {
+        telemetry[key] = columns[column][i];
+      }
+    }
+    return {
+      // Base stations following several trackers send each ping's tracker as an index into delta.trackers.
+      name: delta.trackers && columns.tracker ? delta.trackers[columns.tracker[i]] : delta.name,
+      longname: delta.longname,
+      time: columns.time[i] === null ? "" : new Date(columns.time[i] * 1000).toISOString().slice(0, 19),
+      lat: lat,
+      lon: columns.lon[i],
+      telemetry: telemetry,
+    };
+  });
+}
+
+// Adds new pings to the live map and the telemetry panel.
+function applyPingDeltas(deltas) {
+  const map = findLiveMap();
+  const L = map && document.getElementById("map-iframe").contentWindow.L;
+  const newEntries = [];
+
+  for (const [container, delta] of Object.entries(deltas)) {
+    if (delta.error) {
+      console.error(`Error fetching pings for ${container}:`, delta.error);
+      continue;
+    }
+    if (delta.start < pingCursors[container]) {
+      // The container's blob was replaced, so the whole map is rebuilt.
+      document.getElementById("fetch-data-button").click();
+      return;
+    }
+    pingCursors[container] = delta.cursor;
+
+    const entries = deltaToEntries(delta);
+    newEntries.push(...entries);
+    if (!map) {
+      continue;
+    }
+    entries.forEach((entry) => {
+      const layers = layersFor(map, container, entry.name, delta.trails && delta.trails[entry.name]);
+      layers.trail.addLatLng([entry.lat, entry.lon]);
+      L.circleMarker([entry.lat, entry.lon], { radius: 5 })
+        .bindPopup(`Name: ${entry.longname}<br>ID: ${entry.name}<br>Time: ${entry.time}<br>` +
+          `Coords: ${entry.lon}, ${entry.lat}<br>Battery: ${entry.telemetry.battery ?? "N/A"}%`)
+        .addTo(layers.markers);
+    });
+  }
+
+  if (newEntries.length > 0) {
+    updateTelemetryData(newEntries);
+  }
+}
+
+// Fetches the pings received since each container's cursor.
+function fetchPingDeltas() {
+  if (!liveMapShown || Object.keys(pingCursors).length === 0) {
+    return;
+  }
+  fetch("/api/pings", {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify({ cursors: pingCursors }),
+  })
+    .then((response) => response.json())
+    .then(applyPingDeltas)
+    .catch((error) => console.error("Error fetching new pings:", error));
+}
+
+// Opens the stream of new pings, replacing any open stream so that it starts from the current cursors.
+function openPingStream() {
+  closePingStream();
+  if (!window.EventSource || !liveMapShown || Object.keys(pingCursors).length === 0) {
+    return;
+  }
+  const stream = new EventSource(`/api/stream?cursors=${encodeURIComponent(JSON.stringify(pingCursors))}`);
+  stream.addEventListener("pings", (event) => applyPingDeltas(JSON.parse(event.data)));
+  stream.onerror = () => {
+    // Reconnects from the current cursors, rather than those the stream was opened with.
+    closePingStream();
+    setTimeout(() => {
+      if (pingStream === null) {
+        openPingStream();
+      }
+    }, STREAM_RETRY_MS);
+  };
+  pingStream = stream;
+}
+
+function closePingStream() {
+  if (pingStream !== null) {
+    pingStream.close();
+    pingStream = null;
+  }
+}
+
+if (!window.EventSource) {
+  setInterval(fetchPingDeltas, POLL_INTERVAL_MS);
+}
+
 // Select2 Library for selecting multiple base stations in the historical data filter.
 $(document).ready(function () {
   $("#base-station").select2({
@@ -144,12 +331,20 @@ $(document).ready(function () {
   });
 });
 
+// The most recent ping from each base station, shown in the sidebar.
+let latestPingsByBase = {};
+
 // Function to display the latest telemetry data from each base station in the sidebar.
 function displayTelemetryData(telemetryData) {
+  latestPingsByBase = {};
+  updateTelemetryData(telemetryData);
+}
+
+// Updates the sidebar with new telemetry data, keeping the latest ping from each base station.
+function updateTelemetryData(telemetryData) {
   const telemetryContent = document.getElementById("telemetry-content");
   telemetryContent.innerHTML = ""; // Clears previous content
 
-  const latestPingsByBase = {}; // Stores only most recent ping for each base.
   telemetryData.forEach((entry) => {
     const baseName = entry.name;
     if (
@@ -252,6 +447,8 @@ document
             iframe.src = response.map_path;
           }
 
+          liveMapShown = false;
+          closePingStream();
           filterButton.innerHTML = "Revert Pings";
           filterButton.setAttribute("data-filtering", "true");
         },
@@ -268,11 +465,17 @@ document
           throw new Error("Network response was not ok");
         }
         return response.json();
+      }).then((data) => {
+        // Shows the unfiltered map again.
+        const iframe = document.getElementById("map-iframe");
+        if (iframe) {
+          iframe.src = data.map_path;
+        }
+        // The reloaded map only has the pings it was rendered with, so they are fetched again.
+        pingCursors = { ...mapCursors };
+        liveMapShown = true;
+        openPingStream();
       });
-      /*const iframe = document.getElementById("map-iframe");
-      if (iframe) {
-        iframe.src = "/static/footprint.html";
-      }*/
 
       filterButton.innerHTML = "Filter Pings";
       filterButton.setAttribute("data-filtering", "false");
@@ -355,13 +558,13 @@ document.getElementById("end-search").addEventListener("click", function () {
         const row = downloadTable.insertRow();
 
         const cell1 = row.insertCell(0);
-        cell1.textContent = route;
+        cell1.textContent = route.base_station;
 
         const cell2 = row.insertCell(1);
         const downloadButton = document.createElement("a");
         downloadButton.textContent = "Download Data";
-        downloadButton.href = `/download/${route}`;
-        downloadButton.download = `${route}_search_data.gpx`; // Suggests a filename for the GPX file.
+        downloadButton.href = route.url;
+        downloadButton.download = `${route.base_station}_search_data.gpx`; // Suggests a filename for the GPX file.
         cell2.appendChild(downloadButton);
       });
     })
@@ -0,0 +1,121 @@
+"""This module contains a thread-safe, size-bounded LRU cache shared by the web app's in-memory caches."""
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """A least-recently-used cache, bounded by the total size of the values it holds.
+
+    Every entry is stored with a size (in bytes, or any other unit the caller chooses). When the
+    total size exceeds 'max_size', the least recently used entries are evicted until it fits again.
+    All methods are safe to call from multiple threads.
+    """
+
+    def __init__(self, max_size):
+        """Creates an empty cache.
+
+        Args:
+            max_size (int): The maximum total size of all entries.
+        """
+        self.max_size = max_size
+        self._entries = OrderedDict()    # Maps keys to (value, size) tuples, least recently used first.
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None, count=True):
+        """Returns the value stored for a key, and marks it as the most recently used.
+
+        Args:
+            key: The key to look up.
+            default: The value returned when the key is not cached.
+            count (bool): Whether the lookup is recorded in the hit/miss counters. Pass False when
+                the caller decides what counts as a hit itself (see record_hit() and record_miss()).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if count:
+                    self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            if count:
+                self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        """Stores a value, evicting the least recently used entries if the cache is full.
+
+        Values larger than the whole cache are not stored.
+
+        Args:
+            key: The key to store the value under.
+            value: The value to store.
+            size (int): The size of the value.
+        """
+        with self._lock:
+            old_entry = self._entries.pop(key, None)
+            if old_entry is not None:
+                self._size -= old_entry[1]
+
+            if size > self.max_size:
+                return
+
+            self._entries[key] = (value, size)
+            self._size += size
+            while self._size > self.max_size:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        """Removes a key from the cache and returns its value."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return default
+            self._size -= entry[1]
+            return entry[0]
+
+    def clear(self):
+        """Removes every entry from the cache, keeping the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def record_hit(self):
+        """Records a cache hit decided by the caller."""
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self):
+        """Records a cache miss decided by the caller."""
+        with self._lock:
+            self.misses += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def stats(self):
+        """Returns the cache's counters and current usage.
+
+        Returns:
+            dict: The hits, misses, evictions, number of entries, total size, and maximum size.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "size": self._size,
+                "max_size": self.max_size,
+            }
@@ -1,8 +1,38 @@
 """This module defines the configuration settings for the Flask application."""
 
+import os
+
+
 class Config:
     """Defines configuration variables for the Flask application."""
     DEBUG = True
     MAP_DEFAULT_COORDS = (-31.9505, 115.8605) # DEFAULT - PERTH, WA
     MAP_DEFAULT_ZOOM = 6
+    FETCH_MAX_WORKERS = 16    # Maximum number of containers downloaded from Azure at once.
+    BLOB_CACHE_MAX_BYTES = 64 * 1024 * 1024    # Maximum size of downloaded blobs kept in memory.
+    RENDER_CACHE_MAX_BYTES = 64 * 1024 * 1024    # Maximum size of rendered live maps kept in memory.
+    MAP_STORE_MAX_BYTES = 128 * 1024 * 1024    # Maximum size of all sessions' maps kept in memory.
+    MAP_STORE_TTL_SECONDS = 12 * 60 * 60    # How long a session's map is kept after it was last updated.
+    MAP_RENDER_MODE = "geojson"    # How pings are drawn: "markers" (one Marker each), "geojson" (one layer per base station) or "cluster".
+    MAP_MAX_ZOOM = 18
+    MAP_VIEWPORT_PIXELS = 800    # Approximate size of the map iframes, used to estimate the zoom that fits a trail.
+    SIMPLIFY_TRAILS = True    # Simplifies drawn trails (never the raw data or GPX exports).
+    SIMPLIFY_TOLERANCE_PIXELS = 1.5    # Largest visible error of a simplified trail, in screen pixels.
+    SIMPLIFY_ZOOM_HEADROOM = 3    # Zoom levels past the fitted zoom at which the error stays invisible.
+    INGEST_POLL_SECONDS = 5    # Time between background polls of each watched container.
+    INGEST_MAX_BACKOFF_SECONDS = 120    # Longest time between polls of a container that keeps failing.
+    INGEST_IDLE_SECONDS = 10 * 60    # How long a container is polled after a request last read it.
+    PING_TIMEZONE = os.environ.get("PING_TIMEZONE")    # IANA timezone base stations record ping times in, e.g. "Australia/Perth". Defaults to the server's.
+    STREAM_QUEUE_SIZE = 100    # Most events held for a /api/stream subscriber that is not reading them.
+    STREAM_HEARTBEAT_SECONDS = 15    # Time between keep-alive comments on an idle /api/stream.
+    DB_POOL_MAX_SIZE = 8    # Most database connections open at once.
+    DB_POOL_RECYCLE_SECONDS = 25 * 60    # Age at which a connection is replaced (Azure SQL closes idle ones after 30 minutes).
+    DB_POOL_PRE_PING_AFTER_SECONDS = 60    # Idle time after which a connection is checked before reuse.
+    DB_POOL_CHECKOUT_TIMEOUT_SECONDS = 30    # Longest a request waits for a free connection.
+    GPX_CACHE_MAX_BYTES = 32 * 1024 * 1024    # Maximum size of recently downloaded GPX files kept in memory.
+    LEGACY_TRACK_CACHE_MAX_BYTES = 32 * 1024 * 1024    # Maximum size (as gps_JSON) of parsed legacy searches kept in memory.
+    HISTORY_PAGE_SIZE = 50    # Searches listed per page of the historical search list.
+    SECRETS_BACKEND = os.environ.get("SECRETS_BACKEND", "keyvault")    # Where secrets are read from: "keyvault" or "local" (see get_key.py).
+    SECRETS_TTL_SECONDS = 60 * 60    # How long a fetched secret is used before it is fetched again.
+    SECRETS_REFRESH_BEFORE_SECONDS = 5 * 60    # How long before a secret's TTL runs out it is refreshed in the background.
     # Other configuration variables can be used here.
@@ -0,0 +1,179 @@
+"""This module contains a thread-safe pool of database connections, so that queries do not each pay for a new login."""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class ConnectionPool:
+    """A bounded, thread-safe pool of reusable DB-API connections.
+
+    Connections are opened lazily, up to max_size at once. Threads checking out a connection when
+    all of them are in use wait for one to be returned. Connections are checked with a cheap query
+    before reuse if they have been idle for a while, and replaced once they are older than
+    recycle_seconds, so connections closed by the server are never handed out.
+    """
+
+    def __init__(self, connect, max_size, recycle_seconds, pre_ping_after_seconds, checkout_timeout):
+        """Creates an empty pool.
+
+        Args:
+            connect (callable): Opens a new connection.
+            max_size (int): The most connections open at once.
+            recycle_seconds (float): The age after which a connection is closed instead of reused.
+            pre_ping_after_seconds (float): The idle time after which a connection is checked before reuse.
+            checkout_timeout (float): The longest a thread waits for a connection.
+        """
+        self._connect = connect
+        self.max_size = max_size
+        self.recycle_seconds = recycle_seconds
+        self.pre_ping_after_seconds = pre_ping_after_seconds
+        self.checkout_timeout = checkout_timeout
+        self._condition = threading.Condition()
+        self._idle = deque()    # (connection, created at, returned at), most recently returned last.
+        self._open = 0          # Connections open, idle or in use.
+        self._stats = {
+            "checkouts": 0, "waits": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0, "timeouts": 0,
+            "connections_opened": 0, "recycled": 0, "pre_pings": 0, "pre_ping_failures": 0, "discarded": 0,
+        }
+
+    @contextmanager
+    def connection(self):
+        """Checks out a connection for the duration of a with block.
+
+        The transaction is committed when the block exits normally (like pyodbc's own context
+        manager) and rolled back if it raises. Connections that fail to roll back are discarded.
+
+        Yields:
+            The connection.
+
+        Raises:
+            TimeoutError: If no connection became available within checkout_timeout.
+        """
+        conn, created_at = self._checkout()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            try:
+                conn.rollback()
+            except Exception:
+                self._discard(conn)    # The connection is broken.
+            else:
+                self._checkin(conn, created_at)
+            raise
+        self._checkin(conn, created_at)
+
+    def _checkout(self):
+        """Returns an idle connection (checked or replaced if needed) or a new one, and its creation time."""
+        started = time.monotonic()
+        deadline = started + self.checkout_timeout
+        with self._condition:
+            waited = False
+            while not self._idle and self._open >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise TimeoutError(f"No database connection became available within {self.checkout_timeout} seconds.")
+                waited = True
+                self._condition.wait(remaining)
+
+            if waited:
+                wait = time.monotonic() - started
+                self._stats["waits"] += 1
+                self._stats["wait_seconds_total"] += wait
+                self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], wait)
+            self._stats["checkouts"] += 1
+
+            if not self._idle:
+                # Reserves a slot, then connects without holding the lock.
+                self._open += 1
+                conn = None
+            else:
+                conn, created_at, returned_at = self._idle.pop()
+
+        if conn is None:
+            return self._open_connection()
+
+        # Replacements reuse the slot of the connection they replace.
+        now = time.monotonic()
+        if now - created_at > self.recycle_seconds:
+            self._count("recycled")
+            self._close(conn)
+            return self._open_connection()
+        if now - returned_at > self.pre_ping_after_seconds and not self._ping(conn):
+            self._close(conn)
+            return self._open_connection()
+        return conn, created_at
+
+    def _open_connection(self):
+        """Opens a connection in a slot already reserved by _checkout()."""
+        try:
+            conn = self._connect()
+        except BaseException:
+            self._release_slot()
+            raise
+        self._count("connections_opened")
+        return conn, time.monotonic()
+
+    def _ping(self, conn):
+        """Returns True if a connection still works."""
+        self._count("pre_pings")
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            self._count("pre_ping_failures")
+            return False
+
+    def _checkin(self, conn, created_at):
+        with self._condition:
+            self._idle.append((conn, created_at, time.monotonic()))
+            self._condition.notify()
+
+    def _discard(self, conn):
+        self._count("discarded")
+        self._close(conn)
+        self._release_slot()
+
+    def _close(self, conn):
+        """Closes a connection, ignoring errors from connections the server already closed."""
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _release_slot(self):
+        with self._condition:
+            self._open -= 1
+            self._condition.notify()
+
+    def _count(self, name):
+        with self._condition:
+            self._stats[name] += 1
+
+    def close(self):
+        """Closes every idle connection, e.g. when the app shuts down."""
+        with self._condition:
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+            self._condition.notify_all()
+        for conn, _, _ in idle:
+            self._close(conn)
+
+    def stats(self):
+        """Returns the pool's checkout, wait and connection counters, and current usage."""
+        with self._condition:
+            checkouts = self._stats["checkouts"]
+            return dict(
+                self._stats,
+                wait_seconds_mean=self._stats["wait_seconds_total"] / checkouts if checkouts else 0.0,
+                open=self._open,
+                idle=len(self._idle),
+                in_use=self._open - len(self._idle),
+                max_size=self.max_size,
+            )
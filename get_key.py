@@ -1,70 +1,202 @@
 """Functions that fetch the Azure storage account key and the Azure database password.
 
 ----- IMPORTANT -----
-- Use the first two functions in this file when locally testing the web application.
-- Use the next two functions in this file when hosting the web application on Azure.
-"""
+- Secrets are read from Azure Key Vault when hosting the web application on Azure.
+- When locally testing the web application, set the SECRETS_BACKEND environment variable (or
+  Config.SECRETS_BACKEND) to "local". Secrets are then read from environment variables, or from
+  keys.txt in this directory (lines of the form 'key1:<key>' and 'password:<password>').
 
-# Highlight all following code and use 'ctrl + /' to uncomment/comment block:
+Either way, each secret is fetched once and cached, and a background thread refreshes it before
+its TTL runs out, so requests never wait on Key Vault.
+"""
 
-KEY_FILEPATH = "keys.txt"
+import os
+import threading
+import time
 from azure.identity import DefaultAzureCredential
 from azure.keyvault.secrets import SecretClient
+from config import Config
+
+KEY_FILEPATH = "keys.txt"
 VAULT_NAME = "cits32004keys"
 ACCOUNT_NAME = "cits3200testv1"
 
+# Secrets, paired with their Key Vault secret name, keys.txt prefix and environment variable.
+SECRETS = {
+    "blob_storage_key": ("BlobStorageConnectionString", "key1:", "SES_BLOB_STORAGE_KEY"),
+    "db_password": ("historicalDatabasePassword", "password:", "SES_DB_PASSWORD"),
+}
+
+
+class KeyVaultBackend:
+    """Reads secrets from Azure Key Vault, through one credential and client built when it is created."""
+
+    def __init__(self, vault_name):
+        credential = DefaultAzureCredential()
+        self.client = SecretClient(vault_url=f"https://{vault_name}.vault.azure.net/", credential=credential)
+
+    def fetch(self, name):
+        return self.client.get_secret(SECRETS[name][0]).value.rstrip()
+
+
+class LocalBackend:
+    """Reads secrets from environment variables, or failing that from a local key file."""
+
+    def __init__(self, key_filepath):
+        self.key_filepath = key_filepath
+
+    def fetch(self, name):
+        _, prefix, variable = SECRETS[name]
+        value = os.environ.get(variable)
+        if value:
+            return value.rstrip()
+
+        with open(self.key_filepath) as file:
+            for line in file:
+                if line.rstrip().startswith(prefix):
+                    # Splits the secret from after the first occurence of the prefix.
+                    return line.rstrip().split(prefix, 1)[1].strip()
+        raise KeyError(f"Secret '{name}' is not set in {variable} or {self.key_filepath}.")
+
+
+class SecretCache:
+    """A thread-safe cache of secrets, refreshed in the background before they expire.
+
+    The first read of a secret fetches it from the backend. After that, reads only return the cached
+    value: a background thread fetches each secret again refresh_before_seconds before its TTL runs
+    out. If a refresh fails, the previous value keeps being served and the refresh is retried.
+    """
+
+    def __init__(self, make_backend, ttl_seconds, refresh_before_seconds, retry_seconds=30):
+        """Creates an empty cache.
+
+        Args:
+            make_backend (callable): Creates the backend, an object with a fetch(name) method. Called
+                once, when the first secret is read.
+            ttl_seconds (float): How long a fetched secret is considered current.
+            refresh_before_seconds (float): How long before a secret's TTL runs out it is refreshed.
+            retry_seconds (float, optional): The time between attempts to refresh a failing secret.
+        """
+        self._make_backend = make_backend
+        self.ttl_seconds = ttl_seconds
+        self.refresh_before_seconds = refresh_before_seconds
+        self.retry_seconds = retry_seconds
+        self._backend = None
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()    # Held while fetching, so a secret is never fetched twice at once.
+        self._secrets = {}    # Secret names paired with (value, monotonic time of the next refresh).
+        self._wake = threading.Event()
+        self._refresher = None
+        self._stats = {"reads": 0, "fetches": 0, "refreshes": 0, "refresh_failures": 0}
 
-# def get_blob_storage_key():
-
-#     # Retrieves key1 from the text file in this directory.
-#     # Sets connection string, where AccountName is the name of the Storage Account, and AccountKey is a valid Access Key to that account.
-#     conn_string = f"DefaultEndpointsProtocol=https;AccountName={ACCOUNT_NAME};AccountKey=;EndpointSuffix=core.windows.net"
-#     with open(KEY_FILEPATH) as file:
-#         for line in file:
-#             if line.rstrip().startswith("key1:"):
-#                 # Splits the key from after the first occurence of "key1:".
-#                 key = line.rstrip().split("key1:", 1)[1]
-#                 # Places the key in the correct position in the middle of connection string.
-#                 return conn_string[:69] + key + conn_string[69:]
-
-
-# def get_db_password():
-#     with open(KEY_FILEPATH) as file:
-#         for line in file:
-#             if line.rstrip().startswith("password:"):
-#                 # Splits the key from after the first occurence of "password:".
-#                 password = line.rstrip().split("password:", 1)[1]
-#                 # Places the key in the correct position in the middle of connection string.
-#                 return password
-  
-def get_blob_storage_key():    
-
-    secret_name = "BlobStorageConnectionString"
-    vault_url = f"https://{VAULT_NAME}.vault.azure.net/"
+    def get(self, name):
+        """Returns a secret, fetching it from the backend only if it has never been read.
+
+        Raises:
+            Exception: Whatever the backend raises if the first fetch of the secret fails.
+        """
+        with self._lock:
+            self._stats["reads"] += 1
+            entry = self._secrets.get(name)
+        if entry is not None:
+            return entry[0]
+
+        with self._fetch_lock:
+            with self._lock:
+                entry = self._secrets.get(name)
+            if entry is not None:    # Fetched by another thread while this one waited.
+                return entry[0]
+            value = self._fetch(name)
+            with self._lock:
+                self._stats["fetches"] += 1
+                self._secrets[name] = (value, time.monotonic() + self.ttl_seconds - self.refresh_before_seconds)
+                self._start_refresher()
+        return value
+
+    def _fetch(self, name):
+        if self._backend is None:
+            self._backend = self._make_backend()
+        return self._backend.fetch(name)
+
+    def _start_refresher(self):
+        """Starts the refresh thread if it is not already running. Called with the lock held."""
+        if self._refresher is None:
+            self._refresher = threading.Thread(target=self._refresh_loop, name="secret-refresh", daemon=True)
+            self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            with self._lock:
+                if not self._secrets:    # Cleared, so there is nothing left to refresh.
+                    self._refresher = None
+                    return
+                now = time.monotonic()
+                due = [name for name, (_, refresh_at) in self._secrets.items() if refresh_at <= now]
+                next_refresh = min(refresh_at for _, refresh_at in self._secrets.values())
+
+            for name in due:
+                self.refresh(name)
+
+            if not due:
+                self._wake.wait(next_refresh - now)
+                self._wake.clear()
+
+    def refresh(self, name):
+        """Fetches a secret again, keeping the cached value if the fetch fails. Called by the refresh thread.
+
+        Returns:
+            bool: True if the secret was refreshed.
+        """
+        try:
+            with self._fetch_lock:
+                value = self._fetch(name)
+        except Exception as e:
+            print(f"Error refreshing secret '{name}': {e}")
+            with self._lock:
+                self._stats["refresh_failures"] += 1
+                if name in self._secrets:
+                    self._secrets[name] = (self._secrets[name][0], time.monotonic() + self.retry_seconds)
+            return False
+
+        with self._lock:
+            self._stats["refreshes"] += 1
+            if name in self._secrets:    # Not cleared during the fetch.
+                self._secrets[name] = (value, time.monotonic() + self.ttl_seconds - self.refresh_before_seconds)
+        return True
+
+    def clear(self):
+        """Forgets every cached secret, so each is fetched again when it is next read."""
+        with self._lock:
+            self._secrets.clear()
+        self._wake.set()
+
+    def stats(self):
+        """Returns the cache's read, fetch and refresh counters, and the secrets it holds."""
+        with self._lock:
+            return dict(self._stats, secrets=sorted(self._secrets))
+
+
+def make_backend():
+    """Creates the backend selected by Config.SECRETS_BACKEND."""
+    if Config.SECRETS_BACKEND == "local":
+        return LocalBackend(KEY_FILEPATH)
+    return KeyVaultBackend(VAULT_NAME)
+
+
+# Every secret used by the web app, fetched once and refreshed in the background.
+secret_cache = SecretCache(make_backend, Config.SECRETS_TTL_SECONDS, Config.SECRETS_REFRESH_BEFORE_SECONDS)
+
+
+def get_blob_storage_key():
+    """Returns the Azure storage account's connection string, built around the cached account key."""
+    key = secret_cache.get("blob_storage_key")
+    # Sets connection string, where AccountName is the name of the Storage Account, and AccountKey is a valid Access Key to that account.
     conn_string = f"DefaultEndpointsProtocol=https;AccountName={ACCOUNT_NAME};AccountKey=;EndpointSuffix=core.windows.net"
-    
-    # Create a SecretClient using DefaultAzureCredential.
-    credential = DefaultAzureCredential()
-    client = SecretClient(vault_url=vault_url, credential=credential)
-    
-    # Retrieve the secret from the Key Vault
-    retrieved_secret = client.get_secret(secret_name)
-    key = retrieved_secret.value.rstrip()
-    
-    #Format correctly
+
+    # Places the key in the correct position in the middle of connection string.
     return conn_string[:69] + key + conn_string[69:]
 
 
 def get_db_password():
-    secret_name = "historicalDatabasePassword"
-    vault_url = f"https://{VAULT_NAME}.vault.azure.net/"
-    
-    # Create a SecretClient using DefaultAzureCredential
-    credential = DefaultAzureCredential()
-    client = SecretClient(vault_url=vault_url, credential=credential)
-    
-    # Retrieve the secret from the Key Vault
-    retrieved_secret = client.get_secret(secret_name)
-    password = retrieved_secret.value.rstrip()
-    
-    return password
\ No newline at end of file
+    """Returns the cached Azure database password."""
+    return secret_cache.get("db_password")
@@ -1,107 +1,274 @@
 """This module contains functions that the web app uses to interact with the Azure database."""
 
+import bisect
 import json
+import math
 import pyodbc
 import get_key
 import datetime
+import point_parser
+from cache import LRUCache
+from config import Config
+from db_pool import ConnectionPool
+from track import to_epoch, to_number
 
 TIMEOUT = 30
 SERVER = 'cits3200server.database.windows.net' # MODIFY THIS WHEN CREATING A NEW SQL DB SERVER
 DATABASE = 'cits3200DB' # MODIFY THIS WHEN CREATING A NEW SQL DB
 USERNAME = 'cits3200group4' 
-PASSWORD = get_key.get_db_password()
 DRIVER_VERSION = "ODBC Driver 18 for SQL Server"
 
 
 def get_database_url():
-    """Fetches the database connection URL from static variables set in this function.
+    """Builds the database connection URL from the static variables above and the cached password.
+
+    Only called when the pool opens a new connection. The password is read from get_key's secret
+    cache, so connections opened after the password is rotated use the new one.
 
     Returns:
         string (str): Azure database connection string.
     """
-    server = "cits3200server.database.windows.net"
-    database = "cits3200DB"
-    username = "cits3200group4"
     password = get_key.get_db_password()
-    connection_string = f'DRIVER={DRIVER_VERSION};SERVER={SERVER};DATABASE={DATABASE};UID={USERNAME};PWD={PASSWORD}'
+    connection_string = f'DRIVER={DRIVER_VERSION};SERVER={SERVER};DATABASE={DATABASE};UID={USERNAME};PWD={password}'
 
     return connection_string
 
 
+# Every query checks out a connection from this pool, instead of logging in to the database again.
+pool = ConnectionPool(
+    lambda: pyodbc.connect(get_database_url(), timeout=TIMEOUT),
+    max_size=Config.DB_POOL_MAX_SIZE,
+    recycle_seconds=Config.DB_POOL_RECYCLE_SECONDS,
+    pre_ping_after_seconds=Config.DB_POOL_PRE_PING_AFTER_SECONDS,
+    checkout_timeout=Config.DB_POOL_CHECKOUT_TIMEOUT_SECONDS)
+
+
 def connect_database():
-    """Connects to the database using the pyodbc driver."""
+    """Checks that a pooled connection to the database works.
+
+    Returns:
+        bool: True if the database answered a query.
+    """
     try:
-        with pyodbc.connect(get_database_url(), timeout=TIMEOUT) as conn:
+        with pool.connection() as conn:
             cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
             print("Connection to database successful.")
-            return cursor
+            return True
 
     except Exception as e:
         print(f"An error occured when connecting to the database: {e}")
-        return None
+        return False
+
+
+# Searches only stored in search_history.gps_JSON, paired with their parsed pings and ping times.
+# gps_JSON is no longer written, so a cached search never goes stale.
+legacy_track_cache = LRUCache(Config.LEGACY_TRACK_CACHE_MAX_BYTES)
+
+MAX_QUERY_PARAMETERS = 2000    # SQL Server accepts at most 2100 parameters per statement.
+SEARCH_HISTORY_COLUMNS = ("session_id", "base_station", "start_time", "end_time", "gpx_data", "search_date", "gps_JSON")
+
+
+PING_COLUMNS = ("session_id", "base_station", "seq", "point_key", "name", "time_text", "ping_time", "lat", "lon",
+                "telemetry", "longname")
+
+
+def upsert_search_rows(conn, rows, columns=SEARCH_HISTORY_COLUMNS):
+    """Inserts or updates search_history rows with one MERGE statement per batch of rows.
+
+    Runs in the connection's current transaction, so the caller commits every batch at once.
+
+    Args:
+        conn (pyodbc.Connection): An open database connection.
+        rows (list): Tuples of values in the order of columns. Each row must have a different
+            (session_id, base_station) pair.
+        columns (tuple, optional): The columns to write, starting with session_id and base_station.
+            Columns left out keep their current values.
+    """
+    column_list = ", ".join(columns)
+    updates = ", ".join(f"{column} = source.{column}" for column in columns[2:])
+    row_placeholder = "(" + ", ".join("?" for _ in columns) + ")"
+    batch_size = MAX_QUERY_PARAMETERS // len(columns)
+
+    cursor = conn.cursor()
+    for i in range(0, len(rows), batch_size):
+        batch = rows[i:i + batch_size]
+        query = f"""
+            MERGE search_history WITH (HOLDLOCK) AS target
+            USING (VALUES {", ".join(row_placeholder for _ in batch)}) AS source ({column_list})
+            ON target.session_id = source.session_id AND target.base_station = source.base_station
+            WHEN MATCHED THEN
+                UPDATE SET {updates}
+            WHEN NOT MATCHED THEN
+                INSERT ({column_list}) VALUES ({", ".join("source." + column for column in columns)});
+        """
+        cursor.execute(query, [value for row in batch for value in row])
+
+
+def to_ping_row(session_id, base_station, seq, point):
+    """Converts a point_parser.Point to a row of the pings table, in the order of PING_COLUMNS."""
+    try:
+        ping_time = datetime.datetime.fromisoformat(point.time.replace("Z", "+00:00")).replace(tzinfo=None)
+    except (AttributeError, ValueError):
+        ping_time = None
+    lat, lon = to_number(point.lat), to_number(point.lon)
+    lat, lon = None if math.isnan(lat) else lat, None if math.isnan(lon) else lon    # Stored as NULL.
+    return (session_id, base_station, seq, point.key, point.name, point.time, ping_time, lat, lon,
+            json.dumps(point.telemetry), point.longname)
+
+
+def insert_pings(conn, session_id, base_station, points, start=0):
+    """Inserts pings into the pings table, with one INSERT statement per batch.
+
+    Args:
+        conn (pyodbc.Connection): An open database connection.
+        session_id (str): The search's session ID.
+        base_station (str): The base station the pings were uploaded by.
+        points (list): The Point records to insert.
+        start (int, optional): The sequence number of the first point.
+    """
+    rows = [to_ping_row(session_id, base_station, start + i, point) for i, point in enumerate(points)]
+    row_placeholder = "(" + ", ".join("?" for _ in PING_COLUMNS) + ")"
+    batch_size = min(MAX_QUERY_PARAMETERS // len(PING_COLUMNS), 1000)    # INSERT accepts at most 1000 rows.
+
+    cursor = conn.cursor()
+    for i in range(0, len(rows), batch_size):
+        batch = rows[i:i + batch_size]
+        query = f"INSERT INTO pings ({', '.join(PING_COLUMNS)}) VALUES {', '.join(row_placeholder for _ in batch)}"
+        cursor.execute(query, [value for row in batch for value in row])
+
+
+def append_pings(conn, session_id, base_station, gps_data):
+    """Stores only the pings of a base station's upload that are not already in the pings table.
+
+    The number of pings already stored is read in the caller's transaction, which then holds an
+    update lock on the search's pings until it commits. Uploads of the same search from other
+    processes therefore wait and append after these pings, instead of inserting the same rows. Only
+    the pings after the stored ones are parsed, if the upload is line-delimited.
+
+    If the upload has fewer pings than are stored (the base station restarted its upload), the
+    stored pings are replaced. An empty upload (e.g. a blob nothing has been appended to yet) adds
+    nothing.
+
+    Args:
+        conn (pyodbc.Connection): An open database connection.
+        session_id (str): The search's session ID.
+        base_station (str): The base station's name.
+        gps_data: The base station's upload, in any format accepted by point_parser.parse_points().
+
+    Returns:
+        int: The number of pings stored once the transaction commits.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT MAX(seq) FROM pings WITH (UPDLOCK, HOLDLOCK) WHERE session_id = ? AND base_station = ?",
+                   (session_id, base_station))
+    last_seq = cursor.fetchone()[0]
+    stored = 0 if last_seq is None else last_seq + 1
+
+    points, count = point_parser.parse_points_from(gps_data, stored)
+    if count == 0:
+        return stored
+    if count < stored:
+        cursor.execute("DELETE FROM pings WHERE session_id = ? AND base_station = ?", (session_id, base_station))
+        points, stored = point_parser.parse_points(gps_data), 0
+    insert_pings(conn, session_id, base_station, points, stored)
+    return count
+
+
+def to_point_dict(row):
+    """Converts a row of the pings table back to the {"pointN": {...}} shape uploaded by base stations."""
+    return {row.point_key: {
+        "name": row.name,
+        "time": row.time_text,
+        "lat": row.lat,
+        "long": row.lon,
+        "telemetry": json.loads(row.telemetry) if row.telemetry else {},
+        "longname": row.longname,
+    }}
+
+
+def read_gps_json(cursor, session_id, base_stations):
+    """Reads a search's pings in the JSON shape they were uploaded in.
+
+    Pings are rebuilt from the pings table. Searches stored before it existed (and not yet
+    backfilled) are read from search_history.gps_JSON instead.
+
+    Args:
+        cursor (pyodbc.Cursor): A cursor of an open database connection.
+        session_id (str): The search's session ID.
+        base_stations (list): The base stations to read.
+
+    Returns:
+        dict: Base station names paired with their pings as a JSON string. Base stations with no
+            stored pings are left out.
+    """
+    if not base_stations:
+        return {}
+    placeholders = ",".join("?" for _ in base_stations)
+
+    points = {}
+    cursor.execute(f"""
+        SELECT base_station, point_key, name, time_text, lat, lon, telemetry, longname
+        FROM pings
+        WHERE session_id = ? AND base_station IN ({placeholders})
+        ORDER BY base_station, seq
+    """, [session_id, *base_stations])
+    for row in cursor.fetchall():
+        points.setdefault(row.base_station, []).append(to_point_dict(row))
+    json_data = {base_station: json.dumps(station_points) for base_station, station_points in points.items()}
+
+    missing = [base_station for base_station in base_stations if base_station not in json_data]
+    if missing:
+        placeholders = ",".join("?" for _ in missing)
+        cursor.execute(f"""
+            SELECT base_station, gps_JSON
+            FROM search_history
+            WHERE session_id = ? AND base_station IN ({placeholders}) AND gps_JSON IS NOT NULL
+        """, [session_id, *missing])
+        for row in cursor.fetchall():
+            json_data[row.base_station] = row.gps_JSON
+
+    return json_data
 
 
 def upload_search_data(active_search, incomplete=False):
     """Uploads search data to database upon pressing of the 'Fetch Latest Data' or 'End Search' buttons.
 
+    Every base station's search_history row is inserted or updated by a single MERGE, and only the
+    pings each base station uploaded since the previous call are added to the pings table, all in
+    one transaction. search_history.gps_JSON is no longer written.
+
     Args:
         active_search (dict): A dictionary of start_time, session_id, and all currently selected blob's data.
         incomplete (bool): If the function is called when end_time, gpx_data, search_date are unavailable.
     """
-    base_stations = active_search["gps_data"].keys()
+    session_id = active_search["session_id"]
+    start_time = active_search["start_time"]
 
+    columns = tuple(column for column in SEARCH_HISTORY_COLUMNS if column != "gps_JSON")
     try:
-        with pyodbc.connect(get_database_url(), timeout=TIMEOUT) as conn:
-            cursor = conn.cursor()
+        rows = []
+        for base_station in active_search["gps_data"]:
+            if incomplete:
+                end_time = None
+                gpx_data = None
+                search_date = None
 
-            for base_station in base_stations:
-                session_id = active_search["session_id"]
-                start_time = active_search["start_time"]
-                gps_json = active_search["gps_data"][base_station]
-
-                if incomplete:
-                    end_time = None
-                    gpx_data = None
-                    search_date = None
-
-                else:
-                    end_time = active_search["end_time"]
-                    gpx_data = active_search["gpx_data"][base_station]
-                    search_date = active_search["search_date"]
-
-                # Converts data to JSON string to ensure legal storage in the database.
-                if (type(gps_json) == bytes):
-                    gps_json = gps_json.decode("utf-8")
-                decoded_data = gps_json.replace("'", '"')
-                gps_json_string = json.dumps(json.loads(decoded_data))
-
-                # Check if the record already exists
-                check_query = """
-                    SELECT COUNT(*)
-                    FROM search_history
-                    WHERE session_id = ? AND base_station = ?
-                """
-                cursor.execute(check_query, (session_id, base_station))
-                exists = cursor.fetchone()[0]
-
-                if exists > 0:
-                # Update the existing row
-                    update_query = """
-                        UPDATE search_history
-                        SET start_time = ?, end_time = ?, gpx_data = ?, search_date = ?, gps_JSON = ?
-                        WHERE session_id = ? AND base_station = ?
-                    """
-                    cursor.execute(update_query, (start_time, end_time, gpx_data, search_date, gps_json_string, session_id, base_station))
-                else:
-                    query = """
-                        INSERT INTO search_history (session_id, base_station, start_time, end_time, gpx_data, search_date, gps_JSON)
-                        VALUES (?, ?, ?, ?, ?, ?, ?);
-                    """
-                    cursor.execute(query, (session_id, base_station, start_time, end_time,
-                                       gpx_data, search_date, gps_json_string))
-                conn.commit()
-
-            print("Upload to database successful.")
+            else:
+                end_time = active_search["end_time"]
+                gpx_data = active_search["gpx_data"][base_station]
+                search_date = active_search["search_date"]
+
+            rows.append((session_id, base_station, start_time, end_time, gpx_data, search_date))
+
+        if rows:
+            with pool.connection() as conn:
+                upsert_search_rows(conn, rows, columns)
+                for base_station, gps_data in active_search["gps_data"].items():
+                    append_pings(conn, session_id, base_station, gps_data)
+
+        print("Upload to database successful.")
 
     except Exception as e:
         print(f"An error occured when uploading search data to the database: {e}")
@@ -116,7 +283,7 @@ def get_unique_base_stations():
         list: All unique base stations in database, or an empty list if an error occured.
     """
     try:
-        with pyodbc.connect(get_database_url(), timeout=TIMEOUT) as conn:
+        with pool.connection() as conn:
             cursor = conn.cursor()
             query = "SELECT DISTINCT base_station FROM search_history"
             cursor.execute(query)
@@ -143,17 +310,8 @@ def get_live_searches(session_id, base_stations):
         dict: JSON data for the selected base stations, pulled from the database.
     """
     try:
-        with pyodbc.connect(get_database_url(), timeout=TIMEOUT) as conn:
-            cursor = conn.cursor()
-
-        json_data = {}
-        for base_station in base_stations:
-            # SQL query to filter searches based on session_id and base station
-            query = "SELECT gps_JSON FROM search_history WHERE session_id = CAST(? AS VARCHAR) AND base_station = CAST(? AS VARCHAR)"
-            cursor.execute(query, (session_id, base_station))
-            json_data[base_station] = cursor.fetchall()[0].gps_JSON
-
-        conn.close()
+        with pool.connection() as conn:
+            json_data = read_gps_json(conn.cursor(), session_id, base_stations)
 
     except Exception as e:
         print(f"An error occured when getting live searches: {e}")
@@ -162,22 +320,32 @@ def get_live_searches(session_id, base_stations):
     return json_data
 
 
-def get_historical_searches(start_date=None, end_date=None, base_stations=None):
-    """Retrieves historical searches from the database to display on the historical search page.
+def get_historical_searches(start_date=None, end_date=None, base_stations=None, after=None, page_size=None):
+    """Retrieves one page of completed searches, newest first, to display on the historical search page.
+
+    Only the columns shown in the list are read (never gps_JSON or gpx_data), and pages are found
+    by keyset pagination on (search_date, session_id, base_station), so a page costs the same
+    however much history there is or how far into it the page is.
 
     Args:
         start_date (str, optional): The start date of the filter.
         end_date (str, optional): The end date of the filter.
         base_stations (list, optional): A list of the selected base stations to filter.
+        after (list, optional): The key of the last search on the previous page, as returned by
+            the previous call. Defaults to the first page.
+        page_size (int, optional): The most searches returned. Defaults to Config.HISTORY_PAGE_SIZE.
 
     Returns:
-        list: Base stations between the start and end dates, as rows from the database.
+        tuple: The page's rows (session_id, base_station, start_time, end_time, search_date), and the
+            key to pass as 'after' to get the next page, or None if this is the last page. None
+            instead of the tuple if an error occured.
     """
+    page_size = page_size or Config.HISTORY_PAGE_SIZE
     try:
-        with pyodbc.connect(get_database_url(), timeout=TIMEOUT) as conn:
-            cursor = conn.cursor()
-
-        query = "SELECT session_id, base_station, start_time, end_time, search_date, gps_JSON, gpx_data FROM search_history WHERE 1=1"
+        query = f"""
+            SELECT TOP ({int(page_size) + 1}) session_id, base_station, start_time, end_time, search_date
+            FROM search_history
+            WHERE search_date IS NOT NULL"""
 
         params = []
         if start_date:
@@ -192,30 +360,83 @@ def get_historical_searches(start_date=None, end_date=None, base_stations=None):
             query += f" AND base_station IN ({placeholders})"
             params.extend(base_stations)
 
-        cursor.execute(query, params)
-        results = cursor.fetchall()
-        conn.close()
+        if after:    # Continues after the previous page's last search.
+            search_date, session_id, base_station = after
+            query += """ AND (search_date < ? OR (search_date = ? AND (session_id < ?
+                          OR (session_id = ? AND base_station < ?))))"""
+            params.extend([search_date, search_date, session_id, session_id, base_station])
+
+        query += " ORDER BY search_date DESC, session_id DESC, base_station DESC"
+
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            results = cursor.fetchall()
 
     except Exception as e:
         print(f"An error occured when getting selected historical searches: {e}")
         return None
 
-    return results
+    if len(results) <= page_size:
+        return results, None
+    results = results[:page_size]
+    last = results[-1]
+    return results, [last.search_date.isoformat(), last.session_id, last.base_station]
 
 
-def get_all_searches():
-    """The same as the above function, but fetches all searches instead."""
+def get_search_track(session_id, base_station):
+    """Retrieves the pings of one search, for loading its track on demand.
+
+    Args:
+        session_id (str): The search's session ID.
+        base_station (str): The base station's name.
+
+    Returns:
+        list: The pings as {"pointN": {...}} dicts in upload order, or an empty list if there are
+            none or an error occured.
+    """
+    json_data = get_live_searches(session_id, [base_station]).get(base_station)
+    if not json_data:
+        return []
     try:
+        return point_parser.loads(json_data)
+    except ValueError as e:
+        print(f"An error occured when reading the track of {session_id} / {base_station}: {e}")
+        return []
+
 
-        with pyodbc.connect(get_database_url(), timeout=TIMEOUT) as conn:
+def get_gpx_data(session_id, base_station):
+    """Retrieves the GPX file stored for a completed search.
+
+    Returns:
+        str: The GPX data, or None if the search has none or an error occured.
+    """
+    try:
+        with pool.connection() as conn:
             cursor = conn.cursor()
+            cursor.execute("SELECT gpx_data FROM search_history WHERE session_id = ? AND base_station = ?",
+                           (session_id, base_station))
+            row = cursor.fetchone()
 
-        query = "SELECT session_id, base_station, start_time, end_time, search_date, gps_JSON FROM search_history"
+    except Exception as e:
+        print(f"An error occured when getting GPX data: {e}")
+        return None
 
-        cursor.execute(query)
-        results = cursor.fetchall()
+    return row.gpx_data if row else None
+
+
+def get_all_searches():
+    """Fetches every search, like get_historical_searches() but unfiltered and unpaged.
+
+    Only the listed columns are read; a search's pings are read with get_search_track().
+    """
+    try:
+        query = "SELECT session_id, base_station, start_time, end_time, search_date FROM search_history"
 
-        conn.close()
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query)
+            results = cursor.fetchall()
 
     except Exception as e:
         print(f"An error occured when getting all historical searches: {e}")
@@ -226,44 +447,56 @@ def get_all_searches():
 
 def get_pings_after_time(session_id, base_station, filter_time):
     """Retrieves pings from the database for a specific base station and session after a given time.
-    
-    Returns an empty list if we encounter errors or if we simply have no pings.
+
+    The pings table is searched with its (session_id, base_station, ping_time) index, so only the
+    pings after filter_time are read. Searches not yet copied to the pings table are read from
+    search_history.gps_JSON, parsed once into legacy_track_cache, and filtered by binary search
+    over their ping times.
+
+    Args:
+        session_id (str): The search's session ID.
+        base_station (str): The base station's name.
+        filter_time (datetime.datetime): The time, without a timezone (like uploaded ping times).
+
+    Returns:
+        list: The pings recorded strictly after filter_time, as {"pointN": {...}} dicts in upload
+            order. Empty if there are none or an error occurs.
     """
+    filter_time = filter_time.replace(tzinfo=None)
     try:
-        with pyodbc.connect(get_database_url(), timeout=TIMEOUT) as conn:
+        with pool.connection() as conn:
             cursor = conn.cursor()
-
-            # Selects pings after a specific time for a given session and base station.
-            query = """
-            SELECT gps_JSON 
-            FROM search_history 
-            WHERE session_id = ? AND base_station = ?
-            """
-            print(query, session_id, base_station)
-            cursor.execute(query, (session_id, base_station))
-            result = cursor.fetchone()
-            if result:
-                gps_data = result[0]
-                print(gps_data[-1])
-                decoded_data = json.loads(gps_data) if isinstance(gps_data, str) else gps_data
-                filter_time = filter_time.strftime("%Y-%m-%dT%H:%M:%S")
-                filter_time = datetime.datetime.strptime(filter_time, '%Y-%m-%dT%H:%M:%S')
-                broken_out = False
-                print(decoded_data[-1])
-                for i, ping in enumerate(decoded_data):
-                    ping_time = datetime.datetime.strptime(list(ping.values())[0]['time'], '%Y-%m-%dT%H:%M:%S')
-                    if ping_time > filter_time:
-                        print("REACHED CURRENT POINT")
-                        decoded_data = decoded_data[i:]
-                        broken_out = True
-                        break
-                if not broken_out:
-                    decoded_data = []
-                    
-                return decoded_data
-            else:
-                return []
+            cursor.execute("""
+                SELECT point_key, name, time_text, lat, lon, telemetry, longname
+                FROM pings
+                WHERE session_id = ? AND base_station = ? AND ping_time > ?
+                ORDER BY seq
+            """, (session_id, base_station, filter_time))
+            rows = cursor.fetchall()
+            if rows:
+                return [to_point_dict(row) for row in rows]
+
+            cursor.execute("SELECT TOP 1 1 FROM pings WHERE session_id = ? AND base_station = ?", (session_id, base_station))
+            if cursor.fetchone():
+                return []    # The search has pings, but none after filter_time.
+
+            cached = legacy_track_cache.get((session_id, base_station))
+            if cached is None:
+                cursor.execute("""
+                    SELECT gps_JSON FROM search_history
+                    WHERE session_id = ? AND base_station = ? AND gps_JSON IS NOT NULL
+                """, (session_id, base_station))
+                row = cursor.fetchone()
+                if row is None:
+                    return []
+                points = point_parser.loads(row.gps_JSON)
+                times = [to_epoch(next(iter(point.values()), {}).get("time")) for point in points]
+                cached = (points, times)
+                legacy_track_cache.put((session_id, base_station), cached, len(row.gps_JSON))
+
+        points, times = cached
+        return points[bisect.bisect_right(times, to_epoch(filter_time.isoformat())):]
 
     except Exception as e:
         print(f"Error in get_pings_after_time: {e}")
-        return []
\ No newline at end of file
+        return []
@@ -0,0 +1,281 @@
+"""This module polls the watched base station containers in the background, so that requests never wait on Azure.
+
+The IngestService keeps a shared LiveState holding the latest fetch result of every watched
+container. Requests read the state instead of downloading blobs, and only fetch a container
+themselves the first time it is watched.
+"""
+
+import math
+import random
+import threading
+import time
+from config import Config
+from retrieve_from_containers import fetch_containers
+from track import local_epoch
+
+
+class LiveState:
+    """The latest fetch result and poll health of each watched container, shared between threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._containers = {}    # Container names paired with their state (see watch()).
+
+    def watch(self, container_name, now, next_poll=None):
+        """Adds a container to the state if it is not already in it, and marks it as read.
+
+        Args:
+            container_name (str): The name of the container.
+            now (float): The monotonic time of the read.
+            next_poll (float, optional): The monotonic time of the first poll of an added container.
+                Defaults to now.
+
+        Returns:
+            bool: True if the container was added.
+        """
+        with self._lock:
+            state = self._containers.get(container_name)
+            if state is not None:
+                state["last_read"] = now
+                return False
+            self._containers[container_name] = {
+                "result": None,           # The latest successful fetch result.
+                "error": None,            # The error of the latest poll, if it failed.
+                "failures": 0,            # Consecutive failed polls.
+                "polls": 0,
+                "last_read": now,
+                "last_success": None,     # Wall-clock time of the latest successful poll.
+                "last_change": None,      # Wall-clock time the blob was last seen to change.
+                "next_poll": now if next_poll is None else next_poll,    # Monotonic time of the next poll.
+            }
+            return True
+
+    def unwatch(self, container_name, now, idle_seconds):
+        """Removes a container from the state, so it is no longer polled, unless it was read in the last idle_seconds."""
+        with self._lock:
+            state = self._containers.get(container_name)
+            if state is not None and now - state["last_read"] > idle_seconds:
+                del self._containers[container_name]
+
+    def result(self, container_name):
+        """Returns a container's latest fetch result, its latest error if it has never been fetched, or None."""
+        with self._lock:
+            state = self._containers.get(container_name)
+            if state is None:
+                return None
+            if state["result"] is not None:
+                return state["result"]
+            if state["error"] is not None:
+                return {"container": container_name, "blob_name": None, "content": None, "track": None,
+                        "etag": None, "error": state["error"]}
+            return None
+
+    def record(self, result, next_poll):
+        """Records the outcome of polling a container.
+
+        Args:
+            result (dict): The fetch result (see fetch_container_blob()).
+            next_poll (float): The monotonic time the container should next be polled.
+
+        Returns:
+            bool: True if the container's blob changed since the previous poll.
+        """
+        with self._lock:
+            state = self._containers.get(result["container"])
+            if state is None:    # Stopped being watched during the poll.
+                return False
+            state["polls"] += 1
+            state["next_poll"] = next_poll
+            if result["error"]:
+                state["error"] = result["error"]
+                state["failures"] += 1
+                return False
+
+            previous = state["result"]
+            changed = previous is None or previous["etag"] != result["etag"]
+            state.update(result=result, error=None, failures=0, last_success=time.time())
+            if changed:
+                state["last_change"] = state["last_success"]
+            return changed
+
+    def failures(self, container_name):
+        """Returns the number of consecutive failed polls of a container."""
+        with self._lock:
+            return self._containers.get(container_name, {}).get("failures", 0)
+
+    def due(self, now):
+        """Returns the containers due to be polled, and the monotonic time of the next poll after them."""
+        with self._lock:
+            due = [name for name, state in self._containers.items() if state["next_poll"] <= now]
+            upcoming = [state["next_poll"] for state in self._containers.values() if state["next_poll"] > now]
+        return due, min(upcoming, default=None)
+
+    def expire(self, now, idle_seconds, keep):
+        """Stops watching containers that have not been read for idle_seconds, except those in keep."""
+        with self._lock:
+            for name in [name for name, state in self._containers.items()
+                         if now - state["last_read"] > idle_seconds and name not in keep]:
+                del self._containers[name]
+
+    def health(self, now):
+        """Returns the health of each watched container.
+
+        Returns:
+            dict: Container names paired with:
+                - status (str): "ok", "failing" (the latest poll failed) or "pending" (not yet polled).
+                - failures (int): Consecutive failed polls.
+                - error (str): The error of the latest poll, or None.
+                - polls (int): Polls made since the container was watched.
+                - points (int): Pings held for the container.
+                - poll_lag_seconds (float): Time since the latest successful poll, i.e. how stale the
+                    state may be. None if it has never been polled successfully.
+                - data_lag_seconds (float): Time since the newest ping was recorded, i.e. how far
+                    behind the base station is. None if there are no pings. Ping times are recorded
+                    in local time, in Config.PING_TIMEZONE (see track.local_epoch()).
+                - next_poll_seconds (float): Time until the next poll.
+        """
+        wall_now = time.time()
+        health = {}
+        with self._lock:
+            for name, state in self._containers.items():
+                track = state["result"]["track"] if state["result"] else None
+                newest = track.time[-1] if track else math.nan
+                if state["error"]:
+                    status = "failing"
+                elif state["result"] is None:
+                    status = "pending"
+                else:
+                    status = "ok"
+                health[name] = {
+                    "status": status,
+                    "failures": state["failures"],
+                    "error": state["error"],
+                    "polls": state["polls"],
+                    "points": len(track) if track else 0,
+                    "poll_lag_seconds": wall_now - state["last_success"] if state["last_success"] else None,
+                    "data_lag_seconds": None if math.isnan(newest) else wall_now - local_epoch(newest, Config.PING_TIMEZONE),
+                    "next_poll_seconds": max(state["next_poll"] - now, 0.0),
+                }
+        return health
+
+
+class IngestService(threading.Thread):
+    """A background thread polling every watched container into a LiveState.
+
+    Containers are watched when a request reads them, and stop being watched once nobody has read
+    them for idle_seconds and they have no live stream subscribers. Failing containers are retried with exponential backoff and full jitter, so
+    many failing containers do not retry in step.
+    """
+
+    def __init__(self, get_blob_service_client, poll_seconds, max_backoff_seconds, idle_seconds, hub=None):
+        """Creates a stopped service with an empty state.
+
+        Args:
+            get_blob_service_client (callable): Returns the client used to poll containers.
+            poll_seconds (float): The time between polls of each healthy container.
+            max_backoff_seconds (float): The longest time between polls of a failing container.
+            idle_seconds (float): How long a container is polled after it was last read.
+            hub (StreamHub, optional): The live stream hub, sent each container's track when it changes.
+        """
+        super().__init__(name="ingest", daemon=True)
+        self.get_blob_service_client = get_blob_service_client
+        self.poll_seconds = poll_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.idle_seconds = idle_seconds
+        self.hub = hub
+        self.state = LiveState()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+
+    def watch(self, container_names):
+        """Starts (or keeps) polling some containers, polling newly watched ones at once."""
+        now = time.monotonic()
+        added = [self.state.watch(name, now) for name in container_names]
+        if any(added):
+            self._wake.set()
+
+    def unwatch(self, container_names):
+        """Stops polling some containers once nobody is watching their live stream.
+
+        Containers read in the last idle_seconds (e.g. by /api/update-map sessions) are still polled,
+        and expire once they are idle.
+        """
+        now = time.monotonic()
+        for name in container_names:
+            self.state.unwatch(name, now, self.idle_seconds)
+
+    def results(self, container_names):
+        """Returns the latest fetch result of each container, in the order given.
+
+        Containers that have not been polled yet (e.g. they were just watched) are fetched
+        immediately, and their results are recorded as their first poll.
+
+        Args:
+            container_names (list): The names of the containers.
+
+        Returns:
+            list: The fetch results, in the format of fetch_container_blob().
+        """
+        # Newly watched containers are fetched here, so the poller skips them until that fetch is recorded.
+        now = time.monotonic()
+        for name in container_names:
+            self.state.watch(name, now, next_poll=math.inf)
+        results = {name: self.state.result(name) for name in container_names}
+        missing = [name for name, result in results.items() if result is None]
+        if missing:
+            for result in self.poll(missing):
+                results[result["container"]] = result
+        return [results[name] for name in container_names]
+
+    def backoff(self, failures):
+        """Returns the delay before retrying a container after some consecutive failures.
+
+        The delay is drawn uniformly between poll_seconds and an exponentially growing ceiling
+        (capped at max_backoff_seconds), so that failing containers spread their retries out.
+        """
+        ceiling = min(self.max_backoff_seconds, self.poll_seconds * 2 ** failures)
+        return random.uniform(self.poll_seconds, max(ceiling, self.poll_seconds))
+
+    def poll(self, container_names):
+        """Fetches some containers concurrently, records the results, and publishes changed tracks.
+
+        Returns:
+            list: The fetch results.
+        """
+        results = fetch_containers(self.get_blob_service_client(), container_names)
+        now = time.monotonic()
+        for result in results:
+            if result["error"]:
+                delay = self.backoff(self.state.failures(result["container"]) + 1)
+            else:
+                delay = self.poll_seconds
+            changed = self.state.record(result, now + delay)
+            if changed and self.hub is not None:
+                self.hub.publish(result["container"], result["track"])
+        return results
+
+    def run(self):
+        while not self._stopped.is_set():
+            self._wake.clear()
+            now = time.monotonic()
+            keep = self.hub.subscribed_containers() if self.hub is not None else set()
+            self.state.expire(now, self.idle_seconds, keep)
+
+            due, next_poll = self.state.due(now)
+            if due:
+                try:
+                    self.poll(due)
+                    continue
+                except Exception as e:
+                    print(f"Error polling containers: {e}")
+                    next_poll = None
+
+            self._wake.wait(self.poll_seconds if next_poll is None else next_poll - now)
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def health(self):
+        """Returns the poll health and lag of each watched container (see LiveState.health())."""
+        return self.state.health(time.monotonic())
@@ -0,0 +1,176 @@
+"""This module pushes new GPS pings to the browser sessions watching a base station.
+
+Each container watched by at least one session is polled once, however many sessions are watching
+it, by the ingest service (see ingest.py), which publishes its track to the hub whenever it changes.
+The new pings are then sent to every subscriber, starting from that subscriber's own cursor.
+"""
+
+import queue
+import threading
+import time
+from retrieve_from_containers import make_delta
+
+
+class Subscriber:
+    """One browser session's subscription to the new pings of some containers."""
+
+    def __init__(self, cursors, queue_size):
+        """Creates a subscription.
+
+        Args:
+            cursors (dict): Container names paired with the number of pings the session already has,
+                checked by retrieve_from_containers.parse_cursors.
+            queue_size (int): The most events held for the session before new ones are held back.
+        """
+        self.cursors = dict(cursors)
+        self.queue = queue.Queue(queue_size)
+
+    def get(self, timeout):
+        """Waits for the next event.
+
+        Args:
+            timeout (float): How long to wait, in seconds.
+
+        Returns:
+            tuple: The event (container names paired with deltas) and the monotonic time it was
+                published, or None if no event arrived in time.
+        """
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class StreamHub:
+    """Fans the tracks published by the ingest service out to each container's subscribers.
+
+    The hub only holds the latest track of containers with at least one subscriber, and forgets it
+    with their last subscriber. Events are only built once for each distinct cursor, so subscribers
+    that are up to date share the same event.
+    """
+
+    def __init__(self, queue_size=100, on_unwatched=None):
+        """Creates a hub with no subscribers.
+
+        Args:
+            queue_size (int, optional): The most events held for a subscriber that is not reading them.
+            on_unwatched (callable, optional): Called with a container's name when its last
+                subscriber leaves, e.g. to stop polling it.
+        """
+        self.queue_size = queue_size
+        self.on_unwatched = on_unwatched
+        self._lock = threading.Lock()
+        self._subscribers = {}    # Container names paired with the set of their subscribers.
+        self._tracks = {}         # Subscribed container names paired with their latest track.
+        self._stats = {"events_published": 0, "events_delivered": 0, "events_held_back": 0}
+        self._fanout = {"count": 0, "total": 0.0, "max": 0.0, "last": 0.0}
+
+    def subscribe(self, cursors, tracks=None):
+        """Subscribes to the new pings of some containers.
+
+        Args:
+            cursors (dict): Container names paired with the number of pings the caller already has.
+            tracks (dict, optional): Container names paired with their current track, e.g. from the
+                ingest service, used for containers the hub holds no track for yet.
+
+        Returns:
+            Subscriber: The subscription. Pings already known past its cursors are queued at once.
+        """
+        subscriber = Subscriber(cursors, self.queue_size)
+        with self._lock:
+            for container_name in subscriber.cursors:
+                self._subscribers.setdefault(container_name, set()).add(subscriber)
+                if container_name not in self._tracks and tracks and tracks.get(container_name) is not None:
+                    self._tracks[container_name] = tracks[container_name]
+                if container_name in self._tracks:
+                    self._deliver(container_name, self._tracks[container_name], [subscriber], time.monotonic())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Ends a subscription, forgetting the tracks of containers nobody is watching any more."""
+        unwatched = []
+        with self._lock:
+            for container_name in subscriber.cursors:
+                subscribers = self._subscribers.get(container_name)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[container_name]
+                    self._tracks.pop(container_name, None)
+                    unwatched.append(container_name)
+        if self.on_unwatched is not None:
+            for container_name in unwatched:
+                self.on_unwatched(container_name)
+
+    def publish(self, container_name, track):
+        """Sends a container's new pings to each of its subscribers.
+
+        Args:
+            container_name (str): The container that was polled.
+            track (Track): The container's current track.
+        """
+        published_at = time.monotonic()
+        with self._lock:
+            if container_name not in self._subscribers:
+                return
+            self._tracks[container_name] = track
+            self._deliver(container_name, track, self._subscribers[container_name], published_at)
+
+    def _deliver(self, container_name, track, subscribers, published_at):
+        """Queues an event for each subscriber whose cursor is behind the track.
+
+        Called with the hub's lock held, so a subscriber's cursor is never advanced twice at once.
+        """
+        events = {}    # Cursors paired with the event built for them.
+        for subscriber in subscribers:
+            start = subscriber.cursors.get(container_name, 0)
+            if start == len(track):
+                continue
+            if start not in events:
+                events[start] = {container_name: make_delta(track, start)}
+            try:
+                subscriber.queue.put_nowait((events[start], published_at))
+                subscriber.cursors[container_name] = len(track)
+                self._stats["events_published"] += 1
+            except queue.Full:
+                # The cursor is not advanced, so the pings are sent with the next event instead.
+                self._stats["events_held_back"] += 1
+
+    def record_delivery(self, published_at):
+        """Records the time between an event being published and a subscriber receiving it."""
+        latency = time.monotonic() - published_at
+        with self._lock:
+            self._stats["events_delivered"] += 1
+            self._fanout["count"] += 1
+            self._fanout["total"] += latency
+            self._fanout["max"] = max(self._fanout["max"], latency)
+            self._fanout["last"] = latency
+
+    def subscribed_containers(self):
+        """Returns the names of the containers with at least one subscriber."""
+        with self._lock:
+            return set(self._subscribers)
+
+    def subscriber_count(self, container_name=None):
+        """Returns the number of subscribers to a container, or of distinct subscribers overall."""
+        with self._lock:
+            if container_name is not None:
+                return len(self._subscribers.get(container_name, ()))
+            return len(set().union(*self._subscribers.values()))
+
+    def stats(self):
+        """Returns the hub's subscriber counts, event counters, and fan-out latency."""
+        with self._lock:
+            count = self._fanout["count"]
+            return dict(
+                self._stats,
+                subscribers=len(set().union(*self._subscribers.values())),
+                subscribers_by_container={name: len(subscribers) for name, subscribers in self._subscribers.items()},
+                tracks_held=len(self._tracks),
+                fanout_latency_ms={
+                    "last": self._fanout["last"] * 1000,
+                    "mean": self._fanout["total"] / count * 1000 if count else 0.0,
+                    "max": self._fanout["max"] * 1000,
+                },
+            )
@@ -0,0 +1,63 @@
+"""This module keeps each browser session's rendered maps in memory, so that sessions never share map files."""
+
+import hashlib
+import time
+from cache import LRUCache
+
+# The maps a session can have: the live search map, its filtered version, and the historical map.
+MAP_KINDS = ("live", "filtered", "historical")
+
+
+class MapStore:
+    """A bounded, in-memory store of rendered map HTML, keyed by session and map kind.
+
+    Entries are evicted when they are older than the time-to-live, or when the store is full
+    (least recently used first). Each map is stored with an ETag, so unchanged maps can be
+    revalidated by the browser without being sent again.
+    """
+
+    def __init__(self, max_bytes, ttl_seconds):
+        """Creates an empty store.
+
+        Args:
+            max_bytes (int): The maximum total size of the stored HTML.
+            ttl_seconds (float): How long a map is kept after it is stored.
+        """
+        self._cache = LRUCache(max_bytes)
+        self.ttl_seconds = ttl_seconds
+
+    def put(self, map_id, kind, html):
+        """Stores a session's map, replacing its previous version.
+
+        Args:
+            map_id (str): The session's map ID.
+            kind (str): One of MAP_KINDS.
+            html (str): The rendered map.
+
+        Returns:
+            str: The map's ETag.
+        """
+        data = html.encode("utf-8")
+        etag = hashlib.sha1(data).hexdigest()
+        self._cache.put((map_id, kind), (data, etag, time.monotonic()), len(data))
+        return etag
+
+    def get(self, map_id, kind):
+        """Returns a session's map as (HTML bytes, ETag), or None if it is missing or has expired."""
+        entry = self._cache.get((map_id, kind))
+        if entry is None:
+            return None
+        data, etag, stored_at = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            self._cache.pop((map_id, kind))
+            return None
+        return data, etag
+
+    def discard(self, map_id, kind=None):
+        """Removes one of a session's maps, or all of them if no kind is given."""
+        for map_kind in ([kind] if kind else MAP_KINDS):
+            self._cache.pop((map_id, map_kind))
+
+    def stats(self):
+        """Returns the store's counters and current usage (see LRUCache.stats())."""
+        return dict(self._cache.stats(), ttl_seconds=self.ttl_seconds)
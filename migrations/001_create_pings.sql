@@ -0,0 +1,25 @@
+-- Creates the append-only pings table, which holds each search's GPS pings one row per ping.
+-- Live fetches only insert the pings a base station has uploaded since the previous fetch, instead
+-- of rewriting search_history.gps_JSON. Run once in the Azure SQL query editor, then run
+-- migrations/backfill_pings.py to copy the pings of existing searches.
+
+IF OBJECT_ID('pings', 'U') IS NULL
+BEGIN
+    CREATE TABLE pings (
+        session_id VARCHAR(100) NOT NULL,
+        base_station VARCHAR(100) NOT NULL,
+        seq INT NOT NULL,                   -- The ping's position in the base station's upload, from 0.
+        point_key VARCHAR(50) NOT NULL,     -- The ping's key in the uploaded data, e.g. 'point12'.
+        name NVARCHAR(100) NULL,            -- The tracker's ID.
+        time_text VARCHAR(40) NULL,         -- The ping's time exactly as uploaded.
+        ping_time DATETIME2(0) NULL,        -- The same time, for range queries. NULL if it could not be parsed.
+        lat FLOAT NULL,
+        lon FLOAT NULL,
+        telemetry NVARCHAR(MAX) NULL,       -- The telemetry readings, as JSON.
+        longname NVARCHAR(100) NULL,        -- The base station's name.
+        CONSTRAINT pk_pings PRIMARY KEY CLUSTERED (session_id, base_station, seq)
+    );
+
+    -- Supports finding a search's pings within a time range.
+    CREATE INDEX ix_pings_time ON pings (session_id, base_station, ping_time) INCLUDE (seq);
+END;
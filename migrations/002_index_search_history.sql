@@ -0,0 +1,12 @@
+-- Indexes search_history for the paginated historical search list, which reads completed searches
+-- newest first, one page at a time, without touching the gps_JSON or gpx_data columns. Run once in
+-- the Azure SQL query editor.
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'ix_search_history_listing' AND object_id = OBJECT_ID('search_history'))
+BEGIN
+    -- Each page is one seek from the previous page's last (search_date, session_id, base_station).
+    CREATE INDEX ix_search_history_listing
+        ON search_history (search_date DESC, session_id DESC, base_station DESC)
+        INCLUDE (start_time, end_time)
+        WHERE search_date IS NOT NULL;
+END;
@@ -0,0 +1,72 @@
+"""
+Copies the pings of searches stored before the pings table existed out of search_history.gps_JSON.
+
+Run once after 001_create_pings.sql, from the root directory of the repository:
+    python migrations/backfill_pings.py [--page-size 50] [--dry-run]
+
+Searches are read in pages ordered by (session_id, base_station), each committed on its own, so
+the backfill can be stopped and run again: searches that already have pings are skipped.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))    # Allows importing from the root directory.
+import historical_database
+import point_parser
+
+
+def next_page(cursor, after, page_size):
+    """Returns the next page of searches with GPS data but no pings, after a (session_id, base_station) key."""
+    query = f"""
+        SELECT TOP ({int(page_size)}) sh.session_id, sh.base_station
+        FROM search_history sh
+        WHERE sh.gps_JSON IS NOT NULL
+          AND (sh.session_id > ? OR (sh.session_id = ? AND sh.base_station > ?))
+          AND NOT EXISTS (SELECT 1 FROM pings p WHERE p.session_id = sh.session_id AND p.base_station = sh.base_station)
+        ORDER BY sh.session_id, sh.base_station
+    """
+    cursor.execute(query, (after[0], after[0], after[1]))
+    return [(row.session_id, row.base_station) for row in cursor.fetchall()]
+
+
+def backfill(page_size, dry_run):
+    """Backfills every search, returning the number of searches and pings copied."""
+    after = ("", "")
+    searches = pings = 0
+    while True:
+        with historical_database.pool.connection() as conn:
+            page = next_page(conn.cursor(), after, page_size)
+        if not page:
+            return searches, pings
+
+        for session_id, base_station in page:
+            try:
+                with historical_database.pool.connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute("SELECT gps_JSON FROM search_history WHERE session_id = ? AND base_station = ?",
+                                   (session_id, base_station))
+                    points = point_parser.parse_points(cursor.fetchone().gps_JSON)
+                    if not dry_run:
+                        historical_database.insert_pings(conn, session_id, base_station, points)
+                searches += 1
+                pings += len(points)
+                print(f"{'Would copy' if dry_run else 'Copied'} {len(points)} pings of {session_id} / {base_station}.")
+            except Exception as e:
+                print(f"Error backfilling {session_id} / {base_station}: {e}")
+        after = page[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-size", type=int, default=50, help="Searches read per query.")
+    parser.add_argument("--dry-run", action="store_true", help="Parse every search without writing any pings.")
+    args = parser.parse_args()
+
+    searches, pings = backfill(args.page_size, args.dry_run)
+    print(f"\n{'Would copy' if args.dry_run else 'Copied'} {pings} pings from {searches} searches.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""This module parses the GPS point data uploaded by base stations.
+
+Base stations have uploaded their points in four formats:
+    - Legacy: the Python representation of a list of dicts, e.g. [{'point0': {'lat': -31.9, ...}}].
+    - JSON: the same list serialised as real JSON, e.g. [{"point0": {"lat": -31.9, ...}}].
+    - Line-delimited JSON: one {"pointN": {...}} object per line, appended to as points arrive.
+    - Compact: one JSON array of values per line, without key names (see COMPACT_CONTENT_TYPE).
+
+Line-delimited blobs name their format in their Content-Type, which is used when it is known.
+Otherwise the format is recognised from the data itself. JSON is handed directly to the json
+module, and the legacy format is translated to JSON first, rewriting only its string literals, so
+names containing apostrophes (which Python writes in double quotes) are preserved. Parsing takes
+about as long as the previous decode, replace and json.loads path, as json.loads dominates it.
+"""
+
+import ast
+import json
+import operator
+import re
+import time
+from typing import NamedTuple
+
+# Content-Types of line-delimited blobs, as set by base stations (see Base-Station/uploader.py).
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+# Each line is [N, name, time, lat, lon, [battery, altitude, PDOP, SNR], longname] for point N, with
+# the time in seconds since the epoch and coordinates in units of 1e-7 degrees. A value stored as
+# uploaded instead (e.g. a key that is not "pointN", a float coordinate or telemetry as a dict) is
+# used as it is.
+COMPACT_CONTENT_TYPE = "application/x-ses-points-v1"
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+TELEMETRY_KEYS = ("battery", "altitude", "PDOP", "SNR")
+COORDINATE_SCALE = 10 ** 7
+
+
+class Point(NamedTuple):
+    """A single GPS ping, stored as a compact tuple rather than a nested dict."""
+    key: str            # The ping's identifier within its blob, e.g. "point3".
+    name: str           # The tracker's ID.
+    time: str           # ISO 8601 time of the ping, e.g. "2024-09-16T09:16:49".
+    lat: float
+    lon: float
+    telemetry: dict     # Battery, altitude, PDOP and SNR readings, as uploaded.
+    longname: str       # The base station's name.
+
+
+# Matches a legacy single-quoted string, a double-quoted string, or a Python keyword literal.
+LEGACY_TOKEN_PATTERN = re.compile(rb"""'((?:[^'\\]|\\.)*)'|"(?:[^"\\]|\\.)*"|\b(True|False|None)\b""", re.DOTALL)
+LEGACY_KEYWORDS = {b"True": b"true", b"False": b"false", b"None": b"null"}
+LEGACY_QUOTES = bytes.maketrans(b"'", b'"')
+
+# Reads every field of an uploaded point, in the order of Point's fields after its key.
+POINT_FIELDS = operator.itemgetter("name", "time", "lat", "long", "telemetry", "longname")
+
+
+def translate_legacy_token(match):
+    """Rewrites one token matched by LEGACY_TOKEN_PATTERN as its JSON equivalent."""
+    single_quoted = match.group(1)
+    if single_quoted is not None:
+        if b'"' in single_quoted or b"\\'" in single_quoted:
+            single_quoted = single_quoted.replace(b"\\'", b"'").replace(b'"', b'\\"')
+        return b'"' + single_quoted + b'"'
+    keyword = match.group(2)
+    if keyword is not None:
+        return LEGACY_KEYWORDS[keyword]
+    return match.group(0)    # Double-quoted strings are already valid JSON.
+
+
+def as_bytes(data):
+    """Returns blob data as a bytes-like object that the json and re modules accept."""
+    if isinstance(data, str):
+        return data.encode("utf-8")
+    if isinstance(data, memoryview):
+        if isinstance(data.obj, (bytes, bytearray)) and data.nbytes == len(data.obj):
+            return data.obj    # The view covers the whole buffer, so no copy is needed.
+        return data.tobytes()
+    return data
+
+
+def is_legacy(data):
+    """Checks whether point data is in the legacy format, from the first quote character in it."""
+    head = data[:256]
+    single_quote, double_quote = head.find(b"'"), head.find(b'"')
+    return single_quote != -1 and (double_quote == -1 or single_quote < double_quote)
+
+
+def is_ndjson(data, content_type=None):
+    """Checks whether point data is line-delimited JSON, which starts with an object rather than a list."""
+    if content_type in (NDJSON_CONTENT_TYPE, COMPACT_CONTENT_TYPE):
+        return content_type == NDJSON_CONTENT_TYPE
+    return data[:64].lstrip()[:1] == b"{"
+
+
+def is_compact(data, content_type=None):
+    """Checks whether point data is in the compact format, whose lines start with a point number rather than an object."""
+    if content_type in (NDJSON_CONTENT_TYPE, COMPACT_CONTENT_TYPE):
+        return content_type == COMPACT_CONTENT_TYPE
+    head = data[:64].lstrip()
+    return head[:1] == b"[" and (head[1:2].isdigit() or head[1:2] == b'"')
+
+
+def is_line_delimited(data, content_type=None):
+    """Checks whether point data is appended to one line at a time (line-delimited JSON or compact)."""
+    return is_ndjson(data, content_type) or is_compact(data, content_type)
+
+
+def ndjson_to_json(data):
+    """Joins line-delimited point data into a JSON list, skipping blank lines."""
+    return b"[" + b",".join(line for line in bytes(data).splitlines() if line.strip()) + b"]"
+
+
+def compact_to_records(data):
+    """Parses compact point data into Point records.
+
+    Raises:
+        ValueError: If the data is not valid compact point data.
+    """
+    try:
+        return [compact_to_record(row) for row in json.loads(ndjson_to_json(data))]
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid point data: {e}") from None
+
+
+def compact_to_record(row):
+    """Converts one row of compact point data to a Point record."""
+    key, name, ping_time, lat, lon, telemetry, longname = row
+    return Point(
+        f"point{key}" if isinstance(key, int) else key,
+        name,
+        time.strftime(TIME_FORMAT, time.gmtime(ping_time)) if isinstance(ping_time, int) else ping_time,
+        lat / COORDINATE_SCALE if isinstance(lat, int) else lat,
+        lon / COORDINATE_SCALE if isinstance(lon, int) else lon,
+        dict(zip(TELEMETRY_KEYS, telemetry)) if isinstance(telemetry, list) else telemetry,
+        longname,
+    )
+
+
+def legacy_to_json(data):
+    """Translates legacy (Python representation) point data to JSON.
+
+    Python only writes a string in double quotes when it contains an apostrophe, so data without
+    any double quote can be translated by swapping every quote in one pass over the bytes, which
+    makes the one copy of the data that json.loads needs. Otherwise each string literal is
+    rewritten individually.
+
+    Args:
+        data (bytes): The legacy point data.
+
+    Returns:
+        bytes: The equivalent JSON.
+    """
+    if b'"' not in data and b"True" not in data and b"False" not in data and b"None" not in data:
+        return data.translate(LEGACY_QUOTES)
+    return LEGACY_TOKEN_PATTERN.sub(translate_legacy_token, data)
+
+
+def loads(data, content_type=None):
+    """Parses point data in any format into a list of {"pointN": {...}} dicts.
+
+    Args:
+        data (bytes, bytearray, memoryview or str): The blob data.
+        content_type (str, optional): The blob's Content-Type, naming its format if it is line-delimited.
+
+    Returns:
+        list: The parsed points, in the shape of the JSON format.
+
+    Raises:
+        ValueError: If the data is not valid point data in any format.
+    """
+    data = as_bytes(data)
+    if is_compact(data, content_type):
+        return [
+            {record.key: {"name": record.name, "time": record.time, "lat": record.lat, "long": record.lon,
+                          "telemetry": record.telemetry, "longname": record.longname}}
+            for record in compact_to_records(data)
+        ]
+    if is_ndjson(data, content_type):
+        try:
+            return json.loads(ndjson_to_json(data))
+        except ValueError as e:
+            raise ValueError(f"Invalid point data: {e}") from None
+    if not is_legacy(data):
+        try:
+            return json.loads(data)
+        except ValueError:
+            pass
+
+    try:
+        return json.loads(legacy_to_json(data))
+    except ValueError:
+        # Escapes the translation does not handle (e.g. '\x00') are left to Python's own parser.
+        try:
+            return ast.literal_eval(bytes(data).decode("utf-8"))
+        except (SyntaxError, ValueError) as e:
+            raise ValueError(f"Invalid point data: {e}") from None
+
+
+def to_json_string(data):
+    """Converts point data in either format to a JSON string, e.g. for database storage.
+
+    Args:
+        data (bytes, bytearray, memoryview or str): The blob data.
+
+    Returns:
+        str: The point data as JSON.
+
+    Raises:
+        ValueError: If the data is not valid point data in either format.
+    """
+    data = as_bytes(data)
+    if is_compact(data):
+        return json.dumps(loads(data))
+    if is_ndjson(data):
+        candidate = ndjson_to_json(data)
+    else:
+        candidate = legacy_to_json(data) if is_legacy(data) else data
+    try:
+        text = bytes(candidate).decode("utf-8")
+        json.loads(text)
+        return text
+    except ValueError:
+        return json.dumps(loads(data))
+
+
+def to_records(points):
+    """Converts parsed {"pointN": {...}} dicts to Point records.
+
+    Args:
+        points (list): Points in the shape they were uploaded.
+
+    Returns:
+        list: A list of Point records.
+    """
+    try:
+        # Base stations upload every field of every point, so each is read with a single lookup.
+        return [Point._make((key,) + POINT_FIELDS(point_data)) for point in points for key, point_data in point.items()]
+    except KeyError:
+        pass
+
+    records = []
+    for point in points:
+        for key, point_data in point.items():
+            records.append(Point(
+                key,
+                point_data.get('name', 'Unnamed Point'),
+                point_data.get('time', '00:00:00T00:00:00'),
+                point_data.get('lat', 0.0),
+                point_data.get('long', 0.0),
+                point_data.get('telemetry', {}),
+                point_data.get('longname'),
+            ))
+    return records
+
+
+def parse_points(data, content_type=None):
+    """Parses point data into Point records.
+
+    Args:
+        data: Blob data in any format (bytes, bytearray, memoryview or str), a list of
+            already-parsed {"pointN": {...}} dicts, or a list of Point records.
+        content_type (str, optional): The blob's Content-Type, naming its format if it is line-delimited.
+
+    Returns:
+        list: A list of Point records.
+
+    Raises:
+        ValueError: If the data is not valid point data.
+    """
+    if isinstance(data, list):
+        if data and isinstance(data[0], Point):
+            return data
+        return to_records(data)
+    data = as_bytes(data)
+    if is_compact(data, content_type):
+        return compact_to_records(data)
+    return to_records(loads(data, content_type))
+
+
+def parse_points_from(data, start, content_type=None):
+    """Parses the points after the first 'start' of some point data into Point records.
+
+    Only the lines after the first 'start' of line-delimited data are parsed, so the points
+    appended to a blob since it was last read are read without parsing it again from the
+    beginning. Other formats are parsed in full.
+
+    Args:
+        data: Point data in any format accepted by parse_points().
+        start (int): The number of points to skip.
+        content_type (str, optional): The blob's Content-Type, naming its format if it is line-delimited.
+
+    Returns:
+        tuple: The Point records after the first 'start', and the number of points in the data.
+            Empty data (e.g. a blob nothing has been appended to yet) has no points.
+
+    Raises:
+        ValueError: If the parsed part of the data is not valid point data.
+    """
+    if not isinstance(data, list):
+        data = as_bytes(data)
+        if not data.strip():
+            return [], 0
+        if is_line_delimited(data, content_type):
+            lines = [line for line in bytes(data).splitlines() if line.strip()]
+            if start >= len(lines):
+                return [], len(lines)
+            return parse_points(b"\n".join(lines[start:]), content_type), len(lines)
+    points = parse_points(data, content_type)
+    return points[start:], len(points)
@@ -1,21 +1,56 @@
 """This module contains functions for retrieving data from the Azure storage containers."""
 
 import traceback
-import json
+import functools
+import math
+import zlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import folium
+from folium.plugins import FastMarkerCluster
+import requests
+from azure.core import MatchConditions
+from azure.core.exceptions import HttpResponseError, ResourceNotFoundError, ResourceNotModifiedError
+from azure.core.pipeline.transport import RequestsTransport
 from azure.storage.blob import BlobServiceClient
 from config import Config
+from cache import LRUCache
+import point_parser
+from track import Track, from_epoch
+from simplify import fit_zoom, simplify_track, tolerance_for_zoom
 
-all_coordinates = []    # Global list to store all coordinates.
+# Process-wide cache of downloaded blobs, keyed by (container name, blob name).
+# Each entry holds the blob's ETag, last-modified time, raw content, and parsed Track.
+blob_cache = LRUCache(Config.BLOB_CACHE_MAX_BYTES)
+
+# Process-wide cache of rendered live maps, keyed by the selected containers, their blob versions
+# (ETags) and the render settings. Each entry holds the map's HTML, telemetry and MapBuildContext.
+render_cache = LRUCache(Config.RENDER_CACHE_MAX_BYTES)
+
+# Counters for live map renders (cache misses).
+render_stats = {"renders": 0, "render_seconds": 0.0}
+render_stats_lock = threading.Lock()
+
+# Bytes re-read from before the end of a cached blob, to check it has only been appended to.
+TAIL_OVERLAP_BYTES = 64
+
+# Counters for incremental (tail) reads of cached blobs.
+tail_read_stats = {"tail_reads": 0, "full_reloads": 0, "bytes_saved": 0}
+tail_read_stats_lock = threading.Lock()
 
 default_coord_avg = Config.MAP_DEFAULT_COORDS[0], Config.MAP_DEFAULT_COORDS[1]    # Changes the default map centring location.
 
 
-def assign_colour(initial_coord):
+def assign_colour(initial_coord, tracker_id=None):
     """Assigns a colour in hex format based on the last three digits of the fractional part
     of the given coordinate.
 
-    Arg: initial_coord(str): The latitude value of a base station's first ping.
+    Args:
+        initial_coord (str): The coordinate of a trail's first ping.
+        tracker_id (str, optional): The ID of the trail's tracker. Trackers that start from the same
+            place (e.g. a team leaving one vehicle) are given different colours by mixing it in.
+
     Returns: string (str): The associated hex colour.
     """
     # Gets the last three digits of the coordinate.
@@ -28,6 +63,11 @@ def assign_colour(initial_coord):
         int((value - min_value) / (max_value - min_value) * 255)
         for value in last_three_digits
     ]
+
+    # Mixes in a stable hash of the tracker ID (Python's hash() differs between processes).
+    if tracker_id is not None:
+        tracker_hash = zlib.crc32(tracker_id.encode("utf-8")).to_bytes(4, "big")
+        normalised_values = [value ^ byte for value, byte in zip(normalised_values, tracker_hash)]
     
     # Converts to hexadecimal format and return as hex colour code.
     hex_colour = '#{:02x}{:02x}{:02x}'.format(*normalised_values)
@@ -35,174 +75,726 @@ def assign_colour(initial_coord):
     return hex_colour
 
 
+def assign_trail_colour(track, tracker_id):
+    """Assigns the colour of one tracker's trail, from its first ping (see assign_colour()).
+
+    Args:
+        track (Track): The base station's track.
+        tracker_id (str): The ID of one of the track's trackers.
+
+    Returns:
+        str: The trail's hex colour, as drawn on the map and sent with new pings (see make_delta()).
+    """
+    initial_coord = track.lon[track.first_ping(tracker_id)]
+    return assign_colour(initial_coord, tracker_id if len(track.trackers) > 1 else None)
+
+
+def parse_blob_content(content, content_type=None):
+    """Decodes a blob's raw content into a Track of its GPS points.
+
+    Args:
+        content (bytes): The blob's data, as uploaded by a base station.
+        content_type (str, optional): The blob's Content-Type, which names the format of
+            line-delimited blobs (see point_parser).
+
+    Returns:
+        Track: The blob's points, or None if the content could not be decoded.
+    """
+    try:
+        return Track.from_points(content, content_type)
+
+    except Exception as e:
+        print(f"Error decoding JSON data: {e}")
+        return None
+
+
 def convert_to_geojson(data):
     """Converts raw data taken from the Azure containers into GeoJSON data.
     
     Args:
-        data (dict): A base station's full data.
+        data (Track, bytes or list): A base station's full data.
 
     Returns:
         features (list): A list of GeoJSON features to add to the map.
-        coordinates (list): A list of coordinate tuples for drawing a PolyLine.
+        coordinates (dict): Tracker IDs paired with a list of coordinate tuples, for drawing each
+            tracker's trail as its own PolyLine.
         telemetry_list (list): A list of telemetry data points to be sent to the frontend.
     """
     # Decodes the data from UTF-8 to JSON if necessary.
-    if isinstance(data, bytes):
-        try:
-            decoded_data = data.decode('utf-8').replace("'", '"')
-            points = json.loads(decoded_data)
-            
-        except Exception as e:
-            print(f"Error decoding JSON data: {e}")
-            return None, [], []
-    else:
-        points = data
-
-    features = []
-    coordinates = []
-    telemetry_list = []
-
-    for point in points:
-        for _, point_data in point.items():
-            lat = point_data.get('lat', 0.0)
-            lon = point_data.get('long', 0.0)
-            name = point_data.get('name', 'Unnamed Point')
-            time = point_data.get('time', '00:00:00T00:00:00')
-            telemetry = point_data.get('telemetry', {})
-            longname = point_data.get('longname')
-            coordinates.append([lat, lon])
-
-            # From each point, creates a GeoJSON `feature` (these will display points as icons on the Folium map).
-            features.append({
-                "type": "Feature",
-                "geometry": {
-                    "type": "Point",
-                    "coordinates": [lon, lat],
-                },
-                "properties": {
-                    "time": time,
-                    "name": name,
-                    "tooltip": f"Name: {longname}\nID: {name}\nTime: {time}\nCoords: {[lon, lat]}\nBattery: {telemetry.get('battery', 'N/A')}%",
-                    "telemetry": telemetry,
-                },
-            })
-            telemetry_list.append({
-                "name": name,
-                "time": time,
-                "telemetry": telemetry,
-                "lon": lon,
-                "lat": lat,
-                "longname": longname
-            })
+    track = as_track(data)
+    if track is None:
+        return None, {}, []
+
+    # Every output is serialised from the track's arrays.
+    features = track.to_features()
+    coordinates = {tracker_id: trail.coordinates() for tracker_id, trail in track.by_tracker().items()}
+    telemetry_list = track.to_telemetry()
 
     return features, coordinates, telemetry_list 
 
-def center_and_zoom(m):
-    # Calculates average lat and lon in order to centre the map.
-    if len(all_coordinates) != 0:
-        avg_lat = sum(lat for lat, _ in all_coordinates) / len(all_coordinates)
-        avg_long = sum(long for _, long in all_coordinates) / len(all_coordinates)
-    else:
-        avg_lat, avg_long = default_coord_avg    # (See global variable)
+class MapBuildContext:
+    """Accumulates the bounds and centre of everything drawn on one map, for a single request.
+
+    Each map being built gets its own context, so maps built at the same time (e.g. by concurrent
+    requests) never see each other's coordinates. Only running totals are kept, not the coordinates.
+    """
+
+    def __init__(self):
+        self.point_counts = {}      # Containers drawn on the map, paired with how many points they had.
+        self.raw_vertices = 0       # Vertices in the trails before simplification.
+        self.drawn_vertices = 0     # Vertices in the trails as drawn.
+        self.count = 0
+        self.lat_sum = 0.0
+        self.lon_sum = 0.0
+        self.min_lat = self.min_lon = math.inf
+        self.max_lat = self.max_lon = -math.inf
+
+    def add_track(self, track):
+        """Adds every point of a Track to the running totals."""
+        if not len(track):
+            return
+        self.count += len(track)
+        self.lat_sum += math.fsum(track.lat)
+        self.lon_sum += math.fsum(track.lon)
+        (min_lat, min_lon), (max_lat, max_lon) = track.bounds()
+        self.min_lat, self.min_lon = min(self.min_lat, min_lat), min(self.min_lon, min_lon)
+        self.max_lat, self.max_lon = max(self.max_lat, max_lat), max(self.max_lon, max_lon)
+
+    def add_trail(self, raw_vertices, drawn_vertices):
+        """Records how many of a trail's vertices were drawn after simplification."""
+        self.raw_vertices += raw_vertices
+        self.drawn_vertices += drawn_vertices
+
+    def reduction_ratio(self):
+        """Returns the fraction of trail vertices removed by simplification (0 when none were)."""
+        if self.raw_vertices == 0:
+            return 0.0
+        return round(1 - self.drawn_vertices / self.raw_vertices, 3)
+
+    def centre(self):
+        """Returns the average coordinate of all points added, or the default map centre if there are none."""
+        if self.count == 0:
+            return default_coord_avg    # (See global variable)
+        return self.lat_sum / self.count, self.lon_sum / self.count
+
+    def bounds(self):
+        """Returns the south-west and north-east corners of all points added, or None if there are none."""
+        if self.count == 0:
+            return None
+        return [(self.min_lat, self.min_lon), (self.max_lat, self.max_lon)]
+
+
+def center_and_zoom(m, context):
+    """Centres a map on the average of its coordinates, and zooms it to fit them all.
+
+    Args:
+        m (folium.Map): The map to centre.
+        context (MapBuildContext): The context the map's data was drawn with.
+
+    Returns:
+        folium.Map: The centred map.
+    """
+    avg_lat, avg_long = context.centre()
     m.location = [avg_lat, avg_long]
-    m.fit_bounds([(lat, long) for lat, long in all_coordinates])    # Adjusts the map zoom to fit all coordinates.
+    bounds = context.bounds()
+    if bounds is not None:
+        m.fit_bounds(bounds)    # Adjusts the map zoom to fit all coordinates.
     return m
 
-def process_data_to_map(data, map, telemetry_data=[] ):
-    """For a given dataset, draws its GPS points and connecting lines on a Folium map.
+
+def as_track(data):
+    """Returns a base station's data as a Track, parsing it if necessary (see convert_to_geojson())."""
+    if isinstance(data, Track):
+        return data
+    if isinstance(data, (bytes, bytearray, memoryview, str)):
+        return parse_blob_content(data)
+    return Track.from_points(data)
+
+
+# Builds each clustered marker and its popup in the browser, from a [lat, lon, name, ID, time, battery] row.
+CLUSTER_MARKER_CALLBACK = """function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {
+        icon: L.AwesomeMarkers.icon({icon: 'info-sign', markerColor: 'blue', prefix: 'glyphicon'})
+    });
+    marker.bindPopup('Name: ' + row[2] + '<br>ID: ' + row[3] + '<br>Time: ' + row[4]
+        + '<br>Coords: [' + row[1] + ', ' + row[0] + ']<br>Battery: ' + row[5] + '%');
+    return marker;
+}"""
+
+
+def popup_rows(track):
+    """Returns the values shown in each ping's popup, as [lat, lon, name, ID, time, battery] rows."""
+    return [
+        [track.lat[i], track.lon[i], track.longname, track.tracker_at(i), from_epoch(track.time[i]),
+         track.telemetry_at(i).get("battery", "N/A")]
+        for i in range(len(track))
+    ]
+
+
+def draw_points(map, track):
+    """Draws a track's pings on a Folium map, in the rendering mode set by Config.MAP_RENDER_MODE.
+
+    Modes:
+        - "markers": A separate folium.Marker, icon and popup for every ping.
+        - "geojson": One GeoJSON FeatureCollection layer per track. Popups are built in the browser
+            from each feature's properties.
+        - "cluster": One FastMarkerCluster per track. Markers and popups are built in the browser.
 
     Args:
-        data (dict): A base stations GPS data.
-        map (_type_): The folium map that is being used.
-        telemetry_data (list, optional): _description_. The telemetry data of the base station.
+        map (folium.Map): The folium map that is being used.
+        track (Track): The pings to draw.
     """
-    features, coordinates, extracted_telemetry = convert_to_geojson(data)
-    initial_coord = 0
+    mode = Config.MAP_RENDER_MODE
 
-    # Draws points on the Folium map.
-    for feature in features:
-        point_location = feature["geometry"]["coordinates"][::-1]  # Reverses [long, lat] to [lat, long].
-        folium.Marker(
-            location=point_location,
-            popup=feature["properties"]["tooltip"],
-            icon=folium.Icon(color="blue", icon="info-sign")
-        ).add_to(map)
+    if mode == "markers":
+        for feature in track.to_features():
+            point_location = feature["geometry"]["coordinates"][::-1]  # Reverses [long, lat] to [lat, long].
+            folium.Marker(
+                location=point_location,
+                popup=feature["properties"]["tooltip"],
+                icon=folium.Icon(color="blue", icon="info-sign")
+            ).add_to(map)
 
-    initial_coord = features[0]["geometry"]["coordinates"][0]
-    trail_colour = assign_colour(initial_coord)     # Assigns the custom hex colour.
+    elif mode == "cluster":
+        FastMarkerCluster(data=popup_rows(track), callback=CLUSTER_MARKER_CALLBACK).add_to(map)
 
-    # Draws lines that connect coordinates on the Folium map.
-    if coordinates:
-        folium.PolyLine(
-            locations=coordinates,
-            color=trail_colour,
-            weight=5,
-            opacity=0.7  
+    else:
+        fields = ["Name", "ID", "Time", "Coords", "Battery"]
+        feature_collection = {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "geometry": {"type": "Point", "coordinates": [lon, lat]},
+                    "properties": dict(zip(fields, (name, tracker_id, time, f"[{lon}, {lat}]", f"{battery}%"))),
+                }
+                for lat, lon, name, tracker_id, time, battery in popup_rows(track)
+            ],
+        }
+        folium.GeoJson(
+            feature_collection,
+            marker=folium.Marker(icon=folium.Icon(color="blue", icon="info-sign")),
+            popup=folium.GeoJsonPopup(fields=fields),
         ).add_to(map)
-        all_coordinates.extend(coordinates)
 
-    telemetry_data.extend(extracted_telemetry)
-    
 
-def historical_data_to_map(m, gps_points, map_save_path):
-    """Displays historical data on the historical Folium map, then saves the map.
+def trail_coordinates(track):
+    """Returns the coordinates of a track's trail, simplified for a single zoom level.
+
+    The tolerance is the distance covered by Config.SIMPLIFY_TOLERANCE_PIXELS screen pixels, at
+    Config.SIMPLIFY_ZOOM_HEADROOM zoom levels closer than the zoom that fits the whole track. The
+    same line is drawn at every zoom level.
+
+    Args:
+        track (Track): The track to draw.
+
+    Returns:
+        list: The [lat, lon] pairs to draw as a PolyLine.
+    """
+    if not Config.SIMPLIFY_TRAILS or len(track) < 3:
+        return track.coordinates()
+    zoom = fit_zoom(track.bounds(), Config.MAP_VIEWPORT_PIXELS) + Config.SIMPLIFY_ZOOM_HEADROOM
+    tolerance = tolerance_for_zoom(min(zoom, Config.MAP_MAX_ZOOM), track.centroid()[0], Config.SIMPLIFY_TOLERANCE_PIXELS)
+    return simplify_track(track, tolerance)
+
+
+def process_data_to_map(data, map, telemetry_data=None, context=None):
+    """For a given dataset, draws its GPS points and connecting lines on a Folium map.
+
+    Args:
+        data (Track, bytes or list): A base stations GPS data.
+        map (folium.Map): The folium map that is being used.
+        telemetry_data (list, optional): A list that the base station's telemetry data is added to.
+        context (MapBuildContext, optional): The context of the map being built, updated with the data's bounds.
+
+    Returns:
+        MapBuildContext: The context of the map being built.
+    """
+    if context is None:
+        context = MapBuildContext()
+    track = as_track(data)
+
+    # Draws each tracker's points and trail separately, so that every tracker has its own trail.
+    trails = track.by_tracker()
+    for tracker_id, trail in trails.items():
+        coordinates = trail_coordinates(trail)
+
+        # Draws points on the Folium map.
+        draw_points(map, trail)
+
+        # Assigns the custom hex colour, distinct for each tracker of a base station with several.
+        trail_colour = assign_trail_colour(track, tracker_id)
+
+        # Draws lines that connect coordinates on the Folium map.
+        if coordinates:
+            folium.PolyLine(
+                locations=coordinates,
+                color=trail_colour,
+                weight=5,
+                opacity=0.7,
+                tooltip=f"{trail.longname} ({tracker_id}): trail drawn with {len(coordinates)} of {len(trail)} points"
+            ).add_to(map)
+            context.add_track(trail)
+            context.add_trail(len(trail), len(coordinates))
+
+    if telemetry_data is not None:
+        telemetry_data.extend(track.to_telemetry())
+    return context
+
+
+def historical_data_to_map(m, gps_points):
+    """Displays historical data on the historical Folium map, then renders the map.
 
     Args:
         m (folium.Map): The historical Folium map.
         gps_points: Historical GPS data.
-        map_save_path (str): Path to save the updated historical map.
+
+    Returns:
+        html (str): The rendered map.
+        context (MapBuildContext): The context the map was built with.
     """
-    process_data_to_map(gps_points, m, telemetry_data=[])
-    m = center_and_zoom(m)
-    m.save(map_save_path)
+    context = process_data_to_map(gps_points, m)
+    m = center_and_zoom(m, context)
+    return m.get_root().render(), context
     
     
-def retrieve_from_containers(m, STORAGE_CONNECTION_STRING, active_containers, map_save_path):
-    """Fetches Azure storage container data and adds it to the live map.
+@functools.lru_cache(maxsize=4)
+def get_blob_service_client(STORAGE_CONNECTION_STRING):
+    """Builds a Blob Storage client that is shared by every fetch using the same connection string.
+
+    The client's HTTP connection pool is sized to the fetch thread pool, so concurrent downloads
+    reuse open connections instead of performing a new TLS handshake each time.
 
     Args:
-        m (folium.Map): The folium map object to add the GeoJSON data to.
         STORAGE_CONNECTION_STRING (str): The connection string for the Azure storage account.
-        active_containers (list): A list of strings, of the names of the storage containers.
 
     Returns:
-        telemetry_data (list): A list of all selected blob's telemetry data, in dictionaries.
-        all_blob_content (list): A list of all selected blob's data, in dictionaries.
+        BlobServiceClient: A thread-safe client for the storage account.
     """
-    global all_coordinates
-    all_coordinates.clear()    # Clears 'all_coordinates' to ensure fresh updates.
+    http_session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=Config.FETCH_MAX_WORKERS)
+    http_session.mount("https://", adapter)
+    http_session.mount("http://", adapter)
+    transport = RequestsTransport(session=http_session, session_owner=False)
+    return BlobServiceClient.from_connection_string(STORAGE_CONNECTION_STRING, transport=transport)
 
-    blob_service_client = BlobServiceClient.from_connection_string(STORAGE_CONNECTION_STRING)
 
-    # For each container in the storage account, fetch its blobs data.
-    telemetry_data = []
-    all_blob_content = {}
-    for container_name in active_containers:
+def count_tail_read(counter, amount=1):
+    """Increments one of the counters in 'tail_read_stats'."""
+    with tail_read_stats_lock:
+        tail_read_stats[counter] += amount
+
+
+def blob_size(properties):
+    """Returns the size of a whole blob from the properties of a download of it.
+
+    The size of a ranged download is the size of the range. The blob's size is the total in its
+    content range, e.g. "bytes 936-1035/1036".
+    """
+    content_range = getattr(properties, "content_range", None)
+    if content_range and "/" in content_range:
+        total = content_range.rsplit("/", 1)[1]
+        if total.isdigit():
+            return int(total)
+    return properties.size
+
+
+def read_blob_tail(container_client, blob_name, cached):
+    """Downloads only the bytes appended to a blob since it was cached, and parses the new points into its track.
+
+    Base stations either append lines (of JSON, or in the compact format) to their blob, or re-upload it as one growing list,
+    in which case a new upload only replaces the closing bracket of the cached content with the new
+    points. A ranged download starting shortly before the end of the cached content is compared
+    against it, to confirm that the blob was appended to rather than rewritten. The download is
+    conditional on the cached ETag.
+
+    Args:
+        container_client (ContainerClient): The client for the blob's container.
+        blob_name (str): The name of the blob.
+        cached (dict): The blob's current cache entry.
+
+    Returns:
+        dict: The blob's new cache entry, or None if the blob was rewritten or shrank and must be
+            downloaded in full.
+
+    Raises:
+        ResourceNotModifiedError: If the blob has not changed since it was cached.
+    """
+    content = cached["content"]
+    offset = cached["offset"] - TAIL_OVERLAP_BYTES
+    if offset < 0:
+        return None
+
+    try:
+        downloader = container_client.download_blob(
+            blob_name, offset=offset, etag=cached["etag"], match_condition=MatchConditions.IfModified)
+    except ResourceNotModifiedError:
+        raise
+    except HttpResponseError as e:
+        if e.status_code == 416:    # The blob is now shorter than the requested offset.
+            return None
+        raise
+    tail = downloader.readall()
+
+    # The overlap must match the cached content, apart from the closing bracket that new points
+    # replace in a list. Lines are only ever appended to.
+    content_type = cached.get("content_type")
+    line_delimited = point_parser.is_line_delimited(content, content_type)
+    overlap = TAIL_OVERLAP_BYTES if line_delimited else TAIL_OVERLAP_BYTES - 1
+    if tail[:overlap] != content[offset:offset + overlap] or offset + len(tail) != blob_size(downloader.properties):
+        return None
+
+    appended = tail[overlap:]
+    if line_delimited:
+        if appended and not appended.endswith(b"\n"):
+            return None    # Appends always end with a line break, so the last line is incomplete.
+        try:
+            new_points = point_parser.parse_points(appended, content_type) if appended.strip() else []
+        except ValueError:
+            return None
+        new_content = content + appended
+    elif appended.strip() == b"]":
+        new_points = []
+        new_content = content[:-1] + appended
+    elif appended.startswith(b","):
+        try:
+            new_points = point_parser.parse_points(b"[" + appended[1:])
+        except ValueError:
+            return None
+        new_content = content[:-1] + appended
+    else:
+        return None
+
+    count_tail_read("tail_reads")
+    count_tail_read("bytes_saved", offset)
+    track = cached["track"].copy()    # Copied, as other requests may be reading the cached track.
+    track.extend(new_points)
+    return {
+        "etag": downloader.properties.etag,
+        "last_modified": downloader.properties.last_modified,
+        "content": new_content,
+        "content_type": content_type,
+        "track": track,
+        "offset": len(new_content),
+        "point_count": len(track),
+    }
+
+
+def download_cached_blob(container_client, container_name, blob_name):
+    """Downloads a blob, reusing as much of the copy held in 'blob_cache' as possible.
+
+    When the blob is cached, the download is made conditional on its ETag (If-None-Match), so an
+    unchanged blob costs a single empty 304 response and its already-parsed track is reused.
+    A blob that has grown is read from the cached byte offset onwards (see read_blob_tail()), and
+    a blob that was rewritten or shrank is downloaded again in full.
+
+    Args:
+        container_client (ContainerClient): The client for the blob's container.
+        container_name (str): The name of the blob's container.
+        blob_name (str): The name of the blob.
+
+    Returns:
+        dict: The blob's cache entry, containing its etag, last_modified, content, content_type,
+            track, and the byte offset and point count that have been parsed so far.
+
+    Raises:
+        ValueError: If the blob's content could not be decoded.
+    """
+    cache_key = (container_name, blob_name)
+    cached = blob_cache.get(cache_key, count=False)
+
+    if cached is not None:
         try:
-            container_client = blob_service_client.get_container_client(container_name)
-            if not container_client.exists():
-                print(f"Container '{container_name}' does not exist. Skipping...")
-                continue
+            entry = read_blob_tail(container_client, blob_name, cached)
+        except ResourceNotModifiedError:
+            blob_cache.record_hit()
+            return cached
+
+        if entry is not None:
+            blob_cache.record_hit()
+            blob_cache.put(cache_key, entry, len(entry["content"]) + entry["track"].nbytes)
+            return entry
+        count_tail_read("full_reloads")
+
+    blob_cache.record_miss()
+    downloader = container_client.download_blob(blob_name)
+    content = downloader.readall()
+    content_settings = getattr(downloader.properties, "content_settings", None)
+    content_type = getattr(content_settings, "content_type", None)
+    track = parse_blob_content(content, content_type)
+    if track is None:
+        raise ValueError(f"Blob '{blob_name}' does not contain valid GPS data.")
+
+    entry = {
+        "etag": downloader.properties.etag,
+        "last_modified": downloader.properties.last_modified,
+        "content": content,
+        "content_type": content_type,
+        "track": track,
+        "offset": len(content),
+        "point_count": len(track),
+    }
+    blob_cache.put(cache_key, entry, len(content) + track.nbytes)
+    return entry
+
+
+def fetch_container_blob(blob_service_client, container_name):
+    """Downloads the GPS data blob held in a single base station's container.
+
+    Base stations name their blob after their container, so the blob is requested directly in a
+    single round trip. The container is only listed when no blob with that name exists.
 
+    Args:
+        blob_service_client (BlobServiceClient): The client for the storage account.
+        container_name (str): The name of the base station's container.
+
+    Returns:
+        dict: The fetch result, containing:
+            - container (str): The container name.
+            - blob_name (str): The name of the downloaded blob, or None.
+            - content (bytes): The blob's data, or None.
+            - track (Track): The blob's parsed GPS points, or None.
+            - etag (str): The blob's ETag, or None.
+            - error (str): A description of why the fetch failed, or None.
+    """
+    result = {"container": container_name, "blob_name": None, "content": None, "track": None, "etag": None, "error": None}
+    container_client = blob_service_client.get_container_client(container_name)
+
+    try:
+        try:
+            entry = download_cached_blob(container_client, container_name, container_name)
+            blob_name = container_name
+        except ResourceNotFoundError:
+            # Either the container is missing, or its blob has a different name.
+            # Listing the container raises ResourceNotFoundError if it does not exist.
             blobs_list = list(container_client.list_blobs())
             if len(blobs_list) != 1:
-                print(f"Unexpected blob count in '{container_name}'. Expected 1, found {len(blobs_list)}.")
-                continue
-            
-            blob = blobs_list[0]
-            blob_content = container_client.download_blob(blob).readall()
-            all_blob_content[blob.name] = blob_content
-            process_data_to_map(blob_content, m, telemetry_data)
-            
+                result["error"] = f"Unexpected blob count in '{container_name}'. Expected 1, found {len(blobs_list)}."
+                return result
+            blob_name = blobs_list[0].name
+            entry = download_cached_blob(container_client, container_name, blob_name)
+
+        result.update(blob_name=blob_name, content=entry["content"], track=entry["track"], etag=entry["etag"])
+
+    except ResourceNotFoundError:
+        result["error"] = f"Container '{container_name}' does not exist."
+    except Exception as e:
+        result["error"] = f"Error fetching container '{container_name}': {e}"
+        traceback.print_exc()
+
+    return result
+
+
+def fetch_containers(blob_service_client, active_containers):
+    """Fetches the blobs of several containers concurrently, using a bounded thread pool.
+
+    Args:
+        blob_service_client (BlobServiceClient): The client for the storage account.
+        active_containers (list): A list of strings, of the names of the storage containers.
+
+    Returns:
+        list: One fetch result per container (see fetch_container_blob()), in the same order as
+            'active_containers'.
+    """
+    if not active_containers:
+        return []
+
+    max_workers = min(Config.FETCH_MAX_WORKERS, len(active_containers))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda name: fetch_container_blob(blob_service_client, name), active_containers))
+
+
+def render_cache_key(fetch_results):
+    """Builds the render cache key for a set of fetched containers.
+
+    Args:
+        fetch_results (list): The results of fetch_containers().
+
+    Returns:
+        tuple: The sorted (container, blob name, ETag) of each container, and the render settings.
+    """
+    versions = tuple(sorted((result["container"], result["blob_name"], result["etag"]) for result in fetch_results))
+    settings = (Config.MAP_RENDER_MODE, Config.SIMPLIFY_TRAILS, Config.SIMPLIFY_TOLERANCE_PIXELS, Config.SIMPLIFY_ZOOM_HEADROOM)
+    return versions, settings
+
+
+def render_live_map(m, fetch_results):
+    """Draws every successfully fetched container on a live map, and renders it to HTML.
+
+    Args:
+        m (folium.Map): The folium map object to add the GeoJSON data to.
+        fetch_results (list): The results of fetch_containers().
+
+    Returns:
+        html (str): The rendered map.
+        telemetry_data (list): A list of all drawn blob's telemetry data, in dictionaries.
+        fetch_errors (dict): Container names paired with the reason they could not be drawn.
+        context (MapBuildContext): The context the map was built with.
+    """
+    start = time.perf_counter()
+    context = MapBuildContext()    # Bounds of this request's map only.
+    telemetry_data = []
+    fetch_errors = {}
+    for result in fetch_results:
+        container_name = result["container"]
+        try:
+            process_data_to_map(result["track"], m, telemetry_data, context)
+            context.point_counts[container_name] = len(result["track"])
 
         except Exception as e:
             print(f"Error processing container '{container_name}': {e}")
             traceback.print_exc()
-    
-    m = center_and_zoom(m)
+            fetch_errors[container_name] = f"Error processing container '{container_name}': {e}"
+
+    m = center_and_zoom(m, context)
+    html = m.get_root().render()
+
+    with render_stats_lock:
+        render_stats["renders"] += 1
+        render_stats["render_seconds"] += time.perf_counter() - start
+    return html, telemetry_data, fetch_errors, context
+
+
+def retrieve_from_containers(m, STORAGE_CONNECTION_STRING, active_containers, fetch_results=None):
+    """Fetches Azure storage container data, adds it to the live map, and renders the map.
+
+    If the same containers were rendered before and none of their blobs have changed since, the
+    map is taken from 'render_cache' instead of being drawn again.
+
+    Args:
+        m (folium.Map): The folium map object to add the GeoJSON data to.
+        STORAGE_CONNECTION_STRING (str): The connection string for the Azure storage account.
+        active_containers (list): A list of strings, of the names of the storage containers.
+        fetch_results (list, optional): Results already fetched for the containers (e.g. by the
+            ingest service), in the format of fetch_container_blob(). If given, nothing is downloaded.
+
+    Returns:
+        telemetry_data (list): A list of all selected blob's telemetry data, in dictionaries.
+        all_blob_content (list): A list of all selected blob's data, in dictionaries.
+        fetch_errors (dict): Container names paired with the reason they could not be fetched.
+        context (MapBuildContext): The context the map was built with.
+        html (str): The rendered map.
+    """
+    if fetch_results is None:
+        blob_service_client = get_blob_service_client(STORAGE_CONNECTION_STRING)
+        fetch_results = fetch_containers(blob_service_client, active_containers)
+
+    # Draws the containers in the order they were selected.
+    all_blob_content = {}
+    fetch_errors = {}
+    fetched = []
+    for result in fetch_results:
+        if result["error"]:
+            print(result["error"])
+            fetch_errors[result["container"]] = result["error"]
+            continue
+        all_blob_content[result["blob_name"]] = result["content"]
+        fetched.append(result)
+
+    cache_key = render_cache_key(fetched)
+    cached = render_cache.get(cache_key) if not fetch_errors else None
+    if cached is not None:
+        html, telemetry_data, context = cached["html"], cached["telemetry"], cached["context"]
+    else:
+        html, telemetry_data, render_errors, context = render_live_map(m, fetched)
+        fetch_errors.update(render_errors)
+        if not fetch_errors:    # Only complete maps are cached.
+            render_cache.put(cache_key, {"html": html, "telemetry": telemetry_data, "context": context},
+                             len(html) + 256 * len(telemetry_data))
 
-    m.save(map_save_path)
-    return telemetry_data, all_blob_content
+    return telemetry_data, all_blob_content, fetch_errors, context, html
+
+
+def parse_cursors(cursors):
+    """Checks the cursors sent to /api/pings or /api/stream.
+
+    Args:
+        cursors: The decoded JSON, which should pair container names with the number of pings the
+            caller already has.
+
+    Returns:
+        dict: The cursors, unchanged.
+
+    Raises:
+        ValueError: If no cursors are given, or a cursor is not a whole number of at least 0.
+    """
+    if not cursors or not isinstance(cursors, dict):
+        raise ValueError("No cursors given")
+    for container_name, cursor in cursors.items():
+        if isinstance(cursor, bool) or not isinstance(cursor, int) or cursor < 0:
+            raise ValueError(f"Invalid cursor for container '{container_name}'")
+    return cursors
+
+
+def make_delta(track, start):
+    """Returns the pings of a track from a cursor onwards, as sent by /api/pings and /api/stream.
+
+    Args:
+        track (Track): The container's current track.
+        start (int): The number of pings the caller already has. If the track has fewer pings
+            (its blob was rewritten), every ping is sent from index 0.
+
+    Returns:
+        dict: A dictionary containing:
+            - start (int): The index of the first ping returned.
+            - cursor (int): The cursor to send on the next call.
+            - name (str), longname (str): The first tracker's ID and the base station's name.
+            - trackers (list): The IDs of the base station's trackers, indexed by the "tracker" column.
+            - trails (dict): The IDs of the trackers with new pings, paired with their trail's colour
+                and the [lat, lon] of their last ping before 'start' (None if they had none), from
+                which the trail continues.
+            - columns (dict): The new pings, column by column (see Track.to_columns()).
+    """
+    start = max(int(start or 0), 0)
+    if start > len(track):
+        start = 0
+    trails = {}
+    for index in sorted(set(track.tracker[start:])):
+        tracker_id = track.trackers[int(index)]
+        last = track.last_ping(tracker_id, start)
+        trails[tracker_id] = {
+            "colour": assign_trail_colour(track, tracker_id),
+            "last": None if last is None else [track.lat[last], track.lon[last]],
+        }
+    return {
+        "start": start,
+        "cursor": len(track),
+        "name": track.name,
+        "longname": track.longname,
+        "trackers": list(track.trackers),
+        "trails": trails,
+        "columns": track.to_columns(start),
+    }
+
+
+def get_pings_since(STORAGE_CONNECTION_STRING, cursors, fetch_results=None):
+    """Fetches only the pings each container has received after a cursor.
+
+    Containers are fetched through the blob cache, so a container with no new pings costs one
+    empty 304 response, and one with new pings only has its new bytes downloaded.
+
+    Args:
+        STORAGE_CONNECTION_STRING (str): The connection string for the Azure storage account.
+        cursors (dict): Container names paired with the number of pings the caller already has.
+        fetch_results (list, optional): Results already fetched for the containers. If given,
+            nothing is downloaded.
+
+    Returns:
+        dict: Container names paired with either their new pings (see make_delta()), or:
+            - error (str): The reason the container could not be fetched.
+    """
+    if fetch_results is None:
+        blob_service_client = get_blob_service_client(STORAGE_CONNECTION_STRING)
+        fetch_results = fetch_containers(blob_service_client, list(cursors))
+
+    deltas = {}
+    for result in fetch_results:
+        container_name = result["container"]
+        if result["error"]:
+            deltas[container_name] = {"error": result["error"]}
+        else:
+            deltas[container_name] = make_delta(result["track"], cursors[container_name])
+    return deltas
 
 
 # Testing purposes (Uncomment if needed to test)
@@ -0,0 +1,131 @@
+"""This module simplifies GPS trails for drawing, using the Douglas-Peucker algorithm.
+
+Only the lines drawn on maps are simplified. Every ping is still drawn as a point, and GPX exports
+are made from the raw data.
+
+Each trail is simplified once, for a single zoom level: Config.SIMPLIFY_ZOOM_HEADROOM levels closer
+than the zoom that fits the whole trail (see retrieve_from_containers.trail_coordinates()). The same
+simplified line is drawn at every zoom level, so zooming in further than that can show its error.
+"""
+
+import math
+import numpy as np
+
+EARTH_RADIUS_METRES = 6371008.8
+METRES_PER_PIXEL_AT_ZOOM_0 = 156543.03392    # Web Mercator ground resolution at the equator.
+TILE_SIZE_PIXELS = 256
+
+
+def metres_per_pixel(zoom, lat):
+    """Returns the ground distance covered by one screen pixel at a zoom level and latitude."""
+    return METRES_PER_PIXEL_AT_ZOOM_0 * math.cos(math.radians(lat)) / 2 ** zoom
+
+
+def fit_zoom(bounds, viewport_pixels, max_zoom=18):
+    """Returns the highest zoom level at which the bounds fit inside a square viewport.
+
+    Args:
+        bounds (list): The south-west and north-east corners, as [(lat, lon), (lat, lon)].
+        viewport_pixels (int): The width and height of the viewport, in pixels.
+        max_zoom (int, optional): The zoom level returned for a single point.
+
+    Returns:
+        int: The zoom level.
+    """
+    (south, west), (north, east) = bounds
+    lon_fraction = (east - west) / 360
+    lat_fraction = abs(mercator_y(north) - mercator_y(south)) / (2 * math.pi)
+    fraction = max(lon_fraction, lat_fraction)
+    if fraction <= 0:
+        return max_zoom
+    zoom = math.floor(math.log2(viewport_pixels / TILE_SIZE_PIXELS / fraction))
+    return max(0, min(max_zoom, zoom))
+
+
+def mercator_y(lat):
+    """Projects a latitude onto the Web Mercator y axis (in radians)."""
+    lat = max(min(lat, 85.0511), -85.0511)
+    return math.log(math.tan(math.pi / 4 + math.radians(lat) / 2))
+
+
+def tolerance_for_zoom(zoom, lat, pixels):
+    """Returns the simplification tolerance, in metres, that is invisible at a zoom level.
+
+    Args:
+        zoom (int): The zoom level the line will be viewed at.
+        lat (float): The latitude of the line.
+        pixels (float): The largest acceptable error, in screen pixels.
+
+    Returns:
+        float: The tolerance in metres.
+    """
+    return pixels * metres_per_pixel(zoom, lat)
+
+
+def douglas_peucker(lat, lon, tolerance):
+    """Simplifies a line with the Douglas-Peucker algorithm.
+
+    Coordinates are projected onto a local flat plane in metres. Distances from each segment's
+    interior points to the segment are computed with vectorised NumPy operations.
+
+    Args:
+        lat (sequence): The latitudes of the line's vertices.
+        lon (sequence): The longitudes of the line's vertices.
+        tolerance (float): The largest distance, in metres, a removed vertex may be from the simplified line.
+
+    Returns:
+        numpy.ndarray: The indexes of the vertices to keep, in order.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    count = len(lat)
+    if count < 3:
+        return np.arange(count)
+
+    # Equirectangular projection around the line's mean latitude.
+    scale = math.radians(1) * EARTH_RADIUS_METRES
+    x = lon * scale * math.cos(math.radians(float(lat.mean())))
+    y = lat * scale
+
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        px, py = x[start + 1:end] - x[start], y[start + 1:end] - y[start]
+        length_squared = dx * dx + dy * dy
+        if length_squared == 0:
+            distances = np.hypot(px, py)
+        else:
+            # Distance to the segment (not the infinite line), so backtracking vertices are kept.
+            t = np.clip((px * dx + py * dy) / length_squared, 0, 1)
+            distances = np.hypot(px - t * dx, py - t * dy)
+
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            index = start + 1 + farthest
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+
+    return np.flatnonzero(keep)
+
+
+def simplify_track(track, tolerance):
+    """Simplifies a Track's trail, for drawing as a PolyLine.
+
+    Args:
+        track (Track): The track to simplify.
+        tolerance (float): The largest error allowed, in metres.
+
+    Returns:
+        list: The [lat, lon] pairs of the simplified trail.
+    """
+    lat = np.frombuffer(track.lat, dtype=np.float64)    # Views the arrays without copying them.
+    lon = np.frombuffer(track.lon, dtype=np.float64)
+    kept = douglas_peucker(lat, lon, tolerance)
+    return np.column_stack((lat[kept], lon[kept])).tolist()
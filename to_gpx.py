@@ -13,16 +13,20 @@ def convert_json_to_gpx_string(json_data):
         json_data (dict): A dictionary of blob names paired with GeoJSON data.
 
     Returns:
-        string (str): A GPX string for database storage or downloading.
+        string (str): A GPX string for database storage or downloading, with one track per tracker.
     """
     gpx = gpxpy.gpx.GPX()
-    gpx_track = gpxpy.gpx.GPXTrack()
-    gpx.tracks.append(gpx_track)
-    gpx_segment = gpxpy.gpx.GPXTrackSegment()
-    gpx_track.segments.append(gpx_segment)
+    gpx_segments = {}    # Tracker IDs paired with the segment of their track.
     for point_dict in json_data:
 
         for _, point in point_dict.items():
+            gpx_segment = gpx_segments.get(point.get("name"))
+            if gpx_segment is None:
+                gpx_track = gpxpy.gpx.GPXTrack(name=point.get("name"))
+                gpx.tracks.append(gpx_track)
+                gpx_segment = gpx_segments[point.get("name")] = gpxpy.gpx.GPXTrackSegment()
+                gpx_track.segments.append(gpx_segment)
+
             time = datetime.fromisoformat(point["time"].replace("Z", "+00:00"))
             gpx_point = gpxpy.gpx.GPXTrackPoint(
                 time=time,
@@ -0,0 +1,312 @@
+"""This module contains the Track class, a columnar store for a base station's parsed GPS pings."""
+
+import bisect
+import calendar
+import math
+from array import array
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+import point_parser
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+NAN = float("nan")
+
+# Telemetry columns, paired with the key each one is uploaded under.
+TELEMETRY_COLUMNS = (("battery", "battery"), ("altitude", "altitude"), ("pdop", "PDOP"), ("snr", "SNR"))
+COLUMNS = ("lat", "lon", "time") + tuple(column for column, _ in TELEMETRY_COLUMNS) + ("tracker",)
+
+
+def to_epoch(time_string):
+    """Converts an ISO 8601 ping time to seconds since the epoch.
+
+    Times without a timezone (as uploaded by base stations) are treated as UTC, so that they
+    convert back to exactly the same string.
+
+    Args:
+        time_string (str): The ping's time, e.g. "2024-09-16T09:16:49".
+
+    Returns:
+        float: The time in seconds since the epoch, or NaN if it could not be parsed.
+    """
+    try:
+        time = datetime.fromisoformat(time_string.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return NAN
+    if time.tzinfo is not None:
+        return time.timestamp()
+    return calendar.timegm(time.timetuple()) + time.microsecond / 1e6
+
+
+def local_epoch(epoch, timezone_name=None):
+    """Converts a ping time stored by to_epoch() to true seconds since the epoch.
+
+    Base stations record ping times without a timezone, in their local time, which to_epoch()
+    stores as if it were UTC. Use this wherever a ping time is compared with the current time.
+
+    Args:
+        epoch (float): The ping time, as stored by to_epoch().
+        timezone_name (str, optional): The IANA timezone the ping was recorded in, e.g.
+            "Australia/Perth". Defaults to the local timezone of this computer.
+
+    Returns:
+        float: The time in seconds since the epoch.
+    """
+    naive = datetime.fromtimestamp(epoch, timezone.utc).replace(tzinfo=None)
+    if timezone_name:
+        return naive.replace(tzinfo=ZoneInfo(timezone_name)).timestamp()
+    return naive.astimezone().timestamp()    # Naive datetimes are taken to be in the local timezone.
+
+
+def from_epoch(epoch):
+    """Converts seconds since the epoch back to an ISO 8601 ping time (see to_epoch())."""
+    if math.isnan(epoch):
+        return ""
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime(TIME_FORMAT)
+
+
+def to_number(value):
+    """Converts a telemetry reading to a float, or NaN if it is missing or not numeric."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return NAN
+
+
+def from_number(value):
+    """Converts a stored telemetry reading back to the number it was uploaded as."""
+    return int(value) if value.is_integer() else value
+
+
+class Track:
+    """The GPS pings uploaded by one base station, stored column by column in typed arrays.
+
+    Each ping costs 64 bytes (eight doubles): latitude, longitude, epoch time, battery, altitude,
+    PDOP, SNR, and the index of its tracker in 'trackers'. Missing telemetry readings are stored as
+    NaN. Pings are expected to be appended in time order, which allows time filtering by binary
+    search. A base station can follow several trackers, whose pings are interleaved; by_tracker()
+    splits them into one track per tracker.
+    """
+
+    __slots__ = ("name", "longname", "trackers", "_tracker_index") + COLUMNS
+
+    def __init__(self, name=None, longname=None):
+        """Creates an empty track.
+
+        Args:
+            name (str, optional): The ID of the track's first tracker.
+            longname (str, optional): The name of the base station that uploaded the track.
+        """
+        self.name = name
+        self.longname = longname
+        self.trackers = []          # Tracker IDs, in the order their first ping was appended.
+        self._tracker_index = {}    # Tracker IDs paired with their index in 'trackers'.
+        for column in COLUMNS:
+            setattr(self, column, array("d"))
+
+    @classmethod
+    def from_points(cls, points, content_type=None):
+        """Creates a track from point data.
+
+        Args:
+            points: Any point data accepted by point_parser.parse_points().
+            content_type (str, optional): The Content-Type of the blob the data was downloaded from.
+
+        Returns:
+            Track: A track holding every point.
+        """
+        track = cls()
+        track.extend(point_parser.parse_points(points, content_type))
+        return track
+
+    def append(self, point):
+        """Adds a point_parser.Point record to the end of the track."""
+        if self.name is None:
+            self.name = point.name
+            self.longname = point.longname
+        self.tracker.append(self.tracker_index(point.name))
+        self.lat.append(to_number(point.lat))
+        self.lon.append(to_number(point.lon))
+        self.time.append(to_epoch(point.time))
+        telemetry = point.telemetry or {}
+        for column, key in TELEMETRY_COLUMNS:
+            getattr(self, column).append(to_number(telemetry.get(key)))
+
+    def tracker_index(self, name):
+        """Returns the index of a tracker in 'trackers', adding it if it is new."""
+        index = self._tracker_index.get(name)
+        if index is None:
+            index = self._tracker_index[name] = len(self.trackers)
+            self.trackers.append(name)
+        return index
+
+    def tracker_at(self, index):
+        """Returns the ID of the tracker that recorded one ping."""
+        return self.trackers[int(self.tracker[index])]
+
+    def first_ping(self, tracker_id):
+        """Returns the index of a tracker's first ping, or None if it has none."""
+        index = self._tracker_index.get(tracker_id)
+        if index is None:
+            return None
+        if len(self.trackers) == 1:
+            return 0 if len(self) else None
+        for i, value in enumerate(self.tracker):
+            if value == index:
+                return i
+        return None
+
+    def last_ping(self, tracker_id, before=None):
+        """Returns the index of a tracker's last ping before an index (by default, its last ping), or None if it has none."""
+        index = self._tracker_index.get(tracker_id)
+        before = len(self) if before is None else min(before, len(self))
+        if index is None or before <= 0:
+            return None
+        if len(self.trackers) == 1:
+            return before - 1
+        for i in range(before - 1, -1, -1):
+            if self.tracker[i] == index:
+                return i
+        return None
+
+    def extend(self, points):
+        """Adds several point_parser.Point records to the end of the track."""
+        for point in points:
+            self.append(point)
+
+    def copy(self):
+        """Returns an independent copy of the track."""
+        return self[:]
+
+    def __len__(self):
+        return len(self.lat)
+
+    def __getitem__(self, index):
+        """Returns a slice of the track as a new track."""
+        if not isinstance(index, slice):
+            raise TypeError("Tracks can only be indexed with slices.")
+        track = Track(self.name, self.longname)
+        track.trackers = list(self.trackers)
+        track._tracker_index = dict(self._tracker_index)
+        for column in COLUMNS:
+            setattr(track, column, getattr(self, column)[index])
+        return track
+
+    def by_tracker(self):
+        """Splits the track into one track per tracker, e.g. to draw each tracker's trail separately.
+
+        Returns:
+            dict: Tracker IDs paired with tracks holding only their pings, in the order of 'trackers'.
+        """
+        if len(self.trackers) <= 1:
+            return {self.name: self} if len(self) else {}
+        rows = {}
+        for i, index in enumerate(self.tracker):
+            rows.setdefault(int(index), []).append(i)
+        tracks = {}
+        for index, name in enumerate(self.trackers):
+            track = Track(name, self.longname)
+            track.tracker_index(name)
+            for column in COLUMNS:
+                values = getattr(self, column)
+                setattr(track, column, array("d", (values[i] for i in rows.get(index, []))))
+            track.tracker = array("d", [0.0]) * len(track.lat)    # The split track's only tracker.
+            tracks[name] = track
+        return tracks
+
+    @property
+    def nbytes(self):
+        """The memory used by the track's arrays, in bytes."""
+        return sum(getattr(self, column).buffer_info()[1] * getattr(self, column).itemsize for column in COLUMNS)
+
+    def since(self, epoch):
+        """Returns the pings recorded strictly after a time, found by binary search.
+
+        Args:
+            epoch (float or datetime): The time, in seconds since the epoch or as a datetime
+                (naive datetimes are treated like uploaded ping times, see to_epoch()).
+
+        Returns:
+            Track: The pings after the given time.
+        """
+        if isinstance(epoch, datetime):
+            epoch = to_epoch(epoch.isoformat())
+        return self[bisect.bisect_right(self.time, epoch):]
+
+    def bounds(self):
+        """Returns the south-west and north-east corners of the track, or None if it is empty."""
+        if not self.lat:
+            return None
+        return [(min(self.lat), min(self.lon)), (max(self.lat), max(self.lon))]
+
+    def centroid(self):
+        """Returns the average latitude and longitude of the track, or None if it is empty."""
+        if not self.lat:
+            return None
+        return math.fsum(self.lat) / len(self.lat), math.fsum(self.lon) / len(self.lon)
+
+    def coordinates(self):
+        """Returns the track's [lat, lon] pairs, e.g. for drawing a PolyLine."""
+        return [[lat, lon] for lat, lon in zip(self.lat, self.lon)]
+
+    def telemetry_at(self, index):
+        """Returns the telemetry readings of one ping as a dictionary, omitting missing readings."""
+        telemetry = {}
+        for column, key in TELEMETRY_COLUMNS:
+            value = getattr(self, column)[index]
+            if not math.isnan(value):
+                telemetry[key] = from_number(value)
+        return telemetry
+
+    def to_columns(self, start=0):
+        """Returns the pings from an index onwards as compact columns, e.g. for sending to the frontend.
+
+        Args:
+            start (int, optional): The index of the first ping to include.
+
+        Returns:
+            dict: A list of values for each column ("lat", "lon", "time", "battery", "altitude",
+                "pdop", "snr", "tracker"). Times are in seconds since the epoch, trackers are
+                indices into 'trackers', and missing values are None.
+        """
+        return {
+            column: [None if math.isnan(value) else from_number(value) for value in getattr(self, column)[start:]]
+            for column in COLUMNS
+        }
+
+    def to_telemetry(self):
+        """Returns a telemetry dictionary for each ping, as sent to the frontend."""
+        return [
+            {
+                "name": self.tracker_at(i),
+                "time": from_epoch(self.time[i]),
+                "telemetry": self.telemetry_at(i),
+                "lon": self.lon[i],
+                "lat": self.lat[i],
+                "longname": self.longname,
+            }
+            for i in range(len(self))
+        ]
+
+    def to_features(self):
+        """Returns a GeoJSON Point feature for each ping."""
+        features = []
+        for i in range(len(self)):
+            lat, lon = self.lat[i], self.lon[i]
+            name = self.tracker_at(i)
+            time = from_epoch(self.time[i])
+            telemetry = self.telemetry_at(i)
+            features.append({
+                "type": "Feature",
+                "geometry": {
+                    "type": "Point",
+                    "coordinates": [lon, lat],
+                },
+                "properties": {
+                    "time": time,
+                    "name": name,
+                    "tooltip": f"Name: {self.longname}\nID: {name}\nTime: {time}\nCoords: {[lon, lat]}\nBattery: {telemetry.get('battery', 'N/A')}%",
+                    "telemetry": telemetry,
+                },
+            })
+        return features